@@ -1 +1,2 @@
-__all__ = ['dropbox', 'yandex_disk', 'api_client']
+__all__ = ['dropbox', 'yandex_disk', 'api_client', 'cloud_copy', 'hash_cache', 'hashing', 'local_fs',
+           'metadata_cache', 'remote_index', 'scheduler', 'stats', 'sync', 'transport', 'zip_stream']
@@ -1,36 +1,225 @@
 import asyncio
-import zipfile
+import hashlib
+import time
 from abc import ABC, abstractmethod
-from os import path, remove, walk
+from contextlib import asynccontextmanager
+from os import path
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable
 
 import aiofiles
 import httpx
 
 from system_class import SystemClass
 
+from .hash_cache import HashCache
+from .local_fs import LocalFS
+from .metadata_cache import MetadataCache
+from .scheduler import TransferScheduler
+from .transport import AdaptiveLimiter, PoolConfig, RetryTransport
+from .zip_stream import ZipStreamExtractor
+
 
 class Cloud(ABC):
+    chunk_size = 2 ** 20
+    upload_buffer_size = 4 * 2 ** 20
+    download_workers = 8
+    upload_workers = 8
+    large_file_size = 64 * 2 ** 20
+    zip_max_files = 10_000
+    zip_max_size = 2 ** 30
+    metadata_ttl = 30
+    metadata_cache_size = 10_000
+    page_size = 1000
+    hash_algorithm = "sha256"
+    skip_unchanged = True
+    download_retries = 3
+    max_retries = 5
+    backoff_base = 0.5
+    backoff_max = 30
+    retry_after_max = 300
+    auth_ttl = 600
+    fs_workers = 8
+    idempotent_endpoints = ()
+
+    def __init__(self, api_pool: PoolConfig = None, content_pool: PoolConfig = None) -> None:
+        self.metadata = MetadataCache(self.metadata_ttl, self.metadata_cache_size)
+        self.known_folders = MetadataCache(self.metadata_ttl, self.metadata_cache_size)
+        self.fs = LocalFS(self.fs_workers)
+        self.hash_cache = HashCache(fs=self.fs)
+        self.api_pool = api_pool or PoolConfig(max_connections=32)
+        self.content_pool = content_pool or PoolConfig(max_connections=16, timeout=120)
+        self.limiter = AdaptiveLimiter(self.api_pool.max_connections, max_limit=self.api_pool.max_connections)
+        self.content_limiter = AdaptiveLimiter(self.content_pool.max_connections,
+                                               max_limit=self.content_pool.max_connections)
+        self.stats = None
+
+    async def auth(self) -> None:
+        key = hashlib.sha256(f"{type(self).__name__}|{self.auth_token}".encode()).hexdigest()
+        path_cache = path.join(SystemClass.state_dir(), "auth.json")
+        validated = await self.fs.read_json(path_cache)
+        now = time.time()
+        if validated.get(key, 0) > now:
+            return
+        await self.check_token()
+        validated = {token: expires_at for token, expires_at in validated.items() if expires_at > now}
+        validated[key] = now + self.auth_ttl
+        await self.fs.write_json(path_cache, validated)
+
     @abstractmethod
-    def auth(self, auth_token: str) -> httpx.AsyncClient:
+    async def check_token(self) -> None:
         pass
 
+    def make_client(self, pool: PoolConfig, limiter: AdaptiveLimiter, **kwargs) -> httpx.AsyncClient:
+        transport = RetryTransport(httpx.AsyncHTTPTransport(limits=pool.limits(), http2=pool.http2), limiter,
+                                   self.max_retries, self.backoff_base, self.backoff_max, self.record_request,
+                                   self.is_idempotent, self.retry_after_max)
+        return httpx.AsyncClient(transport=transport, timeout=pool.timeout, **kwargs)
+
+    def record_request(self, request: httpx.Request, entry: dict) -> None:
+        if self.stats is not None:
+            self.stats.record({"cloud": type(self).__name__, "endpoint": self.endpoint(request),
+                               "method": request.method, "time": time.time(), **entry})
+
+    def is_idempotent(self, request: httpx.Request) -> bool:
+        return request.method in ("GET", "HEAD") or self.endpoint(request) in self.idempotent_endpoints
+
+    def endpoint(self, request: httpx.Request) -> str:
+        for base_url in (self.url, getattr(self, "content_url", self.url)):
+            base_path = httpx.URL(base_url).path
+            if request.url.host == httpx.URL(base_url).host and request.url.path.startswith(base_path):
+                return request.url.path[len(base_path):] or "/"
+        return {"GET": "download", "PUT": "upload"}.get(request.method, request.url.path)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+        await self.content_client.aclose()
+        self.hash_cache.close()
+        self.fs.close()
+
+    async def __aenter__(self) -> "Cloud":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self.aclose()
+
     @abstractmethod
     async def get_cloud_info(self) -> dict:
         pass
 
     @abstractmethod
+    def iter_folder(self, path_remote: str, page_size: int = None) -> AsyncIterator[list]:
+        pass
+
     async def get_folder_content(self, path_remote: str) -> dict:
+        content = {"folders": [], "files": []}
+        async for page in self.iter_folder(path_remote):
+            for entry in page:
+                content["folders" if entry["type"] == "dir" else "files"].append(entry["name"])
+        return content
+
+    async def stat(self, path_remote: str, missing_ok: bool = False) -> dict:
+        key = self.cache_key(path_remote)
+        info = self.metadata.get(key)
+        if info is None:
+            info = await self.fetch_metadata(path_remote, missing_ok)
+            if info is None:
+                return None
+            self.metadata.put(key, info)
+        return info
+
+    @abstractmethod
+    async def fetch_metadata(self, path_remote: str, missing_ok: bool = False) -> dict:
         pass
 
-    async def download(self, path_remote: str, is_file: bool) -> bytes:
+    def cache_key(self, path_remote: str) -> str:
+        return path_remote.rstrip("/") or "/"
+
+    def forget(self, path_remote: str, recursive: bool = False) -> None:
+        self.metadata.invalidate(self.cache_key(path_remote), recursive)
+
+    @abstractmethod
+    async def list_tree(self, path_remote: str) -> list:
         pass
 
-    async def save_file(self, path_local: str, content: bytes, error_msg: dict) -> None:
-        try:
-            async with aiofiles.open(path.abspath(path_local), 'wb') as file:
-                await file.write(content)
-        except FileNotFoundError:
-            return self.error_worker(error_msg)
+    async def list_changes(self, path_remote: str, cursor: str = None) -> tuple:
+        return await self.list_tree(path_remote), None, True
+
+    async def index_changes(self, cursor: str = None) -> tuple:
+        return await self.list_changes("/", cursor)
+
+    async def local_hash(self, path_local: str) -> str:
+        return await self.hash_cache.digest(path_local, self.hash_algorithm)
+
+    async def is_unchanged(self, path_local: str, info: dict) -> bool:
+        if not self.skip_unchanged or info is None or info["type"] != "file" or info.get("hash") is None:
+            return False
+        if info["size"] != await self.fs.getsize(path_local):
+            return False
+        return await self.local_hash(path_local) == info["hash"]
+
+    @abstractmethod
+    def download_stream(self, path_remote: str, is_file: bool = True, verify: bool = True,
+                        headers: dict = None) -> AsyncContextManager[httpx.Response]:
+        pass
+
+    def response_rev(self, response: httpx.Response) -> str:
+        return None
+
+    async def download(self, path_remote: str, is_file: bool = True) -> bytes:
+        async with self.download_stream(path_remote, is_file) as response:
+            return await response.aread()
+
+    async def save_stream(self, path_remote: str, path_local: str, error_msg: dict, is_file: bool = True,
+                          verify: bool = True) -> None:
+        path_part = f"{path.abspath(path_local)}.part"
+        path_marker = f"{path_part}.json"
+        if verify:
+            info = await self.stat(path_remote)
+        else:
+            info = self.metadata.get(self.cache_key(path_remote)) or {}
+        retries = self.download_retries
+        while True:
+            marker = await self.fs.read_json(path_marker)
+            offset = await self.resume_offset(path_part, marker, info.get("rev"))
+            if offset and info.get("size") is not None and offset >= info["size"]:
+                if offset == info["size"]:
+                    break
+                await self.fs.remove(path_part, path_marker)
+                continue
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            if offset and marker.get("etag"):
+                headers["If-Range"] = marker["etag"]
+            try:
+                async with self.download_stream(path_remote, is_file, verify, headers) as response:
+                    if response.status_code == httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+                        await self.fs.remove(path_part, path_marker)
+                        continue
+                    partial = offset > 0 and response.status_code == httpx.codes.PARTIAL_CONTENT
+                    rev = self.response_rev(response) or info.get("rev")
+                    if partial and rev != marker.get("rev"):
+                        await self.fs.remove(path_part, path_marker)
+                        continue
+                    if not partial:
+                        await self.fs.write_json(path_marker, {"rev": rev, "etag": response.headers.get("ETag")})
+                    async with aiofiles.open(path_part, 'ab' if partial else 'wb') as file:
+                        async for chunk in response.aiter_bytes(self.chunk_size):
+                            await file.write(chunk)
+                break
+            except FileNotFoundError:
+                return self.error_worker(error_msg)
+            except httpx.TransportError:
+                if retries == 0:
+                    raise
+                retries -= 1
+        await self.fs.replace(path_part, path.abspath(path_local))
+        await self.fs.remove(path_marker)
+
+    async def resume_offset(self, path_part: str, marker: dict, rev: str) -> int:
+        if not marker or not await self.fs.isfile(path_part):
+            return 0
+        if rev is not None and marker.get("rev") == rev or rev is None and marker.get("etag"):
+            return await self.fs.getsize(path_part)
+        return 0
 
     @abstractmethod
     async def download_file(self, path_remote: str, path_local: str) -> dict:
@@ -41,52 +230,148 @@ class Cloud(ABC):
         pass
 
     @abstractmethod
-    async def download_folder(self, path_remote: str, path_local: str) -> dict:
+    async def upload_local(self, path_local: str, path_remote: str, size: int = None) -> dict:
         pass
 
-    async def create_sub_folders(self, path_local: str, path_remote: str) -> None:
-        for root, dirs, files in walk(path_local):
-            tasks = []
-            for directory in dirs:
-                dir_local = path.join(root, directory)
-                dir_remote = path.join(path_remote, path.relpath(dir_local, path_local)).replace("\\", "/")
-                tasks.append(self.try_to_create_folder(dir_remote))
-            with SystemClass.except_handler(SystemClass.exchandler):
-                await asyncio.gather(*tasks)
+    @abstractmethod
+    async def upload_stream(self, chunks: AsyncIterator[bytes], path_remote: str, size: int = None) -> dict:
+        pass
+
+    @abstractmethod
+    async def download_folder(self, path_remote: str, path_local: str, mode: str = "auto") -> dict:
+        pass
+
+    async def save_folder(self, path_remote: str, path_local: str, error_msg: dict, mode: str = "auto") -> None:
+        tree = None
+        if mode == "auto":
+            tree = await self.list_tree(path_remote)
+            sizes = [entry["size"] for entry in tree if entry["type"] == "file"]
+            if len(sizes) <= self.zip_max_files and sum(sizes) <= self.zip_max_size:
+                mode = "zip"
+            else:
+                mode = "files"
+        if mode == "zip":
+            return await self.zip_save_with_extraction(path_remote, path_local, error_msg)
+        if tree is None:
+            tree = await self.list_tree(path_remote)
+        return await self.files_save(path_remote, path_local, tree, error_msg)
+
+    async def files_save(self, path_remote: str, path_local: str, tree: list, error_msg: dict) -> None:
+        if not await self.fs.isdir(path.abspath(path_local)):
+            return self.error_worker(error_msg)
+        root_local = path.join(path.abspath(path_local), path.basename(path_remote.rstrip("/")))
+        await self.fs.makedirs([root_local] + [path.join(root_local, *entry["path"].split("/"))
+                                               for entry in tree if entry["type"] == "dir"])
+
+        async def fetch(file_remote: str, file_local: str) -> None:
+            await self.save_stream(file_remote, file_local, error_msg, verify=False)
+
+        jobs = ((entry["size"], (self.remote_join(path_remote, entry["path"]),
+                                 path.join(root_local, *entry["path"].split("/"))))
+                for entry in tree if entry["type"] == "file")
+        with SystemClass.except_handler(SystemClass.exchandler):
+            await TransferScheduler(self.download_workers, self.large_file_size).run(jobs, fetch)
 
     async def upload_folder(self, path_local: str, path_remote: str) -> dict:
-        local_path = path.abspath(path_local)
-        await self.try_to_create_folder(path_remote)
-        await self.create_sub_folders(local_path, path_remote)
-        tasks = []
-        for root, dirs, files in walk(local_path):
-            for file in files:
-                file_local = path.join(root, file)
-                file_remote = path.join(path_remote, path.relpath(file_local, local_path)).replace("\\", "/")
-                tasks.append(self.upload_file(file_local, file_remote))
+        scheduler = TransferScheduler(self.upload_workers, self.large_file_size)
         with SystemClass.except_handler(SystemClass.exchandler):
-            await asyncio.gather(*tasks)
+            await self.ensure_folders([path_remote] if path_remote.strip("/") else [])
+            remote = {}
+            if self.skip_unchanged:
+                remote = {self.cache_key(self.remote_join(path_remote, entry["path"])): entry
+                          for entry in await self.list_tree(path_remote) if entry["type"] == "file"}
+            async with self.upload_batch() as upload:
+                async def upload_changed(file_local: str, file_remote: str) -> None:
+                    if not await self.is_unchanged(file_local, remote.get(self.cache_key(file_remote))):
+                        await upload(file_local, file_remote)
+
+                await scheduler.run(self.scan_tree(path.abspath(path_local), path_remote), upload_changed)
 
         return {"status": "ok"}
 
-    async def try_to_create_folder(self, path_remote: str) -> None:
-        try:
-            await self.create_folder(path_remote)
-        except Exception:
-            pass
+    @asynccontextmanager
+    async def upload_batch(self) -> AsyncIterator[Callable[[str, str], Awaitable[dict]]]:
+        yield self.upload_local
+
+    async def scan_tree(self, path_local: str, path_remote: str) -> AsyncIterator[tuple]:
+        level = {path_local: path_remote}
+        while level:
+            next_level = {}
+            async for folder_local, folders, files in self.fs.scan(level):
+                folder_remote = level[folder_local]
+                for file_local, size, _ in files:
+                    yield size, (file_local, self.remote_join(folder_remote, path.basename(file_local)))
+                for child in folders:
+                    next_level[child] = self.remote_join(folder_remote, path.basename(child))
+            await self.ensure_folders(list(next_level.values()))
+            level = next_level
+
+    async def ensure_folders(self, paths: list) -> None:
+        paths = [path_remote for path_remote in paths if self.known_folders.get(path_remote) is None]
+        if paths:
+            for path_remote in paths:
+                self.forget(path_remote)
+            await self.create_folders(paths)
+            for path_remote in paths:
+                self.known_folders.put(path_remote, {"type": "dir"})
+
+    async def create_folders(self, paths: list) -> None:
+        semaphore = asyncio.Semaphore(self.upload_workers)
+
+        async def create(path_remote: str) -> None:
+            async with semaphore:
+                await self.ensure_folder(path_remote)
+
+        await asyncio.gather(*(create(path_remote) for path_remote in paths))
 
     async def zip_save_with_extraction(self, path_remote: str, path_local: str, error_msg_on_save: dict) -> None:
-        path_to_zip = path.join(path.abspath(path_local), "archive.zip")
-        r = await self.download(path_remote, is_file=False)
-        await self.save_file(path_to_zip, r, error_msg_on_save)
-        with zipfile.ZipFile(path_to_zip) as zip_ref:
-            zip_ref.extractall(path_local)
-        remove(path_to_zip)
+        async with self.download_stream(path_remote, is_file=False) as response:
+            if not await self.fs.isdir(path.abspath(path_local)):
+                return self.error_worker(error_msg_on_save)
+            async with ZipStreamExtractor(path_local, self.fs) as extractor:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    await extractor.feed(chunk)
+
+    async def copy(self, path_from: str, path_to: str) -> dict:
+        return await self.relocate([(path_from, path_to)])
+
+    async def move(self, path_from: str, path_to: str) -> dict:
+        return await self.relocate([(path_from, path_to)], move=True)
+
+    async def relocate(self, pairs: list, move: bool = False) -> dict:
+        for path_from, path_to in pairs:
+            self.forget(path_to, recursive=True)
+            if move:
+                self.forget(path_from, recursive=True)
+                self.known_folders.invalidate(path_from, recursive=True)
+        await self.relocate_entries(pairs, move)
+        return {"status": "ok", "entries": len(pairs)}
+
+    async def relocate_entries(self, pairs: list, move: bool) -> None:
+        semaphore = asyncio.Semaphore(self.upload_workers)
+
+        async def relocate(path_from: str, path_to: str) -> None:
+            async with semaphore:
+                await self.relocate_entry(path_from, path_to, move)
+
+        await asyncio.gather(*(relocate(path_from, path_to) for path_from, path_to in pairs))
+
+    @abstractmethod
+    async def relocate_entry(self, path_from: str, path_to: str, move: bool) -> None:
+        pass
 
     @abstractmethod
     async def create_folder(self, path_remote: str) -> dict:
         pass
 
+    @abstractmethod
+    async def ensure_folder(self, path_remote: str) -> None:
+        pass
+
+    @staticmethod
+    def remote_join(path_remote: str, relative: str) -> str:
+        return f"{path_remote.rstrip('/')}/{relative}"
+
     @staticmethod
     @abstractmethod
     def error_worker(response: dict):
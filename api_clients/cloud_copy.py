@@ -0,0 +1,65 @@
+import asyncio
+from typing import AsyncIterator
+
+from .api_client import Cloud
+from .scheduler import TransferScheduler
+
+
+class CloudCopy:
+    buffer_chunks = 8
+
+    def __init__(self, source: Cloud, target: Cloud) -> None:
+        self.source = source
+        self.target = target
+        self.stats = {"files": 0, "bytes": 0}
+
+    async def run(self, path_from: str, path_to: str) -> dict:
+        info = await self.source.stat(path_from)
+        if info["type"] == "dir":
+            await self.copy_folder(path_from, path_to)
+        else:
+            await self.copy_file(path_from, path_to, info.get("size"))
+        return self.stats
+
+    async def copy_folder(self, path_from: str, path_to: str) -> None:
+        tree = await self.source.list_tree(path_from)
+        levels = {}
+        for entry in tree:
+            if entry["type"] == "dir":
+                levels.setdefault(entry["path"].count("/"), []).append(self.target.remote_join(path_to,
+                                                                                               entry["path"]))
+        await self.target.ensure_folders([path_to] if path_to.strip("/") else [])
+        for depth in sorted(levels):
+            await self.target.ensure_folders(levels[depth])
+        jobs = ((entry["size"], (self.source.remote_join(path_from, entry["path"]),
+                                 self.target.remote_join(path_to, entry["path"]), entry["size"]))
+                for entry in tree if entry["type"] == "file")
+        workers = min(self.source.download_workers, self.target.upload_workers)
+        await TransferScheduler(workers, self.source.large_file_size).run(jobs, self.copy_file)
+
+    async def copy_file(self, path_from: str, path_to: str, size: int = None) -> None:
+        queue = asyncio.Queue(self.buffer_chunks)
+
+        async def produce() -> None:
+            try:
+                async with self.source.download_stream(path_from, verify=False) as response:
+                    async for chunk in response.aiter_bytes(self.source.chunk_size):
+                        await queue.put(chunk)
+            except Exception as e:
+                await queue.put(e)
+            else:
+                await queue.put(None)
+
+        async def chunks() -> AsyncIterator[bytes]:
+            while (chunk := await queue.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                self.stats["bytes"] += len(chunk)
+                yield chunk
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            await self.target.upload_stream(chunks(), path_to, size)
+        finally:
+            producer.cancel()
+        self.stats["files"] += 1
@@ -1,37 +1,59 @@
+import asyncio
 import json
+from contextlib import asynccontextmanager
 from os import path
+from typing import AsyncIterator, Awaitable, Callable, Union
 
-import aiofiles
 import httpx
 
 from system_class import SystemClass
 
 from .api_client import Cloud
+from .transport import FileBody, FileChangedError, PoolConfig, body_headers
+
+
+class CursorResetError(Exception):
+    pass
 
 
 class Dropbox(Cloud):
+    hash_algorithm = "dropbox"
+    batch_upload = True
+    finish_batch_size = 1000
+    batch_poll_interval = 0.5
+    create_folder_batch_size = 10_000
+    relocate_batch_size = 1000
+    idempotent_endpoints = ("users/get_current_account", "users/get_space_usage", "files/list_folder",
+                            "files/list_folder/continue", "files/get_metadata", "files/download", "files/download_zip",
+                            "files/upload", "files/upload_session/start", "files/upload_session/finish_batch/check",
+                            "files/create_folder_batch/check", "files/copy_batch/check_v2", "files/move_batch/check_v2")
 
-    def __init__(self, auth_token: str) -> None:
+    def __init__(self, auth_token: str, upload_chunk_size: int = 8 * 2 ** 20,
+                 upload_session_threshold: int = 150 * 2 ** 20, api_pool: PoolConfig = None,
+                 content_pool: PoolConfig = None) -> None:
+        super().__init__(api_pool, content_pool)
         self.url = "https://api.dropboxapi.com/2/"
-        self.client = self.auth(auth_token)
+        self.content_url = "https://content.dropboxapi.com/2/"
+        self.upload_chunk_size = upload_chunk_size
+        self.upload_session_threshold = upload_session_threshold
         self.auth_token = auth_token
+        self.client = self.make_client(self.api_pool, self.limiter, headers={"Authorization": f"Bearer {auth_token}"})
+        self.content_client = self.make_client(self.content_pool, self.content_limiter,
+                                               headers={"Authorization": f"Bearer {auth_token}"})
 
-    def auth(self, auth_token: str) -> httpx.AsyncClient:
-        r = httpx.post(f"{self.url}users/get_current_account", headers={"Authorization": f"Bearer {auth_token}"})
+    async def check_token(self) -> None:
+        r = await self.client.post(f"{self.url}users/get_current_account")
         if r.status_code != 200:
             self.error_worker(
                 {"error": {".tag": "AuthError"},
                  "error_summary": "Ошибка авторизации в Dropbox. Проверьте/обновите данные"})
-        return httpx.AsyncClient(headers={"Authorization": auth_token})
 
     async def get_cloud_info(self) -> dict:
-        r = await self.client.post(f"{self.url}users/get_space_usage",
-                                   headers={"Authorization": f"Bearer {self.auth_token}"})
+        r = await self.client.post(f"{self.url}users/get_space_usage")
         if r.status_code != 200:
             return self.add_error(r)
         used_space = r.json()["used"]
-        r = await self.client.post(f"{self.url}users/get_current_account",
-                                   headers={"Authorization": f"Bearer {self.auth_token}"})
+        r = await self.client.post(f"{self.url}users/get_current_account")
         if r.status_code != httpx.codes.OK:
             return self.add_error(r)
         usage_info = r.json()
@@ -42,120 +64,307 @@ class Dropbox(Cloud):
             "total_space": -1
         }
 
-    async def get_folder_content(self, path_remote: str) -> dict:
-        headers = {"Authorization": f"Bearer {self.auth_token}",
-                   "Content-Type": "application/json"}
-        r = await self.client.post(f"{self.url}files/get_metadata", headers=headers,
-                                   json={"include_deleted": False, "include_has_explicit_shared_members": False,
-                                         "include_media_info": False, "path": f"{path_remote}"
-                                         })
-        if r.status_code != 200:
-            return self.error_worker(
-                {"error": {".tag": "NotFoundError"}, "error_summary": "Не удалось найти запрошенный ресурс."})
-        if r.json()['.tag'] != "folder":
-            return self.error_worker(
+    async def iter_folder(self, path_remote: str, page_size: int = None) -> AsyncIterator[list]:
+        if (await self.stat(path_remote))["type"] != "dir":
+            self.error_worker(
                 {"error": {".tag": "NotAFolderError"}, "error_summary": "Запрошенный ресурс не является папкой"})
+        async for content_info in self.list_folder_pages(path_remote, recursive=False, page_size=page_size):
+            page = []
+            for entry in content_info["entries"]:
+                if entry[".tag"] == "deleted":
+                    continue
+                info = self.normalize_metadata(entry, self.remote_join(path_remote, entry["name"]))
+                self.metadata.put(self.cache_key(info["path"]), info)
+                page.append(info)
+            yield page
 
-        r = await self.client.post(f"{self.url}files/list_folder",
-                                   json={"path": f"{path_remote}", "recursive": False, "include_media_info": False,
-                                         "include_deleted": False, "include_has_explicit_shared_members": False
-                                         }, headers=headers)
-        if r.status_code != 200:
-            return self.add_error(r)
+    async def list_folder_pages(self, path_remote: str, recursive: bool = False, page_size: int = None,
+                                cursor: str = None) -> AsyncIterator[dict]:
+        if cursor is None:
+            r = await self.client.post(f"{self.url}files/list_folder",
+                                       json={"path": "" if path_remote == "/" else path_remote,
+                                             "recursive": recursive,
+                                             "include_media_info": False, "include_deleted": False,
+                                             "include_has_explicit_shared_members": False,
+                                             "limit": page_size or self.page_size
+                                             })
+        else:
+            r = await self.client.post(f"{self.url}files/list_folder/continue", json={"cursor": cursor})
+        while True:
+            if r.status_code == httpx.codes.CONFLICT and self.error_tag(r) == "reset":
+                raise CursorResetError("CursorResetError. Курсор изменений устарел")
+            if r.status_code != 200:
+                self.add_error(r)
+            content_info = r.json()
+            yield content_info
+            if not content_info["has_more"]:
+                return
+            r = await self.client.post(f"{self.url}files/list_folder/continue",
+                                       json={"cursor": content_info["cursor"]})
 
-        content_info = r.json()
-        files = [entry["name"] for entry in content_info["entries"] if
-                 isinstance(entry, dict) and entry[".tag"] == "file"]
-        folders = [entry["name"] for entry in content_info["entries"] if
-                   isinstance(entry, dict) and entry[".tag"] == "folder"]
-        return {"folders": folders, "files": files}
-
-    async def download(self, path_remote: str, is_file: bool = True) -> bytes:
-        headers = {"Authorization": f"Bearer {self.auth_token}",
-                   "Content-Type": "application/json"}
-        r = await self.client.post(f"{self.url}files/get_metadata", headers=headers,
+    async def fetch_metadata(self, path_remote: str, missing_ok: bool = False) -> dict:
+        r = await self.client.post(f"{self.url}files/get_metadata",
                                    json={"include_deleted": False, "include_has_explicit_shared_members": False,
                                          "include_media_info": False, "path": f"{path_remote}"
                                          })
+        if r.status_code == 409 and missing_ok and "not_found" in r.text:
+            return None
         if r.status_code != 200:
             return self.error_worker(
                 {"error": {".tag": "NotFoundError"}, "error_summary": "Не удалось найти запрошенный ресурс."})
-        resp = r.json()
-        if resp['.tag'] == "folder" and is_file:
-            return self.error_worker(
-                {"error": {".tag": "NotAFileError"}, "error_summary": "Запрошенный ресурс не является файлом"})
-        elif resp['.tag'] != "folder" and not is_file:
-            return self.error_worker(
-                {"error": {".tag": "NotAFolderError"}, "error_summary": "Запрошенный ресурс не является папкой"})
+        return self.normalize_metadata(r.json(), path_remote)
+
+    @staticmethod
+    def normalize_metadata(entry: dict, path_remote: str) -> dict:
+        return {"path": path_remote, "name": entry.get("name"),
+                "type": "dir" if entry.get(".tag") == "folder" else "file",
+                "size": entry.get("size", 0), "modified": entry.get("server_modified"),
+                "hash": entry.get("content_hash"), "rev": entry.get("rev")}
+
+    def cache_key(self, path_remote: str) -> str:
+        return super().cache_key(path_remote).lower()
+
+    async def list_tree(self, path_remote: str) -> list:
+        return (await self.collect_tree(path_remote))[0]
+
+    async def list_changes(self, path_remote: str, cursor: str = None) -> tuple:
+        if cursor is not None:
+            try:
+                return *await self.collect_tree(path_remote, cursor), False
+            except CursorResetError:
+                pass
+        return *await self.collect_tree(path_remote), True
+
+    async def collect_tree(self, path_remote: str, cursor: str = None) -> tuple:
+        root = path_remote.rstrip("/")
+        entries = []
+        async for content_info in self.list_folder_pages(path_remote, recursive=True, cursor=cursor):
+            for entry in content_info["entries"]:
+                relative = entry["path_display"][len(root):].lstrip("/")
+                if not relative:
+                    continue
+                if entry[".tag"] == "deleted":
+                    self.forget(self.remote_join(path_remote, relative), recursive=True)
+                    entries.append({"path": relative, "type": "deleted"})
+                    continue
+                info = self.normalize_metadata(entry, self.remote_join(path_remote, relative))
+                self.metadata.put(self.cache_key(info["path"]), info)
+                entries.append(dict(info, path=relative))
+            cursor = content_info["cursor"]
+        return entries, cursor
+
+    @asynccontextmanager
+    async def download_stream(self, path_remote: str, is_file: bool = True, verify: bool = True,
+                              headers: dict = None) -> AsyncIterator[httpx.Response]:
+        if verify:
+            resource_type = (await self.stat(path_remote))["type"]
+            if resource_type == "dir" and is_file:
+                self.error_worker(
+                    {"error": {".tag": "NotAFileError"}, "error_summary": "Запрошенный ресурс не является файлом"})
+            elif resource_type != "dir" and not is_file:
+                self.error_worker(
+                    {"error": {".tag": "NotAFolderError"}, "error_summary": "Запрошенный ресурс не является папкой"})
         dropbox_api_arg = json.dumps({"path": f"{path_remote}"})
 
         headers = {
-            "Authorization": f"Bearer {self.auth_token}",
-            "Dropbox-API-Arg": dropbox_api_arg
+            "Dropbox-API-Arg": dropbox_api_arg,
+            **(headers or {})
         }
         if is_file:
-            r = await self.client.post(f"https://content.dropboxapi.com/2/files/download", headers=headers)
+            url = f"{self.content_url}files/download"
         else:
-            r = await self.client.post(f"https://content.dropboxapi.com/2/files/download_zip", headers=headers)
-        if r.status_code != 200:
-            return self.add_error(r)
-        return r.content
+            url = f"{self.content_url}files/download_zip"
+        async with self.content_client.stream("POST", url, headers=headers) as r:
+            if r.status_code not in (httpx.codes.OK, httpx.codes.PARTIAL_CONTENT,
+                                     httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE):
+                await r.aread()
+                self.add_error(r)
+            yield r
+
+    def response_rev(self, response: httpx.Response) -> str:
+        return json.loads(response.headers.get("Dropbox-API-Result", "{}")).get("rev")
 
     async def download_file(self, path_remote: str, path_local: str) -> dict:
-        if path.isdir(path.abspath(path_local)):
+        if await self.fs.isdir(path.abspath(path_local)):
             return self.error_worker(
                 {"error": {".tag": "FileNotFoundError"}, "error_summary": f"Неверный путь: {path.abspath(path_local)}"})
-        await self.save_file(path_local, await self.download(path_remote), {"error": {".tag": "FileNotFoundError"},
-                                                                            "error_summary": f"Неверный путь: {path.abspath(path_local)}"})
+        await self.save_stream(path_remote, path_local, {"error": {".tag": "FileNotFoundError"},
+                                                         "error_summary": f"Неверный путь: {path.abspath(path_local)}"})
         return {"status": "ok"}
 
-    async def download_folder(self, path_remote: str, path_local: str) -> dict:
-        if path.isfile(path.abspath(path_local)):
+    async def download_folder(self, path_remote: str, path_local: str, mode: str = "auto") -> dict:
+        if await self.fs.isfile(path.abspath(path_local)):
             return self.error_worker(
                 {"error": {".tag": "FileNotFoundError"}, "error_summary": f"Неверный путь: {path.abspath(path_local)}"})
-        await self.zip_save_with_extraction(path_remote, path_local, {"error": {".tag": "FileNotFoundError"},
-                                                                      "error_summary": f"Неверный путь: {path.abspath(path_local)}"})
+        await self.save_folder(path_remote, path_local, {"error": {".tag": "FileNotFoundError"},
+                                                         "error_summary": f"Неверный путь: {path.abspath(path_local)}"},
+                               mode)
         return {"status": "ok"}
 
     async def upload_file(self, path_local: str, path_remote: str) -> dict:
-        data = {
-            "path": f"{path_remote}",
-            "mode": "add",
-            "autorename": True,
-            "mute": False
-        }
         try:
-            if path.isdir(path.abspath(path_local)):
+            if await self.fs.isdir(path.abspath(path_local)):
                 return self.error_worker(
                     {"error": {".tag": "NotAFileError"}, "error_summary": "Загружаемый ресурс не является файлом"})
-            async with aiofiles.open(path_local, "rb") as f:
-                headers = {
-                    "Authorization": f"Bearer {self.auth_token}",
-                    "Dropbox-API-Arg": json.dumps(data),
-                    "Content-Type": "application/octet-stream"
-                }
-                r = await self.client.post("https://content.dropboxapi.com/2/files/upload", headers=headers,
-                                           content=f)
-                if r.status_code != 200:
-                    return self.add_error(r)
+            size = await self.fs.getsize(path_local)
+            if await self.is_unchanged(path_local, await self.stat(path_remote, missing_ok=True)):
+                return {"status": "skipped"}
         except FileNotFoundError:
-            return self.error_worker({
-                "error": {".tag": "FileNotFoundError"},
-                "error_summary": f"Файл не найден: {path_local}"
-            })
+            return self.file_not_found(path_local)
+        return await self.upload_local(path_local, path_remote, size)
 
-        if r.status_code == 200:
-            return {"status": "ok"}
-        else:
+    async def upload_local(self, path_local: str, path_remote: str, size: int = None) -> dict:
+        try:
+            if size is None:
+                size = await self.fs.getsize(path_local)
+            self.forget(path_remote)
+            if size > self.upload_session_threshold:
+                return await self.upload_large_file(path_local, path_remote, size)
+            return await self.upload_content(FileBody(path_local, self.upload_buffer_size, length=size, fs=self.fs),
+                                             path_remote)
+        except FileNotFoundError:
+            return self.file_not_found(path_local)
+
+    def file_not_found(self, path_local: str) -> dict:
+        return self.error_worker({
+            "error": {".tag": "FileNotFoundError"},
+            "error_summary": f"Файл не найден: {path_local}"
+        })
+
+    async def upload_content(self, content, path_remote: str) -> dict:
+        headers = {
+            "Dropbox-API-Arg": json.dumps(self.commit_info(path_remote)),
+            "Content-Type": "application/octet-stream",
+            **body_headers(content)
+        }
+        r = await self.content_client.post(f"{self.content_url}files/upload", headers=headers, content=content)
+        if r.status_code != 200:
             return self.add_error(r)
+        return {"status": "ok"}
 
-    async def create_folder(self, path_remote: str) -> dict:
-        data = {"path": f"{path_remote}", "autorename": False}
+    async def upload_stream(self, chunks: AsyncIterator[bytes], path_remote: str, size: int = None) -> dict:
+        self.forget(path_remote)
+        buffer = bytearray()
+        session_id = None
+        offset = 0
+        async for data in chunks:
+            buffer += data
+            while len(buffer) >= self.upload_chunk_size:
+                chunk = bytes(buffer[:self.upload_chunk_size])
+                del buffer[:self.upload_chunk_size]
+                if session_id is None:
+                    session_id = await self.upload_session_start(chunk)
+                else:
+                    await self.upload_session_append(session_id, offset, chunk)
+                offset += len(chunk)
+        if size is not None and offset + len(buffer) != size:
+            return self.error_worker({"error": {".tag": "StreamSizeError"},
+                                      "error_summary": f"Получено {offset + len(buffer)} байт вместо {size}"})
+        if session_id is None:
+            return await self.upload_content(bytes(buffer), path_remote)
+        return await self.upload_session_finish(session_id, offset, bytes(buffer), path_remote)
+
+    async def upload_large_file(self, path_local: str, path_remote: str, size: int) -> dict:
+        session_id = None
+        offset = 0
+        try:
+            while True:
+                length = min(self.upload_chunk_size, size - offset)
+                chunk = FileBody(path_local, self.upload_buffer_size, offset, length, fs=self.fs)
+                is_last = offset + length >= size
+                if session_id is None:
+                    session_id = await self.upload_session_start(chunk)
+                elif is_last:
+                    return await self.upload_session_finish(session_id, offset, chunk, path_remote)
+                else:
+                    await self.upload_session_append(session_id, offset, chunk)
+                offset += length
+                if is_last:
+                    return await self.upload_session_finish(session_id, offset, b"", path_remote)
+        except FileChangedError:
+            return self.error_worker({"error": {".tag": "FileChangedError"},
+                                      "error_summary": f"Файл изменился во время загрузки: {path_local}"})
+
+    async def upload_session_start(self, chunk: Union[bytes, FileBody], close: bool = False) -> str:
+        r = await self.upload_session_call("upload_session/start", {"close": close}, chunk)
+        return r.json()["session_id"]
+
+    async def upload_session_append(self, session_id: str, offset: int, chunk: Union[bytes, FileBody]) -> None:
+        await self.upload_session_call("upload_session/append_v2",
+                                       {"cursor": {"session_id": session_id, "offset": offset}, "close": False},
+                                       chunk)
+
+    async def upload_session_finish(self, session_id: str, offset: int, chunk: Union[bytes, FileBody],
+                                    path_remote: str) -> dict:
+        await self.upload_session_call("upload_session/finish",
+                                       {"cursor": {"session_id": session_id, "offset": offset},
+                                        "commit": self.commit_info(path_remote)},
+                                       chunk)
+        return {"status": "ok"}
+
+    async def upload_session_call(self, endpoint: str, arg: dict, chunk: Union[bytes, FileBody]) -> httpx.Response:
         headers = {
-            "Authorization": f"Bearer {self.auth_token}",
-            "Content-Type": "application/json"
+            "Dropbox-API-Arg": json.dumps(arg),
+            "Content-Type": "application/octet-stream",
+            **body_headers(chunk)
+        }
+        r = await self.content_client.post(f"{self.content_url}files/{endpoint}", headers=headers, content=chunk)
+        if r.status_code != 200:
+            return self.add_error(r)
+        return r
+
+    async def upload_session_finish_batch(self, entries: list) -> None:
+        for entry in entries:
+            self.forget(entry["commit"]["path"])
+        r = await self.client.post(f"{self.url}files/upload_session/finish_batch_v2", json={"entries": entries})
+        if r.status_code != 200:
+            return self.add_error(r)
+        answer = await self.wait_for_job(r.json(), "files/upload_session/finish_batch/check")
+        if answer.get(".tag") == "failed":
+            return self.error_worker({"error": {".tag": "BatchUploadError"},
+                                      "error_summary": "Не удалось сохранить загруженные файлы"})
+        failed = [entry["commit"]["path"] for entry, result in zip(entries, answer["entries"])
+                  if result[".tag"] == "failure"]
+        if failed:
+            return self.error_worker({"error": {".tag": "BatchUploadError"},
+                                      "error_summary": f"Не удалось сохранить файлы: {', '.join(failed)}"})
+
+    async def wait_for_job(self, answer: dict, check_endpoint: str) -> dict:
+        job_id = answer.get("async_job_id")
+        while job_id is not None and answer.get(".tag") in ("async_job_id", "in_progress"):
+            await asyncio.sleep(self.batch_poll_interval)
+            r = await self.client.post(f"{self.url}{check_endpoint}", json={"async_job_id": job_id})
+            if r.status_code != 200:
+                return self.add_error(r)
+            answer = r.json()
+        return answer
+
+    @asynccontextmanager
+    async def upload_batch(self) -> AsyncIterator[Callable[[str, str], Awaitable[dict]]]:
+        if not self.batch_upload:
+            yield self.upload_local
+            return
+        batch = UploadBatch(self)
+        try:
+            yield batch.upload
+        except Exception:
+            await batch.flush(everything=True)
+            raise
+        await batch.flush(everything=True)
+
+    @staticmethod
+    def commit_info(path_remote: str) -> dict:
+        return {
+            "path": f"{path_remote}",
+            "mode": "overwrite",
+            "autorename": True,
+            "mute": False
         }
-        r = await self.client.post("https://api.dropboxapi.com/2/files/create_folder_v2", json=data, headers=headers)
+
+    async def create_folder(self, path_remote: str) -> dict:
+        self.forget(path_remote)
+        data = {"path": f"{path_remote}", "autorename": False}
+        r = await self.client.post(f"{self.url}files/create_folder_v2", json=data)
         if r.status_code == 200:
             return {"status": "ok"}
         else:
@@ -165,11 +374,77 @@ class Dropbox(Cloud):
                                                            "существует."})
             return self.add_error(r)
 
+    async def ensure_folder(self, path_remote: str) -> None:
+        await self.create_folders([path_remote])
+
+    async def create_folders(self, paths: list) -> None:
+        for i in range(0, len(paths), self.create_folder_batch_size):
+            batch = paths[i:i + self.create_folder_batch_size]
+            r = await self.client.post(f"{self.url}files/create_folder_batch",
+                                       json={"paths": batch, "autorename": False, "force_async": False})
+            if r.status_code != 200:
+                return self.add_error(r)
+            answer = await self.wait_for_job(r.json(), "files/create_folder_batch/check")
+            if answer.get(".tag") == "failed":
+                return self.error_worker({"error": {".tag": "FolderBatchError"},
+                                          "error_summary": "Не удалось создать папки"})
+            failed = [path_remote for path_remote, result in zip(batch, answer["entries"])
+                      if result[".tag"] == "failure" and not self.is_folder_conflict(result["failure"])]
+            if failed:
+                return self.error_worker({"error": {".tag": "FolderBatchError"},
+                                          "error_summary": f"Не удалось создать папки: {', '.join(failed)}"})
+
+    async def relocate_entry(self, path_from: str, path_to: str, move: bool) -> None:
+        endpoint = "move_v2" if move else "copy_v2"
+        r = await self.client.post(f"{self.url}files/{endpoint}",
+                                   json={"from_path": path_from, "to_path": path_to, "autorename": False})
+        if r.status_code == 409:
+            return self.relocation_error([path_from], move, r.json().get("error_summary", ""))
+        if r.status_code != 200:
+            return self.add_error(r)
+
+    async def relocate_entries(self, pairs: list, move: bool) -> None:
+        if len(pairs) == 1:
+            return await self.relocate_entry(*pairs[0], move)
+        operation = "move_batch" if move else "copy_batch"
+        for i in range(0, len(pairs), self.relocate_batch_size):
+            batch = pairs[i:i + self.relocate_batch_size]
+            r = await self.client.post(f"{self.url}files/{operation}_v2",
+                                       json={"entries": [{"from_path": path_from, "to_path": path_to}
+                                                         for path_from, path_to in batch], "autorename": False})
+            if r.status_code != 200:
+                return self.add_error(r)
+            answer = await self.wait_for_job(r.json(), f"files/{operation}/check_v2")
+            if answer.get(".tag") == "failed":
+                return self.relocation_error([path_from for path_from, _ in batch], move, "")
+            failed = [path_from for (path_from, _), result in zip(batch, answer["entries"])
+                      if result[".tag"] == "failure"]
+            if failed:
+                return self.relocation_error(failed, move, "")
+
+    def relocation_error(self, paths: list, move: bool, reason: str):
+        summary = f"Не удалось {'переместить' if move else 'скопировать'}: {', '.join(paths)}"
+        if reason:
+            summary += f" ({reason})"
+        return self.error_worker({"error": {".tag": "RelocationError"}, "error_summary": summary})
+
+    @staticmethod
+    def is_folder_conflict(failure: dict) -> bool:
+        conflict = failure.get("path", {})
+        return conflict.get(".tag") == "conflict" and conflict.get("conflict", {}).get(".tag") == "folder"
+
     @staticmethod
     def error_worker(response: dict):
         with SystemClass.except_handler(SystemClass.exchandler):
             raise Exception(f"{response['error']['.tag']}. {response['error_summary']}")
 
+    @staticmethod
+    def error_tag(response: httpx.Response) -> str:
+        try:
+            return response.json()["error"][".tag"]
+        except (ValueError, KeyError, TypeError):
+            return None
+
     @staticmethod
     def add_error(response: httpx.Response):
         try:
@@ -178,5 +453,35 @@ class Dropbox(Cloud):
             return Dropbox.error_worker({"error": {".tag": "Error"}, "error_summary": f"{response.status_code}"})
 
 
+class UploadBatch:
+    def __init__(self, cloud: Dropbox) -> None:
+        self.cloud = cloud
+        self.entries = []
+        self.lock = asyncio.Lock()
+
+    async def upload(self, path_local: str, path_remote: str) -> dict:
+        try:
+            size = await self.cloud.fs.getsize(path_local)
+            if size > self.cloud.upload_session_threshold:
+                self.cloud.forget(path_remote)
+                return await self.cloud.upload_large_file(path_local, path_remote, size)
+            body = FileBody(path_local, self.cloud.upload_buffer_size, length=size, fs=self.cloud.fs)
+            session_id = await self.cloud.upload_session_start(body, close=True)
+        except FileNotFoundError:
+            return self.cloud.file_not_found(path_local)
+        self.entries.append({"cursor": {"session_id": session_id, "offset": size},
+                             "commit": self.cloud.commit_info(path_remote)})
+        if len(self.entries) >= self.cloud.finish_batch_size:
+            await self.flush()
+        return {"status": "ok"}
+
+    async def flush(self, everything: bool = False) -> None:
+        async with self.lock:
+            while len(self.entries) >= self.cloud.finish_batch_size or (everything and self.entries):
+                entries = self.entries[:self.cloud.finish_batch_size]
+                del self.entries[:len(entries)]
+                await self.cloud.upload_session_finish_batch(entries)
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import threading
+from os import path
+
+from system_class import SystemClass
+
+from .hashing import HashPool
+from .local_fs import LocalFS
+
+
+class HashCache:
+    def __init__(self, path_db: str = None, pool: HashPool = None, fs: LocalFS = None) -> None:
+        self.path_db = path_db
+        self.pool = pool or HashPool()
+        self.own_fs = fs is None
+        self.fs = fs or LocalFS(1)
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path_db or path.join(SystemClass.state_dir(), "hashes.sqlite"),
+                                              isolation_level=None, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS hashes (inode INTEGER, size INTEGER, mtime INTEGER, "
+                                    "algorithm TEXT, digest TEXT, PRIMARY KEY (inode, size, mtime, algorithm))")
+        return self.connection
+
+    async def digest(self, path_local: str, algorithm: str) -> str:
+        key, digest = await self.fs.run(self.lookup, path_local, algorithm)
+        if digest is None:
+            digest = await self.pool.digest(path_local, algorithm, key[1])
+            await self.fs.run(self.store, key, digest)
+        return digest
+
+    def lookup(self, path_local: str, algorithm: str) -> tuple:
+        info = os.stat(path_local)
+        key = (info.st_ino, info.st_size, info.st_mtime_ns, algorithm)
+        with self.lock:
+            row = self.connect().execute("SELECT digest FROM hashes WHERE inode = ? AND size = ? AND mtime = ? "
+                                         "AND algorithm = ?", key).fetchone()
+        return key, None if row is None else row[0]
+
+    def store(self, key: tuple, digest: str) -> None:
+        with self.lock:
+            self.connect().execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)", (*key, digest))
+
+    def close(self) -> None:
+        self.pool.close()
+        if self.own_fs:
+            self.fs.close()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,58 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+DROPBOX_BLOCK_SIZE = 4 * 2 ** 20
+READ_SIZE = 8 * 2 ** 20
+
+
+def blocks(path_local: str, block_size: int) -> Iterator[memoryview]:
+    buffer = bytearray(block_size)
+    view = memoryview(buffer)
+    with open(path_local, "rb") as file:
+        while size := file.readinto(buffer):
+            yield view[:size]
+
+
+def dropbox_content_hash(path_local: str) -> str:
+    block_hashes = hashlib.sha256()
+    for block in blocks(path_local, DROPBOX_BLOCK_SIZE):
+        block_hashes.update(hashlib.sha256(block).digest())
+    return block_hashes.hexdigest()
+
+
+def file_digest(path_local: str, algorithm: str = "sha256") -> str:
+    digest = hashlib.new(algorithm)
+    for block in blocks(path_local, READ_SIZE):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def compute_digest(path_local: str, algorithm: str) -> str:
+    if algorithm == "dropbox":
+        return dropbox_content_hash(path_local)
+    return file_digest(path_local, algorithm)
+
+
+class HashPool:
+    def __init__(self, workers: int = None, process_threshold: int = 16 * 2 ** 20) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.process_threshold = process_threshold
+        self.executor = None
+
+    async def digest(self, path_local: str, algorithm: str, size: int = None) -> str:
+        if size is None:
+            size = os.path.getsize(path_local)
+        if size < self.process_threshold or self.workers < 2:
+            return await asyncio.to_thread(compute_digest, path_local, algorithm)
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return await asyncio.get_running_loop().run_in_executor(self.executor, compute_digest, path_local, algorithm)
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
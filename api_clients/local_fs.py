@@ -0,0 +1,97 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from os import path
+from typing import AsyncIterator, Callable, Iterable
+
+
+class LocalFS:
+    def __init__(self, workers: int = 8) -> None:
+        self.workers = max(1, workers)
+        self.executor = None
+
+    async def run(self, function: Callable, *args, **kwargs):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="local-fs")
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(function, *args, **kwargs))
+
+    async def isdir(self, path_local: str) -> bool:
+        return await self.run(path.isdir, path_local)
+
+    async def isfile(self, path_local: str) -> bool:
+        return await self.run(path.isfile, path_local)
+
+    async def getsize(self, path_local: str) -> int:
+        return await self.run(path.getsize, path_local)
+
+    async def stat(self, path_local: str) -> os.stat_result:
+        return await self.run(os.stat, path_local)
+
+    async def makedirs(self, paths: Iterable[str]) -> None:
+        await self.run(self.make_folders, list(paths))
+
+    async def remove(self, *paths: str) -> None:
+        await self.run(self.remove_files, paths)
+
+    async def replace(self, path_from: str, path_to: str) -> None:
+        await self.run(os.replace, path_from, path_to)
+
+    async def read_json(self, path_json: str) -> dict:
+        return await self.run(self.load_json, path_json)
+
+    async def write_json(self, path_json: str, value) -> None:
+        await self.run(self.dump_json, path_json, value)
+
+    async def scan(self, folders: Iterable[str]) -> AsyncIterator[tuple]:
+        tasks = [asyncio.ensure_future(self.run(self.list_folder, folder)) for folder in folders]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def close(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    @staticmethod
+    def list_folder(folder: str) -> tuple:
+        folders, files = [], []
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append(entry.path)
+                elif entry.is_file():
+                    info = entry.stat()
+                    files.append((entry.path, info.st_size, info.st_mtime))
+        return folder, folders, files
+
+    @staticmethod
+    def make_folders(paths: list) -> None:
+        for path_local in paths:
+            os.makedirs(path_local, exist_ok=True)
+
+    @staticmethod
+    def remove_files(paths: Iterable[str]) -> None:
+        for path_local in paths:
+            try:
+                os.remove(path_local)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def load_json(path_json: str) -> dict:
+        try:
+            with open(path_json, encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    @staticmethod
+    def dump_json(path_json: str, value) -> None:
+        with open(path_json, "w", encoding="utf-8") as file:
+            json.dump(value, file)
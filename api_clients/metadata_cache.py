@@ -0,0 +1,37 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class MetadataCache:
+    def __init__(self, ttl: float = 30, max_size: int = 10_000) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: dict) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key: str, recursive: bool = False) -> None:
+        self.entries.pop(key, None)
+        if recursive:
+            prefix = key.rstrip("/") + "/"
+            for child in [child for child in self.entries if child.startswith(prefix)]:
+                del self.entries[child]
+
+    def clear(self) -> None:
+        self.entries.clear()
@@ -0,0 +1,98 @@
+import sqlite3
+from os import path
+
+from system_class import SystemClass
+
+from .api_client import Cloud
+
+COLUMNS = ("path", "parent", "name", "type", "size", "modified", "hash", "rev")
+
+
+class RemoteIndex:
+    def __init__(self, cloud_name: str, path_db: str = None) -> None:
+        self.cloud_name = cloud_name
+        self.path_db = path_db
+        self.connection = None
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path_db or path.join(SystemClass.state_dir(), "index.sqlite"))
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(
+                "CREATE TABLE IF NOT EXISTS entries (cloud TEXT, path TEXT, parent TEXT, name TEXT, type TEXT, "
+                "size INTEGER, modified TEXT, hash TEXT, rev TEXT, PRIMARY KEY (cloud, path));"
+                "CREATE INDEX IF NOT EXISTS entries_parent ON entries (cloud, parent);"
+                "CREATE INDEX IF NOT EXISTS entries_name ON entries (cloud, name COLLATE NOCASE);"
+                "CREATE TABLE IF NOT EXISTS cursors (cloud TEXT PRIMARY KEY, cursor TEXT);")
+        return self.connection
+
+    async def refresh(self, cloud: Cloud, full: bool = False) -> dict:
+        connection = self.connect()
+        row = connection.execute("SELECT cursor FROM cursors WHERE cloud = ?", (self.cloud_name,)).fetchone()
+        entries, cursor, complete = await cloud.index_changes(None if full or row is None else row[0])
+        with connection:
+            if complete:
+                connection.execute("DELETE FROM entries WHERE cloud = ?", (self.cloud_name,))
+            rows = []
+            for entry in entries:
+                if entry["type"] != "deleted":
+                    rows.append(self.row(entry))
+                    continue
+                self.insert(connection, rows, complete)
+                rows = []
+                key = self.key(entry["path"])
+                connection.execute("DELETE FROM entries WHERE cloud = ? AND (path = ? OR path LIKE ? ESCAPE '\\')",
+                                   (self.cloud_name, key, self.escape(key) + "/%"))
+            self.insert(connection, rows, complete)
+            connection.execute("INSERT OR REPLACE INTO cursors VALUES (?, ?)", (self.cloud_name, cursor))
+        total = connection.execute("SELECT COUNT(*) FROM entries WHERE cloud = ?", (self.cloud_name,)).fetchone()
+        return {"changes": len(entries), "entries": total[0], "complete": complete}
+
+    def find(self, pattern: str, entry_type: str = None, limit: int = None) -> list:
+        query = "SELECT path, type, size FROM entries WHERE cloud = ? AND name LIKE ? ESCAPE '\\'"
+        params = [self.cloud_name, self.escape(pattern).replace("*", "%").replace("?", "_")]
+        if entry_type is not None:
+            query += " AND type = ?"
+            params.append(entry_type)
+        query += " ORDER BY path"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [dict(zip(("path", "type", "size"), row)) for row in self.connect().execute(query, params)]
+
+    def list_folder(self, path_remote: str) -> list:
+        rows = self.connect().execute("SELECT name, type FROM entries WHERE cloud = ? AND parent = ? ORDER BY name",
+                                      (self.cloud_name, self.key(path_remote)))
+        return [{"name": name, "type": entry_type} for name, entry_type in rows]
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def insert(self, connection: sqlite3.Connection, rows: list, complete: bool = True) -> None:
+        if not rows:
+            return
+        placeholders = ', '.join('?' * len(COLUMNS))
+        if not complete:
+            parents = {row[2] for row in rows if row[2] != "/"}
+            for parent in list(parents):
+                while (parent := parent.rsplit("/", 1)[0]) and parent not in parents:
+                    parents.add(parent)
+            connection.executemany(f"INSERT OR IGNORE INTO entries VALUES (?, {placeholders})",
+                                   [self.row({"path": parent, "type": "dir"}) for parent in sorted(parents)])
+        connection.executemany(f"INSERT OR REPLACE INTO entries VALUES (?, {placeholders})", rows)
+
+    def row(self, entry: dict) -> tuple:
+        key = self.key(entry["path"])
+        parent, name = key.rsplit("/", 1)
+        return (self.cloud_name, key, parent or "/", name, entry["type"], entry.get("size"), entry.get("modified"),
+                entry.get("hash"), entry.get("rev"))
+
+    @staticmethod
+    def key(relative: str) -> str:
+        return "/" + relative.strip("/")
+
+    @staticmethod
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
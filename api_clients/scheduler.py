@@ -0,0 +1,69 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterable, Awaitable, Callable, Iterable, Union
+
+Jobs = Union[Iterable[tuple], AsyncIterable[tuple]]
+
+
+class TransferScheduler:
+    def __init__(self, concurrency: int = 8, large_file_size: int = 64 * 2 ** 20) -> None:
+        self.concurrency = max(1, concurrency)
+        self.large_file_size = large_file_size
+        self.large_workers = max(1, self.concurrency // 2)
+
+    async def run(self, jobs: Jobs, worker: Callable[..., Awaitable]) -> None:
+        small = deque()
+        large = deque()
+        ready = asyncio.Condition()
+        produced = False
+        errors = []
+
+        async def produce() -> None:
+            nonlocal produced
+            try:
+                async for size, args in self.iterate(jobs):
+                    async with ready:
+                        if size >= self.large_file_size:
+                            large.append(args)
+                        else:
+                            await ready.wait_for(lambda: len(small) < self.concurrency * 2)
+                            small.append(args)
+                        ready.notify_all()
+            finally:
+                async with ready:
+                    produced = True
+                    ready.notify_all()
+
+        async def consume(prefer_large: bool) -> None:
+            while True:
+                async with ready:
+                    await ready.wait_for(lambda: small or large or produced)
+                    if not small and not large:
+                        return
+                    first, second = (large, small) if prefer_large else (small, large)
+                    args = (first or second).popleft()
+                    ready.notify_all()
+                try:
+                    await worker(*args)
+                except Exception as e:
+                    errors.append(e)
+
+        tasks = [asyncio.ensure_future(produce())]
+        tasks += [asyncio.ensure_future(consume(i < self.large_workers)) for i in range(self.concurrency)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    async def iterate(jobs: Jobs) -> AsyncIterable[tuple]:
+        if hasattr(jobs, "__aiter__"):
+            async for job in jobs:
+                yield job
+        else:
+            for job in jobs:
+                yield job
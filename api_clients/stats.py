@@ -0,0 +1,66 @@
+import json
+import time
+
+
+class RequestStats:
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.entries = []
+
+    def record(self, entry: dict) -> None:
+        self.entries.append(entry)
+
+    def summary(self) -> dict:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        endpoints = {}
+        for entry in self.entries:
+            endpoints.setdefault((entry["cloud"], entry["endpoint"]), []).append(entry)
+        sent = sum(entry["sent"] for entry in self.entries)
+        received = sum(entry["received"] for entry in self.entries)
+        return {"requests": len(self.entries), "retries": sum(entry["retries"] for entry in self.entries),
+                "errors": sum(self.failed(entry) for entry in self.entries), "seconds": elapsed,
+                "sent": sent, "received": received, "throughput": (sent + received) / elapsed,
+                "endpoints": [self.aggregate(cloud, endpoint, entries)
+                              for (cloud, endpoint), entries in sorted(endpoints.items())]}
+
+    def aggregate(self, cloud: str, endpoint: str, entries: list) -> dict:
+        latencies = sorted(entry["latency"] for entry in entries)
+        return {"cloud": cloud, "endpoint": endpoint, "requests": len(entries),
+                "retries": sum(entry["retries"] for entry in entries),
+                "errors": sum(self.failed(entry) for entry in entries),
+                "sent": sum(entry["sent"] for entry in entries),
+                "received": sum(entry["received"] for entry in entries),
+                "queue_wait": sum(entry["queue_wait"] for entry in entries) / len(entries),
+                "p50": self.percentile(latencies, 0.5), "p90": self.percentile(latencies, 0.9),
+                "p99": self.percentile(latencies, 0.99)}
+
+    def lines(self) -> list:
+        summary = self.summary()
+        lines = [f"Запросов: {summary['requests']}, повторов: {summary['retries']}, ошибок: {summary['errors']}, "
+                 f"время: {summary['seconds']:.2f} с, передано: {self.megabytes(summary['sent'])} МБ, "
+                 f"получено: {self.megabytes(summary['received'])} МБ, "
+                 f"скорость: {self.megabytes(summary['throughput'])} МБ/с"]
+        for row in summary["endpoints"]:
+            lines.append(f"{row['cloud']:8} {row['endpoint']:40} {row['requests']:6} запр. "
+                         f"p50 {row['p50'] * 1000:8.1f} мс p90 {row['p90'] * 1000:8.1f} мс "
+                         f"p99 {row['p99'] * 1000:8.1f} мс очередь {row['queue_wait'] * 1000:7.1f} мс "
+                         f"повторов {row['retries']}")
+        return lines
+
+    def export(self, path_trace: str) -> None:
+        with open(path_trace, "w", encoding="utf-8") as file:
+            json.dump({"summary": self.summary(), "requests": self.entries}, file, ensure_ascii=False, indent=1)
+
+    @staticmethod
+    def failed(entry: dict) -> bool:
+        return entry["status"] is None or entry["status"] >= 400
+
+    @staticmethod
+    def percentile(values: list, share: float) -> float:
+        if not values:
+            return 0.0
+        return values[round(share * (len(values) - 1))]
+
+    @staticmethod
+    def megabytes(size: float) -> str:
+        return f"{size / 2 ** 20:.2f}"
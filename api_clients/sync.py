@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import json
+from os import makedirs, path, replace
+
+from system_class import SystemClass
+
+from .api_client import Cloud
+from .scheduler import TransferScheduler
+
+REMOTE_FIELDS = ("type", "size", "modified", "hash", "rev")
+
+
+class FolderSync:
+    def __init__(self, cloud: Cloud, cloud_name: str, path_local: str, path_remote: str) -> None:
+        self.cloud = cloud
+        self.path_local = path.abspath(path_local)
+        self.path_remote = path_remote
+        key = hashlib.sha1(f"{cloud_name}|{self.path_local}|{path_remote}".encode()).hexdigest()
+        self.state_path = path.join(SystemClass.state_dir(), "sync", f"{key}.json")
+        self.state = {"cursor": None, "remote": {}, "local": {}}
+        self.stats = {"transferred": 0, "skipped": 0}
+
+    async def run(self, direction: str = "upload") -> dict:
+        self.load_state()
+        if direction == "upload":
+            await self.cloud.ensure_folders([self.path_remote] if self.path_remote.strip("/") else [])
+        remote = await self.remote_files()
+        folders, files = await self.scan_local()
+        try:
+            if direction == "upload":
+                await self.upload(folders, files, remote)
+            else:
+                await self.download(files, remote)
+        finally:
+            self.save_state()
+        return self.stats
+
+    async def remote_files(self) -> dict:
+        entries, cursor, complete = await self.cloud.list_changes(self.path_remote, self.state["cursor"])
+        remote = {} if complete else self.state["remote"]
+        for entry in entries:
+            if entry["type"] == "deleted":
+                prefix = entry["path"] + "/"
+                for relative in [relative for relative in remote
+                                 if relative == entry["path"] or relative.startswith(prefix)]:
+                    del remote[relative]
+            else:
+                remote[entry["path"]] = {field: entry.get(field) for field in REMOTE_FIELDS}
+        self.state["cursor"] = cursor
+        self.state["remote"] = remote
+        return remote
+
+    async def scan_local(self) -> tuple:
+        folders = []
+        files = {}
+        if not await self.cloud.fs.isdir(self.path_local):
+            return folders, files
+        level = {self.path_local: ""}
+        while level:
+            next_level = {}
+            async for folder_local, children, entries in self.cloud.fs.scan(level):
+                for child in children:
+                    next_level[child] = f"{level[folder_local]}/{path.basename(child)}".lstrip("/")
+                    folders.append(next_level[child])
+                for file_local, size, mtime in entries:
+                    relative = f"{level[folder_local]}/{path.basename(file_local)}".lstrip("/")
+                    files[relative] = {"path": file_local, "size": size, "mtime": mtime}
+            level = next_level
+        return folders, files
+
+    async def unchanged(self, relative: str, local: dict, remote: dict) -> bool:
+        if local is None or remote is None or remote["type"] != "file" or local["size"] != remote["size"]:
+            return False
+        known = self.state["local"].get(relative)
+        if known == {"size": local["size"], "mtime": local["mtime"], "rev": remote["rev"]}:
+            return True
+        if remote["hash"] is None or await self.cloud.local_hash(local["path"]) != remote["hash"]:
+            return False
+        self.remember(relative, local, remote["rev"])
+        return True
+
+    async def select(self, names: list, files: dict, remote: dict) -> list:
+        semaphore = asyncio.Semaphore(self.cloud.upload_workers)
+
+        async def check(relative: str) -> bool:
+            async with semaphore:
+                return await self.unchanged(relative, files.get(relative), remote.get(relative))
+
+        skipped = await asyncio.gather(*(check(relative) for relative in names))
+        self.stats["skipped"] += sum(skipped)
+        return [relative for relative, skip in zip(names, skipped) if not skip]
+
+    async def upload(self, folders: list, files: dict, remote: dict) -> None:
+        levels = {}
+        for relative in folders:
+            if remote.get(relative, {}).get("type") != "dir":
+                levels.setdefault(relative.count("/"), []).append(self.cloud.remote_join(self.path_remote, relative))
+        for depth in sorted(levels):
+            await self.cloud.ensure_folders(levels[depth])
+
+        changed = await self.select(list(files), files, remote)
+
+        async def transfer(relative: str) -> None:
+            await upload(files[relative]["path"], self.cloud.remote_join(self.path_remote, relative))
+            self.remember(relative, files[relative], None)
+            self.stats["transferred"] += 1
+
+        jobs = ((files[relative]["size"], (relative,)) for relative in changed)
+        async with self.cloud.upload_batch() as upload:
+            await TransferScheduler(self.cloud.upload_workers, self.cloud.large_file_size).run(jobs, transfer)
+
+    async def download(self, files: dict, remote: dict) -> None:
+        await self.cloud.fs.makedirs(self.local_path(relative) for relative, info in remote.items()
+                                     if info["type"] == "dir")
+        changed = await self.select([relative for relative, info in remote.items() if info["type"] == "file"],
+                                    files, remote)
+
+        async def transfer(relative: str) -> None:
+            file_local = self.local_path(relative)
+            await self.cloud.fs.makedirs([path.dirname(file_local)])
+            await self.cloud.download_file(self.cloud.remote_join(self.path_remote, relative), file_local)
+            info = await self.cloud.fs.stat(file_local)
+            self.remember(relative, {"size": info.st_size, "mtime": info.st_mtime}, remote[relative]["rev"])
+            self.stats["transferred"] += 1
+
+        jobs = ((remote[relative]["size"], (relative,)) for relative in changed)
+        await TransferScheduler(self.cloud.download_workers, self.cloud.large_file_size).run(jobs, transfer)
+
+    def remember(self, relative: str, local: dict, rev: str) -> None:
+        self.state["local"][relative] = {"size": local["size"], "mtime": local["mtime"], "rev": rev}
+
+    def local_path(self, relative: str) -> str:
+        return path.join(self.path_local, *relative.split("/"))
+
+    def load_state(self) -> None:
+        if path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as file:
+                self.state.update(json.load(file))
+
+    def save_state(self) -> None:
+        makedirs(path.dirname(self.state_path), exist_ok=True)
+        with open(f"{self.state_path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(self.state, file)
+        replace(f"{self.state_path}.tmp", self.state_path)
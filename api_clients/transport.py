@@ -0,0 +1,242 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from importlib.util import find_spec
+from os import path
+from typing import AsyncIterator, Callable
+
+import httpx
+
+RETRY_STATUSES = (httpx.codes.TOO_MANY_REQUESTS, httpx.codes.INTERNAL_SERVER_ERROR, httpx.codes.BAD_GATEWAY,
+                  httpx.codes.SERVICE_UNAVAILABLE, httpx.codes.GATEWAY_TIMEOUT)
+THROTTLE_STATUSES = (httpx.codes.TOO_MANY_REQUESTS, httpx.codes.SERVICE_UNAVAILABLE)
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+class PoolConfig:
+    def __init__(self, max_connections: int = 16, max_keepalive_connections: int = None, keepalive_expiry: float = 60,
+                 http2: bool = True, timeout: float = 30) -> None:
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_connections if max_keepalive_connections is None \
+            else max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and find_spec("h2") is not None
+        self.timeout = timeout
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(max_connections=self.max_connections,
+                            max_keepalive_connections=self.max_keepalive_connections,
+                            keepalive_expiry=self.keepalive_expiry)
+
+
+class AdaptiveLimiter:
+    def __init__(self, limit: int = 16, min_limit: int = 1, max_limit: int = 64, cooldown: float = 1) -> None:
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.decreased_at = float("-inf")
+        self.condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self) -> None:
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_throttle(self) -> None:
+        now = time.monotonic()
+        if now - self.decreased_at >= self.cooldown:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self.decreased_at = now
+
+
+class FileChangedError(OSError):
+    pass
+
+
+class FileBody:
+    def __init__(self, path_local: str, chunk_size: int = 4 * 2 ** 20, offset: int = 0, length: int = None,
+                 fs=None) -> None:
+        self.path_local = path_local
+        self.chunk_size = chunk_size
+        self.offset = offset
+        self.length = path.getsize(path_local) - offset if length is None else length
+        self.fs = fs
+
+    def headers(self) -> dict:
+        return {"Content-Length": str(self.length)}
+
+    async def read(self, file, buffer: memoryview) -> int:
+        if self.fs is None:
+            return await asyncio.to_thread(file.readinto, buffer)
+        return await self.fs.run(file.readinto, buffer)
+
+    async def __aiter__(self) -> AsyncIterator[memoryview]:
+        if self.length <= 0:
+            return
+        with open(self.path_local, "rb", buffering=0) as file:
+            file.seek(self.offset)
+            size = min(self.chunk_size, self.length)
+            buffers = [memoryview(bytearray(size)), memoryview(bytearray(min(size, self.length - size)))]
+            remaining = self.length
+            pending = asyncio.ensure_future(self.read(file, buffers[0][:size]))
+            current = 0
+            try:
+                while remaining:
+                    size = await pending
+                    if not size:
+                        raise FileChangedError(f"Файл изменился во время загрузки: {self.path_local}")
+                    remaining -= size
+                    if remaining:
+                        following = buffers[1 - current][:min(self.chunk_size, remaining)]
+                        pending = asyncio.ensure_future(self.read(file, following))
+                    yield buffers[current][:size]
+                    current = 1 - current
+            finally:
+                if not pending.done():
+                    await asyncio.wait([pending])
+                if not pending.cancelled():
+                    pending.exception()
+
+
+def body_headers(content) -> dict:
+    return content.headers() if isinstance(content, FileBody) else {}
+
+
+class LimitedStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, limiter: AdaptiveLimiter,
+                 on_close: Callable[[int], None] = None) -> None:
+        self.stream = stream
+        self.limiter = limiter
+        self.on_close = on_close
+        self.received = 0
+        self.closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            self.received += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self.stream.aclose()
+        finally:
+            await self.limiter.release()
+            if self.on_close is not None:
+                self.on_close(self.received)
+
+
+class RetryTransport(httpx.AsyncBaseTransport):
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: AdaptiveLimiter, max_retries: int = 5,
+                 backoff_base: float = 0.5, backoff_max: float = 30,
+                 recorder: Callable[[httpx.Request, dict], None] = None,
+                 idempotent: Callable[[httpx.Request], bool] = None, retry_after_max: float = 300) -> None:
+        self.transport = transport
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.recorder = recorder
+        self.idempotent = idempotent or (lambda request: request.method in IDEMPOTENT_METHODS)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        attempt = 0
+        started = time.monotonic()
+        queue_wait = 0.0
+        while True:
+            waiting = time.monotonic()
+            await self.limiter.acquire()
+            queue_wait += time.monotonic() - waiting
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                await self.limiter.release()
+                if attempt >= self.max_retries or not self.retryable(request, error=e):
+                    self.record(request, None, 0, started, queue_wait, attempt)
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                await self.limiter.release()
+                raise
+            if response.status_code in THROTTLE_STATUSES:
+                self.limiter.on_throttle()
+            elif not response.is_error:
+                self.limiter.on_success()
+            delay = self.retry_after(response)
+            if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries \
+                    or not self.retryable(request, response.status_code) \
+                    or (delay is not None and delay > self.retry_after_max):
+                status, retries = response.status_code, attempt
+                on_close = None if self.recorder is None else \
+                    lambda received: self.record(request, status, received, started, queue_wait, retries)
+                return httpx.Response(response.status_code, headers=response.headers,
+                                      stream=LimitedStream(response.stream, self.limiter, on_close),
+                                      extensions=response.extensions)
+            await response.aclose()
+            await self.limiter.release()
+            await asyncio.sleep(self.backoff(attempt) if delay is None else delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+    def record(self, request: httpx.Request, status: int, received: int, started: float, queue_wait: float,
+               retries: int) -> None:
+        if self.recorder is None:
+            return
+        self.recorder(request, {"status": status, "sent": self.sent(request), "received": received,
+                                "queue_wait": queue_wait, "latency": time.monotonic() - started - queue_wait,
+                                "retries": retries})
+
+    def backoff(self, attempt: int) -> float:
+        return min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1)
+
+    @staticmethod
+    def retry_after(response: httpx.Response) -> float:
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def sent(request: httpx.Request) -> int:
+        if "Content-Length" in request.headers:
+            return int(request.headers["Content-Length"])
+        body = getattr(request.stream, "_stream", None)
+        return body.length if isinstance(body, FileBody) else 0
+
+    def retryable(self, request: httpx.Request, status: int = None, error: httpx.TransportError = None) -> bool:
+        if not self.replayable(request):
+            return False
+        if self.idempotent(request):
+            return True
+        return isinstance(error, UNSENT_ERRORS) if error is not None else status in THROTTLE_STATUSES
+
+    @staticmethod
+    def replayable(request: httpx.Request) -> bool:
+        return isinstance(request.stream, httpx.ByteStream) or isinstance(getattr(request.stream, "_stream", None),
+                                                                          FileBody)
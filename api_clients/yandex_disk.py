@@ -1,25 +1,38 @@
+import asyncio
+from contextlib import asynccontextmanager
 from os import path
+from typing import AsyncIterator
 
-import aiofiles
 import httpx
 
 from system_class import SystemClass
 
 from .api_client import Cloud
+from .transport import FileBody, PoolConfig, body_headers
+
+
+STAT_FIELDS = "name,path,type,size,modified,md5,sha256,file,revision"
+LIST_FIELDS = ",".join(["type"] + [f"_embedded.items.{field}" for field in STAT_FIELDS.split(",")]
+                       + ["_embedded.total"])
+LAST_UPLOADED_FIELDS = ",".join(f"items.{field}" for field in STAT_FIELDS.split(","))
 
 
 class YandexDisk(Cloud):
+    operation_poll_interval = 0.5
+    idempotent_endpoints = ("upload",)
 
-    def __init__(self, auth_token: str):
+    def __init__(self, auth_token: str, api_pool: PoolConfig = None, content_pool: PoolConfig = None):
+        super().__init__(api_pool, content_pool)
         self.url = "https://cloud-api.yandex.net/v1/disk/"
-        self.client = self.auth(auth_token)
+        self.auth_token = auth_token
+        self.client = self.make_client(self.api_pool, self.limiter, headers={"Authorization": auth_token})
+        self.content_client = self.make_client(self.content_pool, self.content_limiter)
 
-    def auth(self, auth_token: str) -> httpx.AsyncClient:
-        r = httpx.get(self.url, headers={"Authorization": auth_token})
+    async def check_token(self) -> None:
+        r = await self.client.get(self.url)
         if r.is_error:
             self.error_worker(
                 {"error": "AuthError", "message": "Ошибка авторизации в Яндекс.Диске. Проверьте/обновите данные"})
-        return httpx.AsyncClient(headers={"Authorization": auth_token})
 
     async def get_cloud_info(self) -> dict:
         r = await self.client.get(self.url,
@@ -31,81 +44,197 @@ class YandexDisk(Cloud):
                 "total_space": answer["total_space"] / (2 ** 20),
                 "used_space": answer["used_space"] / (2 ** 20)}
 
-    async def get_folder_content(self, path_remote: str) -> dict:
-        r = await self.client.get(f"{self.url}resources",
-                                  params={"path": path_remote,
-                                          "fields": "type,_embedded.items.name,_embedded.items.type"})
+    async def iter_folder(self, path_remote: str, page_size: int = None) -> AsyncIterator[list]:
+        offset = 0
+        while True:
+            r = await self.client.get(f"{self.url}resources",
+                                      params={"path": path_remote, "limit": page_size or self.page_size,
+                                              "offset": offset, "fields": LIST_FIELDS})
+            answer = r.json()
+            if r.is_error:
+                self.error_worker(answer)
+            if answer["type"] != "dir":
+                self.error_worker({"error": "NotAFolder", "message": "Запрошенный ресурс не является папкой"})
+            items = answer["_embedded"]["items"]
+            page = []
+            for item in items:
+                info = self.normalize_metadata(item, self.remote_join(path_remote, item["name"]))
+                self.metadata.put(self.cache_key(info["path"]), info)
+                page.append(info)
+            yield page
+            offset += len(items)
+            if not items or offset >= answer["_embedded"]["total"]:
+                return
+
+    async def fetch_metadata(self, path_remote: str, missing_ok: bool = False) -> dict:
+        r = await self.client.get(f"{self.url}resources", params={"path": path_remote, "fields": STAT_FIELDS})
+        if r.status_code == httpx.codes.NOT_FOUND and missing_ok:
+            return None
         answer = r.json()
         if r.is_error:
             return self.error_worker(answer)
-        if answer["type"] != "dir":
-            return self.error_worker({"error": "NotAFolder", "message": "Запрошенный ресурс не является папкой"})
-        files = []
-        folders = []
-        for item in answer["_embedded"]["items"]:
-            if item["type"] == "dir":
-                folders.append(item["name"])
-            else:
-                files.append(item["name"])
-        return {"folders": folders, "files": files}
-
-    async def download(self, path_remote: str, is_file: bool = True) -> bytes:
-        r = await self.client.get(f"{self.url}resources/download", params={"path": path_remote, "fields": "href"})
+        return self.normalize_metadata(answer, path_remote)
+
+    @staticmethod
+    def normalize_metadata(item: dict, path_remote: str) -> dict:
+        revision = item.get("revision")
+        return {"path": path_remote, "name": item.get("name"), "type": item.get("type"), "size": item.get("size", 0),
+                "modified": item.get("modified"), "hash": item.get("sha256"), "md5": item.get("md5"),
+                "rev": str(revision) if revision is not None else item.get("md5"),
+                "download_url": item.get("file")}
+
+    async def list_tree(self, path_remote: str) -> list:
+        semaphore = asyncio.Semaphore(self.download_workers)
+
+        async def list_folder(relative: str) -> list:
+            async with semaphore:
+                return [info async for page in self.iter_folder(self.remote_join(path_remote, relative)
+                                                                if relative else path_remote)
+                        for info in page]
+
+        entries = []
+        folders = [""]
+        while folders:
+            pages = await asyncio.gather(*(list_folder(folder) for folder in folders))
+            next_folders = []
+            for folder, items in zip(folders, pages):
+                for item in items:
+                    relative = f"{folder}/{item['name']}".lstrip("/")
+                    entries.append(dict(item, path=relative))
+                    if item["type"] == "dir":
+                        next_folders.append(relative)
+            folders = next_folders
+        return entries
+
+    async def index_changes(self, cursor: str = None) -> tuple:
+        if cursor is None:
+            entries = await self.list_tree("/")
+            return entries, max((entry["modified"] for entry in entries if entry["modified"]), default=None), True
+        r = await self.client.get(f"{self.url}resources/last-uploaded",
+                                  params={"limit": self.page_size, "fields": LAST_UPLOADED_FIELDS})
         answer = r.json()
         if r.is_error:
             return self.error_worker(answer)
-        r_type = await self.client.get(f"{self.url}resources", params={"path": path_remote,
-                                                                       "fields": "type,_embedded.items.name,_embedded.items.type"})
-        resp = r_type.json()
-        if resp["type"] != "file" and is_file:
-            return self.error_worker({"error": "NotAFile", "message": "Запрошенный ресурс не является файлом"})
-        elif resp["type"] == "file" and not is_file:
-            return self.error_worker({"error": "NotAFolder", "message": "Запрошенный ресурс не является папкой"})
-        response = await self.client.get(answer["href"], follow_redirects=True)
-        if response.is_error:
-            if is_file:
-                error_msg = ("FileDownloadError", f"Не возможно скачать файл {path_remote}")
-            else:
-                error_msg = ("FolderDownloadError", f"Не возможно скачать папку {path_remote}")
-            return self.error_worker({"error": error_msg[0], "message": error_msg[1]})
-        return response.content
+        if len(answer["items"]) >= self.page_size and \
+                all((item.get("modified") or "") > cursor for item in answer["items"]):
+            return await self.index_changes()
+        entries = []
+        for item in answer["items"]:
+            if (item.get("modified") or "") <= cursor:
+                continue
+            path_remote = item["path"].removeprefix("disk:")
+            entries.append(dict(self.normalize_metadata(item, path_remote), path=path_remote.lstrip("/")))
+            cursor = max(cursor, item["modified"])
+        return entries, cursor, False
+
+    @asynccontextmanager
+    async def download_stream(self, path_remote: str, is_file: bool = True, verify: bool = True,
+                              headers: dict = None) -> AsyncIterator[httpx.Response]:
+        if verify:
+            info = await self.stat(path_remote)
+            if info["type"] != "file" and is_file:
+                self.error_worker({"error": "NotAFile", "message": "Запрошенный ресурс не является файлом"})
+            elif info["type"] == "file" and not is_file:
+                self.error_worker({"error": "NotAFolder", "message": "Запрошенный ресурс не является папкой"})
+        else:
+            info = self.metadata.get(self.cache_key(path_remote)) or {}
+        href = info.get("download_url") if is_file else None
+        if href is None:
+            r = await self.client.get(f"{self.url}resources/download", params={"path": path_remote, "fields": "href"})
+            answer = r.json()
+            if r.is_error:
+                self.error_worker(answer)
+            href = answer["href"]
+        async with self.content_client.stream("GET", href, headers=headers, follow_redirects=True) as response:
+            if response.is_error and response.status_code != httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE:
+                if is_file:
+                    error_msg = ("FileDownloadError", f"Не возможно скачать файл {path_remote}")
+                else:
+                    error_msg = ("FolderDownloadError", f"Не возможно скачать папку {path_remote}")
+                self.error_worker({"error": error_msg[0], "message": error_msg[1]})
+            yield response
 
     async def download_file(self, path_remote: str, path_local: str) -> dict:
-        if path.isdir(path.abspath(path_local)):
+        if await self.fs.isdir(path.abspath(path_local)):
             return self.error_worker(
                 {"error": "FileNotFoundError", "message": f"Неверный путь: {path.abspath(path_local)}"})
-        await self.save_file(path_local, await self.download(path_remote), {"error": "FileNotFoundError",
-                                                                            "message": f"Неверный путь: {path.abspath(path_local)}"})
+        await self.save_stream(path_remote, path_local, {"error": "FileNotFoundError",
+                                                         "message": f"Неверный путь: {path.abspath(path_local)}"})
         return {"status": "ok"}
 
-    async def download_folder(self, path_remote: str, path_local: str) -> dict:
-        if path.isfile(path.abspath(path_local)):
+    async def download_folder(self, path_remote: str, path_local: str, mode: str = "auto") -> dict:
+        if await self.fs.isfile(path.abspath(path_local)):
             return self.error_worker(
                 {"error": "FolderNotFoundError", "message": f"Неверный путь: {path.abspath(path_local)}"})
-        await self.zip_save_with_extraction(path_remote, path_local, {"error": "FileNotFoundError",
-                                                                      "message": f"Неверный путь: {path.abspath(path_local)}"})
+        await self.save_folder(path_remote, path_local, {"error": "FileNotFoundError",
+                                                         "message": f"Неверный путь: {path.abspath(path_local)}"},
+                               mode)
         return {"status": "ok"}
 
     async def upload_file(self, path_local: str, path_remote: str) -> dict:
-        if path.isdir(path.abspath(path_local)):
+        if await self.fs.isdir(path.abspath(path_local)):
             return self.error_worker({"error": "NotAFile", "message": "Загружаемый ресурс не является файлом"})
+        if await self.is_unchanged(path_local, await self.stat(path_remote, missing_ok=True)):
+            return {"status": "skipped"}
+        return await self.upload_local(path_local, path_remote)
+
+    async def upload_local(self, path_local: str, path_remote: str, size: int = None) -> dict:
+        if size is None:
+            size = await self.fs.getsize(path.abspath(path_local))
+        return await self.upload_content(FileBody(path.abspath(path_local), self.upload_buffer_size, length=size,
+                                                  fs=self.fs), path_remote)
+
+    async def upload_stream(self, chunks: AsyncIterator[bytes], path_remote: str, size: int = None) -> dict:
+        return await self.upload_content(chunks, path_remote, {} if size is None else {"Content-Length": str(size)})
+
+    async def upload_content(self, content, path_remote: str, headers: dict = None) -> dict:
+        self.forget(path_remote)
         r = await self.client.get(f"{self.url}resources/upload",
                                   params={"path": path_remote, "fields": "href", "overwrite": True})
         answer = r.json()
         if r.is_error:
             return self.error_worker(answer)
-        async with aiofiles.open(path.abspath(path_local), 'rb') as data:
-            r = await self.client.put(answer["href"], content=data)
+        r = await self.content_client.put(answer["href"], content=content, headers=headers or body_headers(content))
         if r.is_error:
             return self.error_worker(r.json())
         return {"status": "ok"}
 
     async def create_folder(self, path_remote: str) -> dict:
+        self.forget(path_remote)
         r = await self.client.put(f"{self.url}resources", params={"path": path_remote})
         if r.is_error:
             return self.error_worker(r.json())
         return {"status": "ok"}
 
+    async def ensure_folder(self, path_remote: str) -> None:
+        r = await self.client.put(f"{self.url}resources", params={"path": path_remote})
+        if r.is_error:
+            answer = r.json()
+            if answer.get("error") != "DiskPathPointsToExistentDirectoryError":
+                return self.error_worker(answer)
+
+    async def relocate_entry(self, path_from: str, path_to: str, move: bool) -> None:
+        r = await self.client.post(f"{self.url}resources/{'move' if move else 'copy'}",
+                                   params={"from": path_from, "path": path_to, "overwrite": False})
+        answer = r.json()
+        if r.is_error:
+            return self.error_worker(answer)
+        if r.status_code == httpx.codes.ACCEPTED:
+            await self.wait_for_operation(answer["href"])
+
+    async def wait_for_operation(self, href: str) -> None:
+        while True:
+            r = await self.client.get(href)
+            answer = r.json()
+            if r.is_error:
+                return self.error_worker(answer)
+            if answer["status"] == "success":
+                return
+            if answer["status"] == "failed":
+                return self.error_worker({"error": "OperationFailedError",
+                                          "message": "Операция копирования/перемещения завершилась с ошибкой"})
+            await asyncio.sleep(self.operation_poll_interval)
+
     @staticmethod
     def error_worker(response: dict):
         with SystemClass.except_handler(SystemClass.exchandler):
@@ -0,0 +1,234 @@
+import struct
+import zipfile
+import zlib
+from os import path
+
+import aiofiles
+
+from .local_fs import LocalFS
+
+LOCAL_FILE_HEADER = b"PK\x03\x04"
+DATA_DESCRIPTOR = b"PK\x07\x08"
+ARCHIVE_END = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06", b"PK\x06\x07")
+LOCAL_HEADER_FORMAT = "<4sHHHHHIIIHH"
+LOCAL_HEADER_SIZE = struct.calcsize(LOCAL_HEADER_FORMAT)
+ZIP64_EXTRA = 0x0001
+
+
+class ZipStreamParser:
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.member = None
+        self.finished = False
+
+    def feed(self, data: bytes) -> list:
+        events = []
+        if self.finished:
+            return events
+        self.buffer += data
+        while self.step(events):
+            pass
+        return events
+
+    def close(self) -> None:
+        if not self.finished:
+            raise zipfile.BadZipFile("Архив оборвался до конца")
+
+    def step(self, events: list) -> bool:
+        if self.member is None:
+            return self.read_header(events)
+        if self.member["descriptor_pending"]:
+            return self.read_descriptor(events)
+        return self.read_data(events)
+
+    def read_header(self, events: list) -> bool:
+        if len(self.buffer) < 4:
+            return False
+        signature = bytes(self.buffer[:4])
+        if signature in ARCHIVE_END:
+            self.finished = True
+            self.buffer.clear()
+            return False
+        if signature != LOCAL_FILE_HEADER:
+            raise zipfile.BadZipFile("Неверная сигнатура заголовка файла в архиве")
+        if len(self.buffer) < LOCAL_HEADER_SIZE:
+            return False
+        (_, _, flags, method, _, _, crc, compressed_size, file_size,
+         name_length, extra_length) = struct.unpack_from(LOCAL_HEADER_FORMAT, self.buffer)
+        header_end = LOCAL_HEADER_SIZE + name_length + extra_length
+        if len(self.buffer) < header_end:
+            return False
+        raw_name = bytes(self.buffer[LOCAL_HEADER_SIZE:LOCAL_HEADER_SIZE + name_length])
+        extra = bytes(self.buffer[LOCAL_HEADER_SIZE + name_length:header_end])
+        del self.buffer[:header_end]
+
+        if flags & 0x1:
+            raise zipfile.BadZipFile("Зашифрованные архивы не поддерживаются")
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise zipfile.BadZipFile(f"Неподдерживаемый метод сжатия: {method}")
+        zip64 = False
+        for field_id, field in self.extra_fields(extra):
+            if field_id == ZIP64_EXTRA:
+                zip64 = True
+                values = list(struct.unpack_from(f"<{len(field) // 8}Q", field))
+                if file_size == 0xFFFFFFFF and values:
+                    file_size = values.pop(0)
+                if compressed_size == 0xFFFFFFFF and values:
+                    compressed_size = values.pop(0)
+        has_descriptor = bool(flags & 0x8)
+
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        self.member = {
+            "name": name,
+            "is_dir": name.endswith("/"),
+            "method": method,
+            "crc": crc,
+            "remaining": None if has_descriptor and (method == zipfile.ZIP_DEFLATED or compressed_size == 0)
+            else compressed_size,
+            "has_descriptor": has_descriptor,
+            "descriptor_pending": False,
+            "zip64": zip64,
+            "decompressor": zlib.decompressobj(-zlib.MAX_WBITS) if method == zipfile.ZIP_DEFLATED else None,
+            "compressed": 0,
+            "size": 0,
+            "actual_crc": 0,
+        }
+        events.append(("dir" if self.member["is_dir"] else "open", name))
+        return True
+
+    def read_data(self, events: list) -> bool:
+        member = self.member
+        decompressor = member["decompressor"]
+        if member["remaining"] is None and decompressor is None:
+            return self.read_stored(events)
+        if member["remaining"] is None:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            output = decompressor.decompress(data)
+            if decompressor.eof:
+                self.buffer += decompressor.unused_data
+                data = data[:len(data) - len(decompressor.unused_data)]
+            member["compressed"] += len(data)
+            self.emit(output, events)
+            if not decompressor.eof:
+                return False
+        else:
+            data = bytes(self.buffer[:member["remaining"]])
+            del self.buffer[:len(data)]
+            member["remaining"] -= len(data)
+            member["compressed"] += len(data)
+            if decompressor is None:
+                self.emit(data, events)
+            else:
+                self.emit(decompressor.decompress(data), events)
+                if member["remaining"] == 0:
+                    self.emit(decompressor.flush(), events)
+            if member["remaining"]:
+                return False
+        if member["has_descriptor"]:
+            member["descriptor_pending"] = True
+            return True
+        return self.finish_member(events)
+
+    def read_stored(self, events: list) -> bool:
+        member = self.member
+        index = self.buffer.find(DATA_DESCRIPTOR)
+        if index < 0:
+            self.consume(max(len(self.buffer) - len(DATA_DESCRIPTOR) + 1, 0), events)
+            return False
+        if len(self.buffer) < index + 12:
+            self.consume(index, events)
+            return False
+        crc, compressed_size = struct.unpack_from("<2I", self.buffer, index + 4)
+        if (crc, compressed_size) != (zlib.crc32(self.buffer[:index], member["actual_crc"]),
+                                      (member["compressed"] + index) & 0xFFFFFFFF):
+            self.consume(index + 1, events)
+            return True
+        self.consume(index, events)
+        member["descriptor_pending"] = True
+        return True
+
+    def consume(self, length: int, events: list) -> None:
+        data = bytes(self.buffer[:length])
+        del self.buffer[:length]
+        self.member["compressed"] += len(data)
+        self.emit(data, events)
+
+    def read_descriptor(self, events: list) -> bool:
+        member = self.member
+        offset = 4 if self.buffer[:4] == DATA_DESCRIPTOR else 0
+        if len(self.buffer) < offset + 20:
+            return False
+        crc, compressed_size, file_size = struct.unpack_from("<3I", self.buffer, offset)
+        length = offset + 12
+        if member["zip64"] or (compressed_size, file_size) != (member["compressed"] & 0xFFFFFFFF,
+                                                               member["size"] & 0xFFFFFFFF):
+            length = offset + 20
+        member["crc"] = crc
+        del self.buffer[:length]
+        return self.finish_member(events)
+
+    def finish_member(self, events: list) -> bool:
+        member = self.member
+        if not member["is_dir"]:
+            if member["actual_crc"] != member["crc"]:
+                raise zipfile.BadZipFile(f"Неверная контрольная сумма файла {member['name']}")
+            events.append(("close", member["name"]))
+        self.member = None
+        return True
+
+    def emit(self, data: bytes, events: list) -> None:
+        if not data:
+            return
+        self.member["size"] += len(data)
+        self.member["actual_crc"] = zlib.crc32(data, self.member["actual_crc"])
+        events.append(("data", data))
+
+    @staticmethod
+    def extra_fields(extra: bytes):
+        position = 0
+        while position + 4 <= len(extra):
+            field_id, size = struct.unpack_from("<HH", extra, position)
+            yield field_id, extra[position + 4:position + 4 + size]
+            position += 4 + size
+
+
+class ZipStreamExtractor:
+    def __init__(self, path_local: str, fs: LocalFS = None) -> None:
+        self.path_local = path.abspath(path_local)
+        self.parser = ZipStreamParser()
+        self.own_fs = fs is None
+        self.fs = fs or LocalFS(1)
+        self.file = None
+
+    async def feed(self, data: bytes) -> None:
+        events = await self.fs.run(self.parser.feed, data)
+        for event, value in events:
+            if event == "data":
+                await self.file.write(value)
+            elif event == "open":
+                target = self.target_path(value)
+                await self.fs.makedirs([path.dirname(target)])
+                self.file = await aiofiles.open(target, "wb")
+            elif event == "close":
+                await self.file.close()
+                self.file = None
+            elif event == "dir":
+                await self.fs.makedirs([self.target_path(value)])
+
+    async def __aenter__(self) -> "ZipStreamExtractor":
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        if self.file is not None:
+            await self.file.close()
+            self.file = None
+        if self.own_fs:
+            self.fs.close()
+        if exc_type is None:
+            self.parser.close()
+
+    def target_path(self, name: str) -> str:
+        parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+        parts = [path.splitdrive(part)[1] for part in parts]
+        return path.join(self.path_local, *parts)
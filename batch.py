@@ -0,0 +1,116 @@
+import asyncio
+import csv
+import json
+import sys
+import time
+
+from cloud_boss import CLOUDS
+
+OPERATIONS = {"upload": ("cloud", "path_local", "path_remote"),
+              "download": ("cloud", "path_remote", "path_local"),
+              "create_folder": ("cloud", "path_remote"),
+              "copy": ("from_cloud", "path_from", "to_cloud", "path_to"),
+              "move": ("cloud", "path_from", "path_to")}
+
+
+class BatchRunner:
+    def __init__(self, boss, concurrency: int = 8) -> None:
+        self.boss = boss
+        self.concurrency = max(1, concurrency)
+        self.stats = {"ok": 0, "error": 0}
+
+    async def run(self, path_manifest: str, output) -> dict:
+        operations = iter(self.read_manifest(path_manifest))
+
+        async def worker() -> None:
+            for line, operation in operations:
+                result = await self.execute(line, operation)
+                self.stats[result["status"]] += 1
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return self.stats
+
+    @staticmethod
+    def read_manifest(path_manifest: str):
+        with open(path_manifest, encoding="utf-8", newline="") as file:
+            if path_manifest.lower().endswith(".csv"):
+                for line, row in enumerate(csv.DictReader(file), start=2):
+                    yield line, {key: value for key, value in row.items() if value}
+                return
+            for line, text in enumerate(file, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    operation = json.loads(text)
+                except ValueError as e:
+                    operation = {"error": f"Некорректная строка манифеста: {e}"}
+                yield line, operation if isinstance(operation, dict) else {"error": "Операция должна быть объектом"}
+
+    async def execute(self, line: int, operation: dict) -> dict:
+        result = {"line": line, "op": operation.get("op")}
+        started = time.monotonic()
+        try:
+            if "error" in operation:
+                raise ValueError(operation["error"])
+            fields = OPERATIONS.get(operation.get("op"))
+            if fields is None:
+                raise ValueError(f"Неизвестная операция: {operation.get('op')}")
+            missing = [field for field in fields if not operation.get(field)]
+            if missing:
+                raise ValueError(f"Не заданы поля: {', '.join(missing)}")
+            unknown = [operation[field] for field in fields if field.endswith("cloud")
+                       and operation[field].lower() not in CLOUDS]
+            if unknown:
+                raise ValueError(f"Неизвестное облако: {', '.join(unknown)}")
+            result.update(await getattr(self, operation["op"])(*(operation[field] for field in fields)))
+            result["status"] = "ok"
+        except Exception as e:
+            result.update(status="error", error=str(e) or type(e).__name__)
+        result["seconds"] = round(time.monotonic() - started, 3)
+        return result
+
+    async def cloud(self, cloud_name: str):
+        return await self.boss.get_cloud(cloud_name.lower())
+
+    async def upload(self, cloud_name: str, path_local: str, path_remote: str) -> dict:
+        cloud = await self.cloud(cloud_name)
+        if await cloud.fs.isdir(path_local):
+            await cloud.upload_folder(path_local, path_remote)
+            return {"type": "dir"}
+        if not await cloud.fs.isfile(path_local):
+            raise FileNotFoundError(f"IncorrectPath. Неверный путь: {path_local}")
+        await cloud.upload_file(path_local, path_remote)
+        return {"type": "file"}
+
+    async def download(self, cloud_name: str, path_remote: str, path_local: str) -> dict:
+        cloud = await self.cloud(cloud_name)
+        if (await cloud.stat(path_remote))["type"] == "dir":
+            await cloud.download_folder(path_remote, path_local)
+            return {"type": "dir"}
+        await cloud.download_file(path_remote, path_local)
+        return {"type": "file"}
+
+    async def create_folder(self, cloud_name: str, path_remote: str) -> dict:
+        await (await self.cloud(cloud_name)).create_folder(path_remote)
+        return {}
+
+    async def copy(self, from_cloud: str, path_from: str, to_cloud: str, path_to: str) -> dict:
+        from api_clients.cloud_copy import CloudCopy
+        source = await self.cloud(from_cloud)
+        target = await self.cloud(to_cloud)
+        if source is target:
+            await source.copy(path_from, path_to)
+            return {"server_side": True}
+        return dict(await CloudCopy(source, target).run(path_from, path_to))
+
+    async def move(self, cloud_name: str, path_from: str, path_to: str) -> dict:
+        await (await self.cloud(cloud_name)).move(path_from, path_to)
+        return {}
+
+
+def open_output(path_results: str):
+    if path_results == "-":
+        return sys.stdout
+    return open(path_results, "w", encoding="utf-8")
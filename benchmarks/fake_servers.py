@@ -0,0 +1,407 @@
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+import zipfile
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+DROPBOX_BLOCK = 4 * 2 ** 20
+
+
+def dropbox_hash(data: bytes) -> str:
+    blocks = b"".join(hashlib.sha256(data[i:i + DROPBOX_BLOCK]).digest() for i in range(0, len(data), DROPBOX_BLOCK))
+    return hashlib.sha256(blocks).hexdigest()
+
+
+class FakeStore:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.entries = {"/": {"type": "dir"}}
+        self.revision = 0
+
+    def put_file(self, path_remote: str, data: bytes) -> dict:
+        with self.lock:
+            self.revision += 1
+            self.add_parents(path_remote)
+            self.entries[path_remote] = {"type": "file", "data": data, "rev": f"{self.revision:09x}",
+                                         "modified": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                                         "sha256": hashlib.sha256(data).hexdigest(),
+                                         "md5": hashlib.md5(data).hexdigest(), "content_hash": dropbox_hash(data)}
+            return self.entries[path_remote]
+
+    def make_dir(self, path_remote: str) -> bool:
+        with self.lock:
+            if path_remote in self.entries:
+                return False
+            self.add_parents(path_remote)
+            self.entries[path_remote] = {"type": "dir"}
+            return True
+
+    def add_parents(self, path_remote: str) -> None:
+        parent = path_remote.rsplit("/", 1)[0]
+        while parent and parent not in self.entries:
+            self.entries[parent] = {"type": "dir"}
+            parent = parent.rsplit("/", 1)[0]
+
+    def get(self, path_remote: str) -> dict:
+        return self.entries.get(path_remote)
+
+    def children(self, path_remote: str, recursive: bool = False) -> list:
+        prefix = path_remote.rstrip("/") + "/"
+        with self.lock:
+            names = [name for name in self.entries if name.startswith(prefix) and name != "/"]
+        if not recursive:
+            names = [name for name in names if "/" not in name[len(prefix):]]
+        return sorted(names)
+
+    def zip_folder(self, path_remote: str) -> bytes:
+        root = path_remote.rstrip("/")
+        base = root.rsplit("/", 1)[-1] or "root"
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+            for name in self.children(path_remote, recursive=True):
+                entry = self.entries[name]
+                arcname = f"{base}{name[len(root):]}"
+                if entry["type"] == "dir":
+                    archive.writestr(arcname + "/", b"")
+                else:
+                    archive.writestr(arcname, entry["data"])
+        return buffer.getvalue()
+
+
+class FakeServer:
+    def __init__(self, latency: float = 0, bandwidth: float = None, throttle_rate: float = 0,
+                 seed: int = 0) -> None:
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.store = FakeStore()
+        self.sessions = {}
+        self.cursors = {}
+        self.throttled = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self.handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def __enter__(self) -> "FakeServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def should_throttle(self) -> bool:
+        if self.throttle_rate and self.random.random() < self.throttle_rate:
+            self.throttled += 1
+            return True
+        return False
+
+    def handler_class(self) -> type:
+        server = self
+
+        class Handler(FakeHandler):
+            fake = server
+
+        return Handler
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeServer = None
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self.dispatch("GET")
+
+    def do_POST(self) -> None:
+        self.dispatch("POST")
+
+    def do_PUT(self) -> None:
+        self.dispatch("PUT")
+
+    def dispatch(self, method: str) -> None:
+        body = self.read_body()
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        if self.fake.should_throttle():
+            return self.send_json({"error": "TooManyRequests", "message": "slow down",
+                                   "error_summary": "too_many_requests/"}, 429, {"Retry-After": "0"})
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path.startswith("/2/"):
+            return DropboxRoutes(self, body).handle(url.path[len("/2/"):])
+        return YandexRoutes(self, body, params).handle(method, url.path)
+
+    def read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                parts.append(self.read_exactly(size))
+                self.rfile.readline()
+            return b"".join(parts)
+        return self.read_exactly(int(self.headers.get("Content-Length") or 0))
+
+    def read_exactly(self, size: int) -> bytes:
+        data = self.rfile.read(size)
+        self.throttle_bandwidth(len(data))
+        return data
+
+    def throttle_bandwidth(self, size: int) -> None:
+        if self.fake.bandwidth:
+            time.sleep(size / self.fake.bandwidth)
+
+    def send_json(self, payload: dict, status: int = 200, headers: dict = None) -> None:
+        self.send_bytes(json.dumps(payload).encode(), status,
+                        dict(headers or {}, **{"Content-Type": "application/json"}))
+
+    def send_bytes(self, data: bytes, status: int = 200, headers: dict = None) -> None:
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        for i in range(0, len(data), 2 ** 16):
+            self.throttle_bandwidth(min(2 ** 16, len(data) - i))
+            self.wfile.write(data[i:i + 2 ** 16])
+
+    def send_range(self, data: bytes, headers: dict) -> None:
+        requested = self.headers.get("Range", "")
+        if requested.startswith("bytes=") and requested.endswith("-"):
+            start = int(requested[len("bytes="):-1])
+            headers = dict(headers, **{"Content-Range": f"bytes {start}-{len(data) - 1}/{len(data)}"})
+            return self.send_bytes(data[start:], 206, headers)
+        return self.send_bytes(data, 200, headers)
+
+
+class DropboxRoutes:
+    def __init__(self, handler: FakeHandler, body: bytes) -> None:
+        self.handler = handler
+        self.store = handler.fake.store
+        self.sessions = handler.fake.sessions
+        self.cursors = handler.fake.cursors
+        self.body = body
+
+    def handle(self, endpoint: str) -> None:
+        route = getattr(self, endpoint.replace("/", "__"), None)
+        if route is None:
+            return self.error(404, "unknown_endpoint/")
+        return route()
+
+    def arg(self) -> dict:
+        if "Dropbox-API-Arg" in self.handler.headers:
+            return json.loads(self.handler.headers["Dropbox-API-Arg"])
+        return json.loads(self.body or b"{}")
+
+    def error(self, status: int, summary: str) -> None:
+        tag = summary.split("/")[0]
+        self.handler.send_json({"error_summary": summary, "error": {".tag": tag}}, status)
+
+    def metadata(self, path_remote: str) -> dict:
+        entry = self.store.get(path_remote)
+        name = path_remote.rsplit("/", 1)[1]
+        if entry["type"] == "dir":
+            return {".tag": "folder", "name": name, "path_display": path_remote, "path_lower": path_remote.lower()}
+        return {".tag": "file", "name": name, "path_display": path_remote, "path_lower": path_remote.lower(),
+                "size": len(entry["data"]), "rev": entry["rev"], "server_modified": entry["modified"],
+                "content_hash": entry["content_hash"]}
+
+    @staticmethod
+    def root(path_remote: str) -> str:
+        return path_remote or "/"
+
+    def users__get_current_account(self) -> None:
+        self.handler.send_json({"email": "bench@example.com", "name": {"display_name": "Bench"},
+                                "account_id": "bench"})
+
+    def users__get_space_usage(self) -> None:
+        self.handler.send_json({"used": 0, "allocation": {"allocated": 2 ** 40}})
+
+    def files__get_metadata(self) -> None:
+        path_remote = self.arg()["path"]
+        if self.store.get(path_remote) is None:
+            return self.error(409, "path/not_found/")
+        self.handler.send_json(self.metadata(path_remote))
+
+    def files__list_folder(self) -> None:
+        arg = self.arg()
+        path_remote = self.root(arg["path"])
+        if self.store.get(path_remote) is None:
+            return self.error(409, "path/not_found/")
+        names = self.store.children(path_remote, arg.get("recursive", False))
+        self.send_page(names, 0, arg.get("limit", 1000))
+
+    def files__list_folder__continue(self) -> None:
+        cursor = self.arg()["cursor"]
+        if cursor not in self.cursors:
+            return self.error(409, "reset/")
+        names, offset, limit = self.cursors[cursor]
+        self.send_page(names, offset, limit)
+
+    def send_page(self, names: list, offset: int, limit: int) -> None:
+        page = names[offset:offset + limit]
+        cursor = f"cursor-{len(self.cursors)}-{time.perf_counter_ns()}"
+        self.cursors[cursor] = (names, offset + len(page), limit)
+        self.handler.send_json({"entries": [self.metadata(name) for name in page], "cursor": cursor,
+                                "has_more": offset + len(page) < len(names)})
+
+    def files__upload(self) -> None:
+        path_remote = self.arg()["path"]
+        self.store.put_file(path_remote, self.body)
+        self.handler.send_json(self.metadata(path_remote))
+
+    def files__upload_session__start(self) -> None:
+        session_id = hashlib.sha1(f"{time.perf_counter_ns()}{id(self)}".encode()).hexdigest()
+        self.sessions[session_id] = bytearray(self.body)
+        self.handler.send_json({"session_id": session_id})
+
+    def files__upload_session__append_v2(self) -> None:
+        cursor = self.arg()["cursor"]
+        session = self.sessions[cursor["session_id"]]
+        if cursor["offset"] != len(session):
+            return self.error(409, "incorrect_offset/")
+        session += self.body
+        self.handler.send_json(None)
+
+    def files__upload_session__finish(self) -> None:
+        arg = self.arg()
+        session = self.sessions.pop(arg["cursor"]["session_id"]) + self.body
+        self.store.put_file(arg["commit"]["path"], bytes(session))
+        self.handler.send_json(self.metadata(arg["commit"]["path"]))
+
+    def files__upload_session__finish_batch_v2(self) -> None:
+        results = []
+        for entry in self.arg()["entries"]:
+            session = self.sessions.pop(entry["cursor"]["session_id"])
+            self.store.put_file(entry["commit"]["path"], bytes(session))
+            results.append(dict(self.metadata(entry["commit"]["path"]), **{".tag": "success"}))
+        self.handler.send_json({"entries": results})
+
+    def files__create_folder_v2(self) -> None:
+        path_remote = self.arg()["path"]
+        if not self.store.make_dir(path_remote):
+            return self.error(409, "path/conflict/folder/")
+        self.handler.send_json({"metadata": self.metadata(path_remote)})
+
+    def files__create_folder_batch(self) -> None:
+        results = []
+        for path_remote in self.arg()["paths"]:
+            if self.store.make_dir(path_remote):
+                results.append({".tag": "success", "metadata": self.metadata(path_remote)})
+            else:
+                results.append({".tag": "failure", "failure": {".tag": "path", "path": {
+                    ".tag": "conflict", "conflict": {".tag": "folder"}}}})
+        self.handler.send_json({".tag": "complete", "entries": results})
+
+    def files__download(self) -> None:
+        path_remote = self.arg()["path"]
+        entry = self.store.get(path_remote)
+        if entry is None or entry["type"] != "file":
+            return self.error(409, "path/not_found/")
+        self.handler.send_range(entry["data"], {"Dropbox-API-Result": json.dumps(self.metadata(path_remote))})
+
+    def files__download_zip(self) -> None:
+        path_remote = self.arg()["path"]
+        if self.store.get(path_remote) is None:
+            return self.error(409, "path/not_found/")
+        self.handler.send_bytes(self.store.zip_folder(path_remote), 200, {"Content-Type": "application/zip"})
+
+
+class YandexRoutes:
+    prefix = "/v1/disk"
+
+    def __init__(self, handler: FakeHandler, body: bytes, params: dict) -> None:
+        self.handler = handler
+        self.store = handler.fake.store
+        self.body = body
+        self.params = params
+
+    def handle(self, method: str, path_url: str) -> None:
+        path_remote = self.params.get("path", "/").removeprefix("disk:")
+        path_remote = "/" + path_remote.strip("/") if path_remote.strip("/") else "/"
+        routes = {("GET", f"{self.prefix}/"): self.disk_info,
+                  ("GET", f"{self.prefix}/resources"): self.resources,
+                  ("PUT", f"{self.prefix}/resources"): self.create_folder,
+                  ("GET", f"{self.prefix}/resources/upload"): self.upload_link,
+                  ("GET", f"{self.prefix}/resources/download"): self.download_link,
+                  ("PUT", "/upload"): self.upload,
+                  ("GET", "/download"): self.download}
+        route = routes.get((method, path_url))
+        if route is None:
+            return self.error(404, "NotFound", "Unknown endpoint")
+        return route(path_remote)
+
+    def error(self, status: int, error: str, message: str) -> None:
+        self.handler.send_json({"error": error, "message": message, "description": message}, status)
+
+    def link(self, kind: str, path_remote: str) -> str:
+        host = self.handler.headers.get("Host")
+        return f"http://{host}/{kind}?path={quote(path_remote)}"
+
+    def metadata(self, path_remote: str) -> dict:
+        entry = self.store.get(path_remote)
+        info = {"name": path_remote.rsplit("/", 1)[1] or "disk", "path": f"disk:{path_remote}",
+                "type": entry["type"]}
+        if entry["type"] == "file":
+            info.update({"size": len(entry["data"]), "modified": entry["modified"], "md5": entry["md5"],
+                         "sha256": entry["sha256"], "revision": int(entry["rev"], 16),
+                         "file": self.link("download", path_remote)})
+        return info
+
+    def disk_info(self, path_remote: str) -> None:
+        self.handler.send_json({"user": {"login": "bench", "display_name": "Bench"}, "total_space": 2 ** 40,
+                                "used_space": 0})
+
+    def resources(self, path_remote: str) -> None:
+        if self.store.get(path_remote) is None:
+            return self.error(404, "DiskNotFoundError", "Не удалось найти запрошенный ресурс.")
+        info = self.metadata(path_remote)
+        if info["type"] == "dir":
+            names = self.store.children(path_remote)
+            offset = int(self.params.get("offset", 0))
+            limit = int(self.params.get("limit", 20))
+            info["_embedded"] = {"items": [self.metadata(name) for name in names[offset:offset + limit]],
+                                 "total": len(names), "offset": offset, "limit": limit}
+        self.handler.send_json(info)
+
+    def create_folder(self, path_remote: str) -> None:
+        if not self.store.make_dir(path_remote):
+            return self.error(409, "DiskPathPointsToExistentDirectoryError", "Уже существует")
+        self.handler.send_json({"href": self.link("resources", path_remote)}, 201)
+
+    def upload_link(self, path_remote: str) -> None:
+        self.handler.send_json({"href": self.link("upload", path_remote), "method": "PUT"})
+
+    def download_link(self, path_remote: str) -> None:
+        if self.store.get(path_remote) is None:
+            return self.error(404, "DiskNotFoundError", "Не удалось найти запрошенный ресурс.")
+        self.handler.send_json({"href": self.link("download", path_remote), "method": "GET"})
+
+    def upload(self, path_remote: str) -> None:
+        self.store.put_file(path_remote, self.body)
+        self.handler.send_bytes(b"", 201)
+
+    def download(self, path_remote: str) -> None:
+        entry = self.store.get(path_remote)
+        if entry is None:
+            return self.error(404, "DiskNotFoundError", "Не удалось найти запрошенный ресурс.")
+        if entry["type"] == "dir":
+            return self.handler.send_bytes(self.store.zip_folder(path_remote), 200,
+                                           {"Content-Type": "application/zip"})
+        self.handler.send_range(entry["data"], {"ETag": f"\"{entry['md5']}\""})
@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from api_clients.dropbox import Dropbox  # noqa: E402
+from api_clients.yandex_disk import YandexDisk  # noqa: E402
+from benchmarks.fake_servers import FakeServer  # noqa: E402
+
+PROVIDERS = ("dropbox", "yandex")
+SCENARIOS = ("small_files", "large_files", "deep_tree")
+COMPARED_METRICS = ("mb_per_s", "requests_per_s")
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.latencies = []
+
+    async def on_request(self, request) -> None:
+        request.extensions["bench_started"] = time.perf_counter()
+
+    async def on_response(self, response) -> None:
+        self.latencies.append(time.perf_counter() - response.request.extensions["bench_started"])
+
+    def attach(self, cloud) -> None:
+        for client in (cloud.client, cloud.content_client):
+            client.event_hooks = {"request": [self.on_request], "response": [self.on_response]}
+
+
+def make_cloud(provider: str, base_url: str):
+    if provider == "dropbox":
+        cloud = Dropbox("bench")
+        cloud.url = cloud.content_url = f"{base_url}/2/"
+    else:
+        cloud = YandexDisk("bench")
+        cloud.url = f"{base_url}/v1/disk/"
+    return cloud
+
+
+def percentile(values: list, share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[round(share * (len(ordered) - 1))]
+
+
+def write_tree(root: str, files: list) -> int:
+    total = 0
+    for relative, size in files:
+        file_local = path.join(root, *relative.split("/"))
+        os.makedirs(path.dirname(file_local), exist_ok=True)
+        with open(file_local, "wb") as file:
+            file.write(os.urandom(size))
+        total += size
+    return total
+
+
+def scenario_files(scenario: str, scale: float) -> list:
+    if scenario == "small_files":
+        return [(f"dir{i % 10}/file{i}.bin", 4096) for i in range(max(1, int(500 * scale)))]
+    if scenario == "large_files":
+        return [(f"large{i}.bin", max(2 ** 20, int(160 * 2 ** 20 * scale))) for i in range(2)]
+    levels = max(2, int(12 * min(1.0, scale * 4)))
+    return [("/".join(f"level{level}" for level in range(depth + 1)) + f"/file{i}.bin", 16384)
+            for depth in range(levels) for i in range(3)]
+
+
+async def measure(step: str, recorder: Recorder, payload: int, action) -> dict:
+    recorder.latencies.clear()
+    started = time.perf_counter()
+    await action
+    seconds = time.perf_counter() - started
+    requests = len(recorder.latencies)
+    return {"step": step, "seconds": round(seconds, 4), "bytes": payload,
+            "mb_per_s": round(payload / 2 ** 20 / seconds, 3), "requests": requests,
+            "requests_per_s": round(requests / seconds, 2),
+            "latency_p50_ms": round(percentile(recorder.latencies, 0.5) * 1000, 3),
+            "latency_p99_ms": round(percentile(recorder.latencies, 0.99) * 1000, 3)}
+
+
+async def run_steps(provider: str, scenario: str, base_url: str, scale: float, workdir: str) -> list:
+    cloud = make_cloud(provider, base_url)
+    recorder = Recorder()
+    recorder.attach(cloud)
+    files = scenario_files(scenario, scale)
+    source = path.join(workdir, "source")
+    total = write_tree(source, files)
+    remote = f"/bench-{scenario}"
+    results = []
+    async with cloud:
+        results.append(await measure("upload_folder", recorder, total, cloud.upload_folder(source, remote)))
+        results.append(await measure("list_tree", recorder, 0, cloud.list_tree(remote)))
+        if scenario == "large_files":
+            target = path.join(workdir, "large")
+            os.makedirs(target)
+            downloads = [cloud.download_file(cloud.remote_join(remote, relative), path.join(target, relative))
+                         for relative, _ in files]
+            results.append(await measure("download_file", recorder, total, asyncio.gather(*downloads)))
+        else:
+            for mode in ("zip", "files"):
+                target = path.join(workdir, f"download-{mode}")
+                os.makedirs(target)
+                results.append(await measure(f"download_folder_{mode}", recorder, total,
+                                             cloud.download_folder(remote, target, mode)))
+    return results
+
+
+def child(provider: str, scenario: str, base_url: str, scale: float, queue) -> None:
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["CLOUDS_STATE_DIR"] = path.join(workdir, "state")
+        try:
+            results = asyncio.run(run_steps(provider, scenario, base_url, scale, workdir))
+        except Exception as e:
+            queue.put({"error": f"{type(e).__name__}: {e}"})
+            return
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = rss / 2 ** 20 if sys.platform == "darwin" else rss / 2 ** 10
+    queue.put({"results": results, "peak_rss_mb": round(peak_rss_mb, 1)})
+
+
+def run(options: argparse.Namespace) -> dict:
+    report = {"config": {"latency_ms": options.latency, "bandwidth_mb_s": options.bandwidth,
+                         "throttle_rate": options.throttle_rate, "scale": options.scale}, "results": []}
+    context = multiprocessing.get_context("spawn")
+    bandwidth = options.bandwidth * 2 ** 20 if options.bandwidth else None
+    with FakeServer(options.latency / 1000, bandwidth, options.throttle_rate) as server:
+        for provider in options.provider:
+            for scenario in options.scenario:
+                throttled = server.throttled
+                queue = context.Queue()
+                process = context.Process(target=child, args=(provider, scenario, server.base_url,
+                                                              options.scale, queue))
+                process.start()
+                outcome = queue.get()
+                process.join()
+                if "error" in outcome:
+                    raise RuntimeError(f"{provider}/{scenario}: {outcome['error']}")
+                for result in outcome["results"]:
+                    report["results"].append(dict(result, provider=provider, scenario=scenario,
+                                                  peak_rss_mb=outcome["peak_rss_mb"],
+                                                  throttled=server.throttled - throttled))
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    previous = {(result["provider"], result["scenario"], result["step"]): result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get((result["provider"], result["scenario"], result["step"]))
+        if old is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if old[metric] and result[metric] < old[metric] * (1 - tolerance):
+                regressions.append(f"{result['provider']}/{result['scenario']}/{result['step']} {metric}: "
+                                   f"{old[metric]} -> {result[metric]}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks against local fake Dropbox/Yandex servers")
+    parser.add_argument("--provider", nargs="+", choices=PROVIDERS, default=list(PROVIDERS))
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0, help="added latency per request, ms")
+    parser.add_argument("--bandwidth", type=float, default=0, help="per-connection bandwidth, MB/s (0 = unlimited)")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="share of requests answered with 429")
+    parser.add_argument("--scale", type=float, default=1, help="multiplier for file counts and sizes")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    options = parser.parse_args()
+
+    report = run(options)
+    with open(options.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    for result in report["results"]:
+        print(f"{result['provider']:8} {result['scenario']:12} {result['step']:22} {result['mb_per_s']:10.2f} MB/s "
+              f"{result['requests_per_s']:9.1f} req/s p50 {result['latency_p50_ms']:8.2f} ms "
+              f"p99 {result['latency_p99_ms']:8.2f} ms rss {result['peak_rss_mb']} MB")
+    if options.baseline:
+        with open(options.baseline, encoding="utf-8") as file:
+            regressions = compare(report, json.load(file), options.tolerance)
+        if regressions:
+            print("Regressions:\n" + "\n".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
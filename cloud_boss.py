@@ -1,73 +1,174 @@
-from os import getenv, path
+import sys
+from contextlib import contextmanager
+from importlib import import_module
+from os import getenv, path, stat
+from stat import S_ISDIR
 
+import anyio
 import click
-import httpx
 
-from api_clients.dropbox import Dropbox
-from api_clients.yandex_disk import YandexDisk
 from system_class import SystemClass
 
+CLOUDS = {"yandex": ("api_clients.yandex_disk", "YandexDisk", "AUTH_TOKEN_YANDEX"),
+          "dropbox": ("api_clients.dropbox", "Dropbox", "AUTH_TOKEN_DROPBOX")}
+
 
 class CloudBoss:
-    def __init__(self):
-        SystemClass.load_env(dev=False)
+    def __init__(self, stats: bool = False, path_trace: str = None):
+        self.clouds = {}
+        self.clouds_lock = anyio.Lock()
+        self.stats = None
+        self.path_trace = path_trace
+        if stats or path_trace:
+            from api_clients.stats import RequestStats
+            self.stats = RequestStats()
+
+    async def get_cloud(self, cloud_name: str):
+        if cloud_name in self.clouds:
+            return self.clouds[cloud_name]
+        async with self.clouds_lock:
+            if cloud_name not in self.clouds:
+                SystemClass.load_env(dev=False)
+                module_name, class_name, token_name = CLOUDS[cloud_name]
+                cloud = getattr(import_module(module_name), class_name)(getenv(token_name))
+                cloud.stats = self.stats
+                try:
+                    await cloud.auth()
+                except BaseException:
+                    await cloud.aclose()
+                    raise
+                self.clouds[cloud_name] = cloud
+        return self.clouds[cloud_name]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        for cloud in self.clouds.values():
+            await cloud.aclose()
+        self.clouds = {}
+        if self.stats is not None:
+            self.report_stats()
+
+    def report_stats(self):
+        if self.stats.entries:
+            click.echo("\n".join(self.stats.lines()))
+        if self.path_trace:
+            self.stats.export(self.path_trace)
+            click.echo(f"Трасса запросов сохранена в {self.path_trace}")
+
+    @contextmanager
+    def report_errors(self, handle_all: bool = True):
         try:
-            self.clouds = {"yandex": YandexDisk(getenv("AUTH_TOKEN_YANDEX")),
-                           "dropbox": Dropbox(getenv("AUTH_TOKEN_DROPBOX"))}
-        except httpx.HTTPError:
-            click.echo("Произошла ошибка. Попробуйте позже.")
-            exit(-1)
+            yield
+        except Exception as e:
+            from httpx import HTTPError
+            if isinstance(e, HTTPError):
+                click.echo("Произошла ошибка. Попробуйте позже.")
+            elif handle_all:
+                SystemClass.exchandler(type(e), e, e.__traceback__)
+            else:
+                raise
 
     async def get_cloud_info(self, cloud_name: str):
-        try:
-            response = await self.clouds[cloud_name].get_cloud_info()
+        with self.report_errors(handle_all=False):
+            response = await (await self.get_cloud(cloud_name)).get_cloud_info()
             click.echo(
                 f"Логин:\t{response['login']}\nИмя:\t{response['name']}\n"
                 f"Всего места:\t{round(response['total_space'], 3)} "
                 f"MB\nИспользовано:\t{round(response['used_space'], 3)} MB")
-        except httpx.HTTPError:
-            click.echo("Произошла ошибка. Попробуйте позже.")
 
     async def get_folder_content(self, cloud_name: str, path_remote: str):
-        try:
-            response = await self.clouds[cloud_name].get_folder_content(path_remote)
-            click.echo('\n'.join(map(lambda el: f"/{el}", response['folders'])))
-            click.echo('\n'.join(response['files']))
-        except httpx.HTTPError:
-            click.echo("Произошла ошибка. Попробуйте позже.")
+        with self.report_errors(handle_all=False):
+            async for page in (await self.get_cloud(cloud_name)).iter_folder(path_remote):
+                folders = [f"/{entry['name']}" for entry in page if entry["type"] == "dir"]
+                files = [entry["name"] for entry in page if entry["type"] != "dir"]
+                if folders:
+                    click.echo('\n'.join(folders))
+                if files:
+                    click.echo('\n'.join(files))
+
+    async def get_cached_folder_content(self, cloud_name: str, path_remote: str):
+        from api_clients.remote_index import RemoteIndex
+        entries = RemoteIndex(cloud_name).list_folder(path_remote)
+        folders = [f"/{entry['name']}" for entry in entries if entry["type"] == "dir"]
+        files = [entry["name"] for entry in entries if entry["type"] != "dir"]
+        if folders:
+            click.echo('\n'.join(folders))
+        if files:
+            click.echo('\n'.join(files))
 
     async def create_folder(self, cloud_name: str, path_remote: str):
-        try:
-            await self.clouds[cloud_name].create_folder(path_remote)
+        with self.report_errors(handle_all=False):
+            await (await self.get_cloud(cloud_name)).create_folder(path_remote)
             click.echo("Папка успешно создана!")
-        except httpx.HTTPError:
-            click.echo("Произошла ошибка. Попробуйте позже.")
 
     async def download(self, cloud_name: str, path_remote: str, path_local: str):
-        try:
-            await self.clouds[cloud_name].download_file(path_remote, path_local)
-            click.echo("Файл успешно скачан!")
-        except httpx.HTTPError:
-            click.echo("Произошла ошибка. Попробуйте позже.")
-        except Exception:
-            try:
-                await self.clouds[cloud_name].download_folder(path_remote, path_local)
+        with self.report_errors():
+            cloud = await self.get_cloud(cloud_name)
+            if (await cloud.stat(path_remote))["type"] == "dir":
+                await cloud.download_folder(path_remote, path_local)
                 click.echo("Папка успешно скачана!")
-            except Exception as e2:
-                SystemClass.exchandler(type(e2), e2, e2.__traceback__)
+            else:
+                await cloud.download_file(path_remote, path_local)
+                click.echo("Файл успешно скачан!")
 
     async def upload(self, cloud_name: str, path_local: str, path_remote: str):
-        if not path.exists(path.abspath(path_local)):
+        try:
+            is_folder = S_ISDIR(stat(path.abspath(path_local)).st_mode)
+        except FileNotFoundError:
             with SystemClass.except_handler(SystemClass.exchandler):
                 raise Exception(f"IncorrectPath. Неверный путь: {path_local}")
-        try:
-            await self.clouds[cloud_name].upload_file(path_local, path_remote)
-            click.echo("Файл успешно загружен!")
-        except httpx.HTTPError:
-            click.echo("Произошла ошибка. Попробуйте позже.")
-        except Exception:
-            try:
-                await self.clouds[cloud_name].upload_folder(path_local, path_remote)
+        with self.report_errors():
+            cloud = await self.get_cloud(cloud_name)
+            if is_folder:
+                await cloud.upload_folder(path_local, path_remote)
                 click.echo("Папка успешно загружена!")
-            except Exception as e2:
-                SystemClass.exchandler(type(e2), e2, e2.__traceback__)
+            else:
+                await cloud.upload_file(path_local, path_remote)
+                click.echo("Файл успешно загружен!")
+
+    async def sync(self, cloud_name: str, path_local: str, path_remote: str, direction: str):
+        from api_clients.sync import FolderSync
+        with self.report_errors():
+            stats = await FolderSync(await self.get_cloud(cloud_name), cloud_name, path_local,
+                                     path_remote).run(direction)
+            click.echo(f"Синхронизация завершена. Передано файлов: {stats['transferred']}, "
+                       f"без изменений: {stats['skipped']}")
+
+    async def copy(self, from_cloud: str, path_from: str, to_cloud: str, path_to: str):
+        from api_clients.cloud_copy import CloudCopy
+        with self.report_errors():
+            if from_cloud == to_cloud:
+                await (await self.get_cloud(from_cloud)).copy(path_from, path_to)
+                click.echo("Копирование завершено на стороне облака.")
+                return
+            stats = await CloudCopy(await self.get_cloud(from_cloud), await self.get_cloud(to_cloud)).run(path_from,
+                                                                                                          path_to)
+            click.echo(f"Копирование завершено. Скопировано файлов: {stats['files']}")
+
+    async def move(self, cloud_name: str, path_from: str, path_to: str):
+        with self.report_errors():
+            await (await self.get_cloud(cloud_name)).move(path_from, path_to)
+            click.echo("Перемещение завершено.")
+
+    async def index(self, cloud_name: str, full: bool):
+        from api_clients.remote_index import RemoteIndex
+        with self.report_errors():
+            stats = await RemoteIndex(cloud_name).refresh(await self.get_cloud(cloud_name), full)
+            click.echo(f"Индекс обновлён. Изменений: {stats['changes']}, всего записей: {stats['entries']}")
+
+    async def batch(self, path_manifest: str, path_results: str, concurrency: int):
+        from batch import BatchRunner, open_output
+        output = open_output(path_results)
+        try:
+            stats = await BatchRunner(self, concurrency).run(path_manifest, output)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        click.echo(f"Пакет выполнен. Успешно: {stats['ok']}, с ошибками: {stats['error']}", err=path_results == "-")
+
+    async def find(self, cloud_name: str, pattern: str, entry_type: str = None):
+        from api_clients.remote_index import RemoteIndex
+        for entry in RemoteIndex(cloud_name).find(pattern, entry_type):
+            click.echo(f"{entry['path']}/" if entry["type"] == "dir" else entry["path"])
@@ -0,0 +1,167 @@
+import asyncio
+import io
+import json
+import os
+import signal
+import sys
+from contextvars import ContextVar
+from os import path
+
+import click
+
+from system_class import SystemClass
+
+DAEMON_METHODS = ("get_cloud_info", "get_folder_content", "get_cached_folder_content", "create_folder", "upload",
+                  "download")
+
+captured = ContextVar("captured", default=None)
+
+
+def socket_path() -> str:
+    return os.getenv("CLOUDS_DAEMON_SOCKET") or path.join(SystemClass.state_dir(create=False), "daemon.sock")
+
+
+class OutputRouter(io.TextIOBase):
+    def __init__(self, stream, name: str) -> None:
+        self.stream = stream
+        self.name = name
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+    def write(self, text: str) -> int:
+        target = captured.get()
+        if target is None:
+            return self.stream.write(text)
+        return target[self.name].write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def isatty(self) -> bool:
+        return False
+
+
+class CloudDaemon:
+    def __init__(self, boss, path_socket: str = None) -> None:
+        self.boss = boss
+        self.path_socket = path_socket or socket_path()
+        self.stopped = None
+
+    async def serve(self) -> None:
+        if not hasattr(asyncio, "start_unix_server"):
+            with SystemClass.except_handler(SystemClass.exchandler):
+                raise Exception("DaemonError. Режим демона доступен только в системах с Unix-сокетами")
+        client = await DaemonClient.connect(self.path_socket)
+        if client is not None:
+            client.writer.close()
+            with SystemClass.except_handler(SystemClass.exchandler):
+                raise Exception(f"DaemonError. Демон уже запущен: {self.path_socket}")
+        if path.exists(self.path_socket):
+            os.remove(self.path_socket)
+        os.makedirs(path.dirname(path.abspath(self.path_socket)), exist_ok=True)
+        self.stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, self.stop)
+        server = await asyncio.start_unix_server(self.handle, self.path_socket)
+        os.chmod(self.path_socket, 0o600)
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = OutputRouter(stdout, "stdout"), OutputRouter(stderr, "stderr")
+        click.echo(f"Демон запущен: {self.path_socket}")
+        try:
+            async with server:
+                await self.stopped.wait()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signal_number)
+            if path.exists(self.path_socket):
+                os.remove(self.path_socket)
+
+    def stop(self) -> None:
+        if self.stopped is not None:
+            self.stopped.set()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = json.loads(await reader.readline())
+            response = await self.execute(request.get("method"), request.get("args", []))
+            writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+            await writer.drain()
+        except (ValueError, AttributeError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def execute(self, method: str, args: list) -> dict:
+        output = {"stdout": io.StringIO(), "stderr": io.StringIO()}
+        token = captured.set(output)
+        error = None
+        try:
+            if method not in DAEMON_METHODS:
+                raise Exception(f"DaemonError. Неизвестная команда: {method}")
+            await getattr(self.boss, method)(*args)
+        except Exception as e:
+            error = str(e)
+        finally:
+            captured.reset(token)
+        return {"stdout": output["stdout"].getvalue(), "stderr": output["stderr"].getvalue(), "error": error}
+
+
+class DaemonClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, path_socket: str = None):
+        path_socket = path_socket or socket_path()
+        if not hasattr(asyncio, "open_unix_connection") or not path.exists(path_socket):
+            return None
+        try:
+            asyncio.get_running_loop()
+            return cls(*await asyncio.open_unix_connection(path_socket))
+        except (OSError, RuntimeError):
+            return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.writer.close()
+
+    async def call(self, method: str, *args) -> None:
+        self.writer.write(json.dumps({"method": method, "args": args}, ensure_ascii=False).encode() + b"\n")
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            with SystemClass.except_handler(SystemClass.exchandler):
+                raise Exception("DaemonError. Демон закрыл соединение, не выполнив команду")
+        response = json.loads(line)
+        if response["stdout"]:
+            click.echo(response["stdout"], nl=False)
+        if response["stderr"]:
+            click.echo(response["stderr"], nl=False, err=True)
+        if response["error"] is not None:
+            with SystemClass.except_handler(SystemClass.exchandler):
+                raise Exception(response["error"])
+
+    async def get_cloud_info(self, cloud_name: str):
+        await self.call("get_cloud_info", cloud_name)
+
+    async def get_folder_content(self, cloud_name: str, path_remote: str):
+        await self.call("get_folder_content", cloud_name, path_remote)
+
+    async def get_cached_folder_content(self, cloud_name: str, path_remote: str):
+        await self.call("get_cached_folder_content", cloud_name, path_remote)
+
+    async def create_folder(self, cloud_name: str, path_remote: str):
+        await self.call("create_folder", cloud_name, path_remote)
+
+    async def upload(self, cloud_name: str, path_local: str, path_remote: str):
+        await self.call("upload", cloud_name, path.abspath(path_local), path_remote)
+
+    async def download(self, cloud_name: str, path_remote: str, path_local: str):
+        await self.call("download", cloud_name, path_remote, path.abspath(path_local))
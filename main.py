@@ -1,14 +1,25 @@
 import asyncio
+import sys
 
 import asyncclick as click
 
 from cloud_boss import CloudBoss
 
+FORWARDED_COMMANDS = ('info', 'folder-content', 'create-folder', 'upload', 'download')
+
 
 @click.group()
+@click.option('--stats', is_flag=True, help='Вывести статистику запросов к облакам после выполнения команды')
+@click.option('--trace', 'path_trace', type=click.Path(dir_okay=False, writable=True),
+              help='Сохранить JSON-трассу всех запросов в файл')
 @click.pass_context
-def cli(ctx):
-    ctx.obj = CloudBoss()
+async def cli(ctx, stats: bool, path_trace: str):
+    if ctx.invoked_subcommand in FORWARDED_COMMANDS and not (stats or path_trace):
+        from cloud_daemon import DaemonClient
+        ctx.obj = await DaemonClient.connect()
+    if ctx.obj is None:
+        ctx.obj = CloudBoss(stats, path_trace)
+    await ctx.with_async_resource(ctx.obj)
 
 
 @cli.command()
@@ -24,10 +35,14 @@ async def info(ctx, cloud: str):
 @click.argument('path', default="/")
 @click.option('--cloud', type=click.Choice(['yandex', 'dropbox'], case_sensitive=False),
               prompt='Выберите облако (Yandex/Dropbox)', help='Выбор облака')
+@click.option('--cached', is_flag=True, help='Взять содержимое из локального индекса (см. команду index)')
 @click.pass_context
-async def folder_content(ctx, path: str, cloud: str):
+async def folder_content(ctx, path: str, cloud: str, cached: bool):
     """Получить содержимое папки в облаке."""
-    await ctx.obj.get_folder_content(cloud, path)
+    if cached:
+        await ctx.obj.get_cached_folder_content(cloud, path)
+    else:
+        await ctx.obj.get_folder_content(cloud, path)
 
 
 @cli.command()
@@ -62,6 +77,85 @@ async def upload(ctx, path_local: str, path_remote: str, cloud: str):
     await ctx.obj.upload(cloud, path_local, path_remote)
 
 
+@cli.command()
+@click.option('--cloud', type=click.Choice(['yandex', 'dropbox'], case_sensitive=False),
+              prompt='Выберите облако (Yandex/Dropbox)', help='Выбор облака')
+@click.option('--direction', type=click.Choice(['upload', 'download'], case_sensitive=False), default='upload',
+              help='Направление синхронизации')
+@click.argument('path_local')
+@click.argument('path_remote')
+@click.pass_context
+async def sync(ctx, path_local: str, path_remote: str, cloud: str, direction: str):
+    """Синхронизировать папку с облаком, передав только изменения."""
+    await ctx.obj.sync(cloud, path_local, path_remote, direction)
+
+
+@cli.command()
+@click.option('--from', 'from_cloud', type=click.Choice(['yandex', 'dropbox'], case_sensitive=False),
+              prompt='Облако-источник (Yandex/Dropbox)', help='Облако, из которого копировать')
+@click.option('--to', 'to_cloud', type=click.Choice(['yandex', 'dropbox'], case_sensitive=False),
+              prompt='Облако-получатель (Yandex/Dropbox)', help='Облако, в которое копировать')
+@click.argument('path_from')
+@click.argument('path_to')
+@click.pass_context
+async def copy(ctx, path_from: str, path_to: str, from_cloud: str, to_cloud: str):
+    """Скопировать файл/папку между облаками без сохранения на диск (внутри одного облака — на стороне сервера)."""
+    await ctx.obj.copy(from_cloud, path_from, to_cloud, path_to)
+
+
+@cli.command()
+@click.option('--cloud', type=click.Choice(['yandex', 'dropbox'], case_sensitive=False),
+              prompt='Выберите облако (Yandex/Dropbox)', help='Выбор облака')
+@click.argument('path_from')
+@click.argument('path_to')
+@click.pass_context
+async def move(ctx, path_from: str, path_to: str, cloud: str):
+    """Переместить или переименовать файл/папку внутри облака без передачи данных."""
+    await ctx.obj.move(cloud, path_from, path_to)
+
+
+@cli.command()
+@click.option('--cloud', type=click.Choice(['yandex', 'dropbox'], case_sensitive=False),
+              prompt='Выберите облако (Yandex/Dropbox)', help='Выбор облака')
+@click.option('--full', is_flag=True, help='Перестроить индекс полностью')
+@click.pass_context
+async def index(ctx, cloud: str, full: bool):
+    """Обновить локальный индекс файлов облака."""
+    await ctx.obj.index(cloud, full)
+
+
+@cli.command()
+@click.argument('pattern')
+@click.option('--cloud', type=click.Choice(['yandex', 'dropbox'], case_sensitive=False),
+              prompt='Выберите облако (Yandex/Dropbox)', help='Выбор облака')
+@click.option('--type', 'entry_type', type=click.Choice(['file', 'dir']), default=None, help='Тип ресурса')
+@click.pass_context
+async def find(ctx, pattern: str, cloud: str, entry_type: str):
+    """Найти файлы/папки по имени (шаблон с * и ?) в локальном индексе."""
+    await ctx.obj.find(cloud, pattern, entry_type)
+
+
+@cli.command()
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', 'path_results', default='-',
+              help='Файл для результатов в формате JSONL (по умолчанию stdout)')
+@click.option('--concurrency', type=click.IntRange(min=1), default=8, help='Сколько операций выполнять одновременно')
+@click.pass_context
+async def batch(ctx, manifest: str, path_results: str, concurrency: int):
+    """Выполнить операции (upload, download, create_folder, copy, move) из манифеста JSONL/CSV."""
+    await ctx.obj.batch(manifest, path_results, concurrency)
+
+
+@cli.command()
+@click.pass_context
+async def daemon(ctx):
+    """Запустить демон с постоянными подключениями к облакам; команды info, folder-content, create-folder,
+    upload и download будут выполняться через него."""
+    from cloud_daemon import CloudDaemon
+    await CloudDaemon(ctx.obj).serve()
+
+
 if __name__ == '__main__':
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     asyncio.run(cli())
@@ -4,8 +4,6 @@ from contextlib import contextmanager
 from logging import getLogger
 from typing import Callable
 
-from dotenv import load_dotenv
-
 logger = getLogger(__name__)
 
 
@@ -18,11 +16,19 @@ class SystemClass:
             env_name = ".env.prod"
         dotenv_path = os.path.join(os.path.dirname(__file__), env_name)
         if os.path.exists(dotenv_path):
+            from dotenv import load_dotenv
             load_dotenv(dotenv_path)
             return
         with SystemClass.except_handler(SystemClass.exchandler):
             raise Exception(".env файл не смог быть подгружен")
 
+    @staticmethod
+    def state_dir(create: bool = True) -> str:
+        state_path = os.getenv("CLOUDS_STATE_DIR") or os.path.join(os.path.expanduser("~"), ".clouds")
+        if create:
+            os.makedirs(state_path, exist_ok=True)
+        return state_path
+
     @contextmanager
     def except_handler(self: Callable):
         sys.excepthook = self
@@ -0,0 +1,81 @@
+import hashlib
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+
+from api_clients.api_client import Cloud
+from api_clients.local_fs import LocalFS
+
+
+class MemoryCloud:
+    chunk_size = 4
+    download_workers = 4
+    upload_workers = 4
+    large_file_size = 2 ** 20
+    remote_join = staticmethod(Cloud.remote_join)
+
+    def __init__(self, files=None):
+        self.files = files or {}
+        self.folders = []
+        self.uploads = []
+        self.cursors = []
+        self.fs = LocalFS(2)
+
+    def children(self, path_remote):
+        prefix = path_remote.rstrip("/") + "/"
+        return {name[len(prefix):]: data for name, data in self.files.items() if name.startswith(prefix)}
+
+    async def stat(self, path_remote):
+        return {"type": "file", "size": len(self.files[path_remote])} if path_remote in self.files \
+            else {"type": "dir"}
+
+    async def list_tree(self, path_remote):
+        tree = [{"path": relative, "type": "file", "size": len(data)}
+                for relative, data in self.children(path_remote).items()]
+        folders = {entry["path"].rsplit("/", 1)[0] for entry in tree if "/" in entry["path"]}
+        return tree + [{"path": folder, "type": "dir"} for folder in folders]
+
+    async def list_changes(self, path_remote, cursor=None):
+        self.cursors.append(cursor)
+        entries = [{"path": relative, "type": "file", "size": len(data), "hash": hashlib.sha256(data).hexdigest(),
+                    "rev": hashlib.md5(data).hexdigest()} for relative, data in self.children(path_remote).items()]
+        return entries, f"cursor{len(self.cursors)}", True
+
+    async def local_hash(self, path_local):
+        with open(path_local, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    @asynccontextmanager
+    async def download_stream(self, path_remote, is_file=True, verify=True):
+        yield httpx.Response(200, content=self.files[path_remote])
+
+    async def download_file(self, path_remote, path_local):
+        with open(path_local, "wb") as file:
+            file.write(self.files[path_remote])
+
+    async def upload_stream(self, chunks, path_remote, size=None):
+        self.files[path_remote] = b"".join([chunk async for chunk in chunks])
+
+    @asynccontextmanager
+    async def upload_batch(self):
+        async def upload(path_local, path_remote):
+            with open(path_local, "rb") as file:
+                self.files[path_remote] = file.read()
+            self.uploads.append(path_remote)
+
+        yield upload
+
+    async def ensure_folders(self, paths):
+        self.folders += paths
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    monkeypatch.setenv("CLOUDS_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setenv("CLOUDS_DAEMON_SOCKET", str(tmp_path / "state" / "daemon.sock"))
+
+
+@pytest.fixture
+def memory_cloud():
+    return MemoryCloud
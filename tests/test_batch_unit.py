@@ -0,0 +1,92 @@
+import io
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+from api_clients.local_fs import LocalFS
+from batch import BatchRunner
+from cloud_boss import CloudBoss
+
+
+class FakeBoss:
+    def __init__(self):
+        self.clouds = {"yandex": AsyncMock(), "dropbox": AsyncMock()}
+        for cloud in self.clouds.values():
+            cloud.fs = LocalFS(1)
+        self.get_cloud = AsyncMock(side_effect=lambda name: self.clouds[name])
+
+
+def results(output: io.StringIO) -> dict:
+    return {result["line"]: result for result in map(json.loads, output.getvalue().splitlines())}
+
+
+@pytest.mark.asyncio
+async def test_runs_jsonl_manifest(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    manifest = tmp_path / "jobs.jsonl"
+    manifest.write_text("\n".join([
+        json.dumps({"op": "upload", "cloud": "yandex", "path_local": str(tmp_path / "a.txt"), "path_remote": "/a.txt"}),
+        json.dumps({"op": "create_folder", "cloud": "Dropbox", "path_remote": "/new"}),
+        "",
+        json.dumps({"op": "delete", "cloud": "yandex"}),
+        json.dumps({"op": "download", "cloud": "yandex"}),
+        json.dumps({"op": "create_folder", "cloud": "gdrive", "path_remote": "/x"}),
+        "{broken",
+    ]), encoding="utf-8")
+    boss = FakeBoss()
+    output = io.StringIO()
+    stats = await BatchRunner(boss, concurrency=3).run(str(manifest), output)
+    assert stats == {"ok": 2, "error": 4}
+    lines = results(output)
+    assert lines[1]["status"] == "ok" and lines[1]["type"] == "file"
+    assert lines[2] == {"line": 2, "op": "create_folder", "status": "ok", "seconds": lines[2]["seconds"]}
+    assert lines[4]["error"] == "Неизвестная операция: delete"
+    assert lines[5]["error"] == "Не заданы поля: path_remote, path_local"
+    assert lines[6]["error"] == "Неизвестное облако: gdrive"
+    assert lines[7]["error"].startswith("Некорректная строка манифеста")
+    boss.clouds["yandex"].upload_file.assert_awaited_once_with(str(tmp_path / "a.txt"), "/a.txt")
+    boss.clouds["dropbox"].create_folder.assert_awaited_once_with("/new")
+
+
+@pytest.mark.asyncio
+async def test_runs_csv_manifest_and_reports_failures(tmp_path):
+    manifest = tmp_path / "jobs.csv"
+    manifest.write_text("op,cloud,path_remote,path_local\n"
+                        "download,dropbox,/docs,out\n"
+                        "download,dropbox,/broken.txt,broken.txt\n", encoding="utf-8")
+    boss = FakeBoss()
+    cloud = boss.clouds["dropbox"]
+    cloud.stat.side_effect = lambda path_remote: {"type": "dir" if path_remote == "/docs" else "file"}
+    cloud.download_file.side_effect = Exception("NotFoundError. Не удалось найти запрошенный ресурс.")
+    output = io.StringIO()
+    stats = await BatchRunner(boss).run(str(manifest), output)
+    assert stats == {"ok": 1, "error": 1}
+    lines = results(output)
+    assert lines[2]["type"] == "dir"
+    assert lines[3]["error"] == "NotFoundError. Не удалось найти запрошенный ресурс."
+    cloud.download_folder.assert_awaited_once_with("/docs", "out")
+
+
+@pytest.mark.asyncio
+async def test_cloud_boss_writes_results_file(tmp_path):
+    manifest = tmp_path / "jobs.jsonl"
+    manifest.write_text('{"op": "sync"}\n[1]\n', encoding="utf-8")
+    await CloudBoss().batch(str(manifest), str(tmp_path / "out.jsonl"), 2)
+    lines = (tmp_path / "out.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["status"] for line in lines] == ["error", "error"]
+
+
+@pytest.mark.asyncio
+async def test_copy_and_move_within_one_cloud(tmp_path):
+    manifest = tmp_path / "jobs.jsonl"
+    manifest.write_text("\n".join([
+        json.dumps({"op": "copy", "from_cloud": "yandex", "path_from": "/a", "to_cloud": "yandex", "path_to": "/b"}),
+        json.dumps({"op": "move", "cloud": "yandex", "path_from": "/b", "path_to": "/c"}),
+    ]), encoding="utf-8")
+    boss = FakeBoss()
+    output = io.StringIO()
+    assert await BatchRunner(boss, concurrency=1).run(str(manifest), output) == {"ok": 2, "error": 0}
+    assert results(output)[1]["server_side"] is True
+    boss.clouds["yandex"].copy.assert_awaited_once_with("/a", "/b")
+    boss.clouds["yandex"].move.assert_awaited_once_with("/b", "/c")
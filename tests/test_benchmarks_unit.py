@@ -0,0 +1,30 @@
+import pytest
+
+from benchmarks.fake_servers import FakeServer
+from benchmarks.run import compare, run_steps
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("provider", ["dropbox", "yandex"])
+@pytest.mark.parametrize("scenario", ["small_files", "deep_tree"])
+async def test_scenario_against_fake_server(provider, scenario, tmp_path, monkeypatch):
+    monkeypatch.setenv("CLOUDS_STATE_DIR", str(tmp_path / "state"))
+    with FakeServer(throttle_rate=0.05) as server:
+        results = await run_steps(provider, scenario, server.base_url, 0.01, str(tmp_path))
+    assert [result["step"] for result in results] == ["upload_folder", "list_tree", "download_folder_zip",
+                                                      "download_folder_files"]
+    assert all(result["requests"] > 0 for result in results)
+    source = sorted(path.relative_to(tmp_path / "source") for path in (tmp_path / "source").rglob("*")
+                    if path.is_file())
+    for mode in ("zip", "files"):
+        target = tmp_path / f"download-{mode}" / f"bench-{scenario}"
+        for relative in source:
+            assert (target / relative).read_bytes() == (tmp_path / "source" / relative).read_bytes()
+
+
+def test_compare_reports_regressions():
+    baseline = {"results": [{"provider": "dropbox", "scenario": "small_files", "step": "upload_folder",
+                             "mb_per_s": 10, "requests_per_s": 100}]}
+    report = {"results": [dict(baseline["results"][0], mb_per_s=5)]}
+    assert compare(report, baseline, 0.2) == ["dropbox/small_files/upload_folder mb_per_s: 10 -> 5"]
+    assert compare(report, baseline, 0.6) == []
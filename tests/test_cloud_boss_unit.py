@@ -1,8 +1,10 @@
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import anyio
 import pytest
 from asyncclick.testing import CliRunner
 
+from cloud_boss import CloudBoss
 from main import cli
 
 
@@ -20,6 +22,13 @@ def cloud_boss_mock():
         mock_instance.create_folder = AsyncMock()
         mock_instance.download = AsyncMock()
         mock_instance.upload = AsyncMock()
+        mock_instance.sync = AsyncMock()
+        mock_instance.copy = AsyncMock()
+        mock_instance.get_cached_folder_content = AsyncMock()
+        mock_instance.index = AsyncMock()
+        mock_instance.find = AsyncMock()
+        mock_instance.batch = AsyncMock()
+        mock_instance.move = AsyncMock()
         yield mock_instance
 
 
@@ -56,3 +65,157 @@ async def test_upload_command(runner, cloud_boss_mock):
     result = await runner.invoke(cli, ['upload', 'local_path', 'remote_path', '--cloud', 'yandex'])
     assert result.exit_code == 0
     cloud_boss_mock.upload.assert_called_once_with('yandex', 'local_path', 'remote_path')
+
+
+@pytest.mark.anyio
+async def test_sync_command(runner, cloud_boss_mock):
+    result = await runner.invoke(cli, ['sync', 'local_path', 'remote_path', '--cloud', 'dropbox',
+                                       '--direction', 'download'])
+    assert result.exit_code == 0
+    cloud_boss_mock.sync.assert_called_once_with('dropbox', 'local_path', 'remote_path', 'download')
+
+
+@pytest.mark.anyio
+async def test_download_dispatches_on_single_stat(tmp_path):
+    cloud = AsyncMock()
+    cloud.stat.return_value = {"type": "dir"}
+    boss = CloudBoss.__new__(CloudBoss)
+    boss.clouds = {"yandex": cloud}
+    await boss.download("yandex", "/folder", str(tmp_path))
+    cloud.stat.assert_awaited_once_with("/folder")
+    cloud.download_folder.assert_awaited_once_with("/folder", str(tmp_path))
+    cloud.download_file.assert_not_awaited()
+
+
+@pytest.mark.anyio
+async def test_upload_dispatches_on_local_stat(tmp_path):
+    cloud = AsyncMock()
+    boss = CloudBoss.__new__(CloudBoss)
+    boss.clouds = {"yandex": cloud}
+    await boss.upload("yandex", str(tmp_path), "/folder")
+    cloud.upload_folder.assert_awaited_once_with(str(tmp_path), "/folder")
+    cloud.upload_file.assert_not_awaited()
+
+
+@pytest.mark.anyio
+async def test_get_cloud_builds_only_selected_cloud():
+    module = MagicMock()
+    module.Dropbox.return_value = AsyncMock()
+    with patch('cloud_boss.import_module', return_value=module) as import_module, \
+            patch('cloud_boss.SystemClass.load_env'):
+        boss = CloudBoss()
+        assert boss.clouds == {}
+        cloud = await boss.get_cloud("dropbox")
+        assert await boss.get_cloud("dropbox") is cloud
+    import_module.assert_called_once_with("api_clients.dropbox")
+    cloud.auth.assert_awaited_once_with()
+
+
+@pytest.mark.anyio
+async def test_concurrent_get_cloud_builds_one_client():
+    module = MagicMock()
+
+    async def slow_auth():
+        await anyio.sleep(0.01)
+
+    module.Dropbox.return_value = AsyncMock(auth=AsyncMock(side_effect=slow_auth))
+    with patch('cloud_boss.import_module', return_value=module), patch('cloud_boss.SystemClass.load_env'):
+        boss = CloudBoss()
+        clouds = []
+
+        async def get():
+            clouds.append(await boss.get_cloud("dropbox"))
+
+        async with anyio.create_task_group() as group:
+            group.start_soon(get)
+            group.start_soon(get)
+    assert clouds[0] is clouds[1] and module.Dropbox.call_count == 1
+
+
+@pytest.mark.anyio
+async def test_cli_closes_clouds(runner, cloud_boss_mock):
+    result = await runner.invoke(cli, ['info', '--cloud', 'yandex'])
+    assert result.exit_code == 0
+    cloud_boss_mock.__aexit__.assert_awaited_once()
+
+
+@pytest.mark.anyio
+async def test_copy_command(runner, cloud_boss_mock):
+    result = await runner.invoke(cli, ['copy', '/src', '/dst', '--from', 'yandex', '--to', 'dropbox'])
+    assert result.exit_code == 0
+    cloud_boss_mock.copy.assert_called_once_with('yandex', '/src', 'dropbox', '/dst')
+
+
+@pytest.mark.anyio
+async def test_folder_content_cached_command(runner, cloud_boss_mock):
+    result = await runner.invoke(cli, ['folder-content', '/docs', '--cloud', 'dropbox', '--cached'])
+    assert result.exit_code == 0
+    cloud_boss_mock.get_cached_folder_content.assert_called_once_with('dropbox', '/docs')
+    cloud_boss_mock.get_folder_content.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_index_and_find_commands(runner, cloud_boss_mock):
+    assert (await runner.invoke(cli, ['index', '--cloud', 'yandex', '--full'])).exit_code == 0
+    assert (await runner.invoke(cli, ['find', '*.txt', '--cloud', 'yandex', '--type', 'file'])).exit_code == 0
+    cloud_boss_mock.index.assert_called_once_with('yandex', True)
+    cloud_boss_mock.find.assert_called_once_with('yandex', '*.txt', 'file')
+
+
+@pytest.mark.anyio
+async def test_stats_option(runner, tmp_path):
+    with patch('main.CloudBoss') as MockClass:
+        MockClass.return_value.get_cloud_info = AsyncMock()
+        result = await runner.invoke(cli, ['--stats', '--trace', str(tmp_path / 'trace.json'), 'info',
+                                           '--cloud', 'yandex'])
+    assert result.exit_code == 0
+    MockClass.assert_called_once_with(True, str(tmp_path / 'trace.json'))
+
+
+@pytest.mark.anyio
+async def test_stats_reported_on_exit(tmp_path, capsys):
+    boss = CloudBoss(path_trace=str(tmp_path / 'trace.json'))
+    boss.stats.record({"cloud": "Dropbox", "endpoint": "files/upload", "method": "POST", "time": 0, "status": 200,
+                       "sent": 2 ** 20, "received": 10, "queue_wait": 0, "latency": 0.1, "retries": 0})
+    async with boss:
+        pass
+    output = capsys.readouterr().out
+    assert "Запросов: 1" in output and "files/upload" in output
+    assert (tmp_path / 'trace.json').exists()
+
+
+@pytest.mark.anyio
+async def test_batch_command(runner, cloud_boss_mock, tmp_path):
+    (tmp_path / 'jobs.jsonl').write_text('')
+    result = await runner.invoke(cli, ['batch', str(tmp_path / 'jobs.jsonl'), '--output', 'out.jsonl',
+                                       '--concurrency', '4'])
+    assert result.exit_code == 0
+    cloud_boss_mock.batch.assert_called_once_with(str(tmp_path / 'jobs.jsonl'), 'out.jsonl', 4)
+
+
+@pytest.mark.anyio
+async def test_commands_forward_to_running_daemon(runner, cloud_boss_mock):
+    client = AsyncMock()
+    with patch('cloud_daemon.DaemonClient.connect', AsyncMock(return_value=client)):
+        assert (await runner.invoke(cli, ['info', '--cloud', 'yandex'])).exit_code == 0
+        assert (await runner.invoke(cli, ['index', '--cloud', 'yandex'])).exit_code == 0
+    client.get_cloud_info.assert_awaited_once_with('yandex')
+    cloud_boss_mock.get_cloud_info.assert_not_called()
+    cloud_boss_mock.index.assert_called_once_with('yandex', False)
+
+
+@pytest.mark.anyio
+async def test_move_command(runner, cloud_boss_mock):
+    result = await runner.invoke(cli, ['move', '/old', '/new', '--cloud', 'dropbox'])
+    assert result.exit_code == 0
+    cloud_boss_mock.move.assert_called_once_with('dropbox', '/old', '/new')
+
+
+@pytest.mark.anyio
+async def test_copy_within_one_cloud_is_server_side():
+    cloud = AsyncMock()
+    boss = CloudBoss()
+    boss.clouds = {"yandex": cloud}
+    await boss.copy("yandex", "/src", "yandex", "/dst")
+    cloud.copy.assert_awaited_once_with("/src", "/dst")
+    cloud.download_stream.assert_not_called()
@@ -0,0 +1,48 @@
+from contextlib import asynccontextmanager
+
+import httpx
+import pytest
+from pytest_httpx import HTTPXMock
+
+from api_clients.cloud_copy import CloudCopy
+from api_clients.dropbox import Dropbox
+from api_clients.yandex_disk import STAT_FIELDS, YandexDisk
+
+
+@pytest.mark.asyncio
+async def test_copy_folder_between_clouds(memory_cloud):
+    source = memory_cloud({"/src/a.txt": b"alpha", "/src/sub/b.txt": b"beta"})
+    target = memory_cloud()
+    stats = await CloudCopy(source, target).run("/src", "/dst")
+    assert target.files == {"/dst/a.txt": b"alpha", "/dst/sub/b.txt": b"beta"}
+    assert target.folders == ["/dst", "/dst/sub"] and stats == {"files": 2, "bytes": 9}
+
+
+@pytest.mark.asyncio
+async def test_copy_fails_when_source_breaks(memory_cloud):
+    source = memory_cloud({"/a.txt": b"alpha"})
+
+    @asynccontextmanager
+    async def broken_stream(path_remote, is_file=True, verify=True):
+        raise httpx.ReadError("boom")
+        yield
+
+    source.download_stream = broken_stream
+    target = memory_cloud()
+    with pytest.raises(httpx.ReadError):
+        await CloudCopy(source, target).run("/a.txt", "/b.txt")
+    assert target.files == {}
+
+
+@pytest.mark.asyncio
+async def test_copy_file_from_yandex_to_dropbox(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url=httpx.URL("https://cloud-api.yandex.net/v1/disk/resources",
+                      params={"path": "/file.txt", "fields": STAT_FIELDS}),
+        json={"type": "file", "size": 13, "file": "https://download.example.com/file.txt"}
+    )
+    httpx_mock.add_response(url="https://download.example.com/file.txt", content=b"Hello, World!")
+    httpx_mock.add_response(url="https://content.dropboxapi.com/2/files/upload", method="POST",
+                            match_content=b"Hello, World!")
+    stats = await CloudCopy(YandexDisk("1234"), Dropbox("1234")).run("/file.txt", "/file.txt")
+    assert stats == {"files": 1, "bytes": 13}
@@ -0,0 +1,87 @@
+import asyncio
+from contextlib import asynccontextmanager
+from os import path
+
+import click
+import pytest
+
+from cloud_daemon import CloudDaemon, DaemonClient, socket_path
+
+
+class EchoBoss:
+    async def get_folder_content(self, cloud_name, path_remote):
+        await asyncio.sleep(0.01)
+        click.echo(f"{cloud_name}:{path_remote}")
+
+    async def create_folder(self, cloud_name, path_remote):
+        click.echo("Папка уже существует", err=True)
+
+    async def upload(self, cloud_name, path_local, path_remote):
+        raise Exception(f"IncorrectPath. Неверный путь: {path_local}")
+
+
+@asynccontextmanager
+async def running_daemon(tmp_path):
+    daemon = CloudDaemon(EchoBoss(), str(tmp_path / "d.sock"))
+    task = asyncio.ensure_future(daemon.serve())
+    while daemon.stopped is None or not (tmp_path / "d.sock").exists():
+        await asyncio.sleep(0.01)
+    yield daemon
+    daemon.stop()
+    await task
+    assert not (tmp_path / "d.sock").exists()
+
+
+async def call(daemon, method, *args):
+    async with await DaemonClient.connect(daemon.path_socket) as client:
+        await getattr(client, method)(*args)
+
+
+@pytest.mark.asyncio
+async def test_forwards_commands_with_isolated_output(tmp_path, capsys):
+    async with running_daemon(tmp_path) as daemon:
+        await asyncio.gather(call(daemon, "get_folder_content", "yandex", "/a"),
+                             call(daemon, "get_folder_content", "dropbox", "/b"))
+    started, *lines = capsys.readouterr().out.splitlines()
+    assert started == f"Демон запущен: {daemon.path_socket}"
+    assert sorted(lines) == ["dropbox:/b", "yandex:/a"]
+
+
+@pytest.mark.asyncio
+async def test_captures_output_per_request(tmp_path):
+    async with running_daemon(tmp_path) as daemon:
+        responses = await asyncio.gather(daemon.execute("get_folder_content", ["yandex", "/a"]),
+                                         daemon.execute("get_folder_content", ["dropbox", "/b"]))
+    assert [response["stdout"] for response in responses] == ["yandex:/a\n", "dropbox:/b\n"]
+
+
+@pytest.mark.asyncio
+async def test_returns_logged_errors_and_exceptions(tmp_path, capsys):
+    async with running_daemon(tmp_path) as daemon:
+        await call(daemon, "create_folder", "yandex", "/a")
+        assert "Папка уже существует" in capsys.readouterr().err
+        with pytest.raises(Exception) as e_info:
+            await call(daemon, "upload", "yandex", "relative.txt", "/a")
+    assert e_info.value.args[0] == f"IncorrectPath. Неверный путь: {path.abspath('relative.txt')}"
+
+
+@pytest.mark.asyncio
+async def test_rejects_unknown_methods(tmp_path):
+    async with running_daemon(tmp_path) as daemon, await DaemonClient.connect(daemon.path_socket) as client:
+        with pytest.raises(Exception) as e_info:
+            await client.call("sync", "yandex")
+    assert e_info.value.args[0] == "DaemonError. Неизвестная команда: sync"
+
+
+@pytest.mark.asyncio
+async def test_connect_without_daemon(tmp_path):
+    assert await DaemonClient.connect(str(tmp_path / "missing.sock")) is None
+
+
+@pytest.mark.asyncio
+async def test_discovery_does_not_create_state_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv("CLOUDS_DAEMON_SOCKET")
+    monkeypatch.setenv("CLOUDS_STATE_DIR", str(tmp_path / "missing"))
+    assert socket_path() == str(tmp_path / "missing" / "daemon.sock")
+    assert await DaemonClient.connect() is None
+    assert not (tmp_path / "missing").exists()
@@ -1,3 +1,5 @@
+import asyncio
+import json
 import zipfile
 from os import path
 
@@ -6,28 +8,46 @@ import pytest
 from pytest_httpx import HTTPXMock
 
 from api_clients.dropbox import Dropbox
+from api_clients.hashing import dropbox_content_hash
+from api_clients.stats import RequestStats
 
 
-@pytest.fixture
-def cloud(httpx_mock: HTTPXMock):
+def add_missing_metadata(httpx_mock: HTTPXMock) -> None:
     httpx_mock.add_response(
-        url=f"https://api.dropboxapi.com/2/users/get_current_account",
-        method="POST"
+        url="https://api.dropboxapi.com/2/files/get_metadata",
+        method="POST",
+        json={"error_summary": "path/not_found/..", "error": {".tag": "path", "path": {".tag": "not_found"}}},
+        status_code=httpx.codes.CONFLICT
     )
+
+
+@pytest.fixture
+def cloud():
     return Dropbox(auth_token="1234")
 
 
-def test_auth_fail(cloud: Dropbox, httpx_mock: HTTPXMock):
+@pytest.mark.asyncio
+async def test_auth_fail(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path, monkeypatch):
+    monkeypatch.setenv("CLOUDS_STATE_DIR", str(tmp_path))
     httpx_mock.add_response(
-        url=f"{cloud.url}users/get_current_account",
+        url="https://api.dropboxapi.com/2/users/get_current_account",
         method="POST",
-        status_code=httpx.codes.UNAUTHORIZED,
+        status_code=httpx.codes.UNAUTHORIZED
     )
     with pytest.raises(Exception) as e_info:
-        cloud.auth("1234")
+        await cloud.auth()
     assert e_info.value.args[0] == 'AuthError. Ошибка авторизации в Dropbox. Проверьте/обновите данные'
 
 
+@pytest.mark.asyncio
+async def test_auth_is_cached(httpx_mock: HTTPXMock, tmp_path, monkeypatch):
+    monkeypatch.setenv("CLOUDS_STATE_DIR", str(tmp_path))
+    httpx_mock.add_response(url="https://api.dropboxapi.com/2/users/get_current_account", method="POST")
+    await Dropbox(auth_token="1234").auth()
+    await Dropbox(auth_token="1234").auth()
+    assert len(httpx_mock.get_requests()) == 1
+
+
 @pytest.mark.asyncio
 async def test_get_cloud_info(cloud: Dropbox, httpx_mock: HTTPXMock):
     httpx_mock.add_response(
@@ -166,6 +186,7 @@ async def test_download_file_fail_local(cloud: Dropbox, httpx_mock: HTTPXMock, t
 async def test_upload_file_ok(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path):
     local_path = tmp_path / "file.txt"
     local_path.write_bytes(b"Hello, World!")
+    add_missing_metadata(httpx_mock)
     httpx_mock.add_response(
         url="https://content.dropboxapi.com/2/files/upload",
         method="POST",
@@ -217,6 +238,18 @@ async def test_download_folder_ok(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_pat
     with open(zip_file_path, 'rb') as f:
         zip_content = f.read()
 
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/list_folder",
+        method="POST",
+        json={
+            "entries": [
+                {".tag": "folder", "path_display": "/path/to/folder"},
+                {".tag": "file", "path_display": "/path/to/folder/test.txt", "size": 3}
+            ],
+            "cursor": "mock_cursor",
+            "has_more": False
+        }
+    )
     httpx_mock.add_response(
         url="https://api.dropboxapi.com/2/files/get_metadata",
         method="POST",
@@ -249,3 +282,446 @@ async def test_download_folder_fail_remote(cloud: Dropbox, httpx_mock: HTTPXMock
     with pytest.raises(Exception) as e_info:
         await cloud.get_folder_content("folder/file.docx")
     assert e_info.value.args[0] == 'NotAFolderError. Запрошенный ресурс не является папкой'
+
+
+@pytest.mark.asyncio
+async def test_download_file_streams_in_chunks(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path):
+    content = bytes(range(256)) * (3 * cloud.chunk_size // 256 + 7)
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/get_metadata",
+        method="POST",
+        json={
+            ".tag": "file"
+        }
+    )
+    httpx_mock.add_response(
+        url="https://content.dropboxapi.com/2/files/download",
+        method="POST",
+        content=content,
+    )
+    local_path = tmp_path / "big.bin"
+    result = await cloud.download_file("/path/to/big.bin", str(local_path))
+    assert result["status"] == "ok" and local_path.read_bytes() == content
+
+
+@pytest.mark.asyncio
+async def test_upload_large_file_session(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path):
+    cloud.upload_chunk_size = 5
+    cloud.upload_buffer_size = 2
+    cloud.upload_session_threshold = 8
+    local_path = tmp_path / "file.txt"
+    local_path.write_bytes(b"Hello, World!")
+    add_missing_metadata(httpx_mock)
+    bodies = []
+    reads = []
+    run = cloud.fs.run
+
+    async def tracked(function, *args):
+        reads.append(function)
+        return await run(function, *args)
+
+    cloud.fs.run = tracked
+
+    async def session_call(request: httpx.Request) -> httpx.Response:
+        chunks = []
+        async for chunk in request.stream:
+            chunks.append(bytes(chunk))
+            await asyncio.sleep(0)
+        bodies.append((request.headers["Content-Length"], b"".join(chunks)))
+        return httpx.Response(200, json={"session_id": "sid", "name": "file.txt"})
+
+    for endpoint in ("start", "append_v2", "finish"):
+        httpx_mock.add_callback(session_call, url=f"https://content.dropboxapi.com/2/files/upload_session/{endpoint}",
+                                method="POST")
+    result = await cloud.upload_file(str(local_path), "/path/to/file.txt")
+    requests = httpx_mock.get_requests()[1:]
+    args = [json.loads(request.headers["Dropbox-API-Arg"]) for request in requests]
+    assert result["status"] == "ok"
+    assert bodies == [("5", b"Hello"), ("5", b", Wor"), ("3", b"ld!")]
+    assert len([function for function in reads if function.__name__ == "readinto"]) == 8
+    assert args[1]["cursor"] == {"session_id": "sid", "offset": 5}
+    assert args[2]["cursor"] == {"session_id": "sid", "offset": 10}
+    assert args[2]["commit"]["path"] == "/path/to/file.txt"
+
+
+@pytest.mark.asyncio
+async def test_download_folder_per_file(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path):
+    cloud.zip_max_files = 1
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/list_folder",
+        method="POST",
+        json={
+            "entries": [
+                {".tag": "file", "path_display": "/Folder/a.txt", "size": 1},
+                {".tag": "folder", "path_display": "/Folder/sub"}
+            ],
+            "cursor": "mock_cursor",
+            "has_more": True
+        }
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/list_folder/continue",
+        method="POST",
+        json={
+            "entries": [
+                {".tag": "file", "path_display": "/Folder/sub/b.txt", "size": 1}
+            ],
+            "cursor": "mock_cursor",
+            "has_more": False
+        }
+    )
+    httpx_mock.add_response(
+        url="https://content.dropboxapi.com/2/files/download",
+        method="POST",
+        match_headers={"Dropbox-API-Arg": '{"path": "/folder/a.txt"}'},
+        content=b"a"
+    )
+    httpx_mock.add_response(
+        url="https://content.dropboxapi.com/2/files/download",
+        method="POST",
+        match_headers={"Dropbox-API-Arg": '{"path": "/folder/sub/b.txt"}'},
+        content=b"b"
+    )
+    result = await cloud.download_folder("/folder", str(tmp_path))
+    assert result["status"] == "ok"
+    assert (tmp_path / "folder" / "a.txt").read_bytes() == b"a"
+    assert (tmp_path / "folder" / "sub" / "b.txt").read_bytes() == b"b"
+
+
+@pytest.mark.asyncio
+async def test_upload_folder_batch_commit(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path):
+    cloud.finish_batch_size = 2
+    cloud.batch_poll_interval = 0
+    (tmp_path / "sub").mkdir()
+    for name in ("a.txt", "b.txt", "sub/c.txt"):
+        (tmp_path / name).write_bytes(name.encode())
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/create_folder_batch",
+        method="POST",
+        match_json={"paths": ["/dst"], "autorename": False, "force_async": False},
+        json={".tag": "complete", "entries": [
+            {".tag": "failure",
+             "failure": {".tag": "path", "path": {".tag": "conflict", "conflict": {".tag": "folder"}}}}
+        ]}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/create_folder_batch",
+        method="POST",
+        match_json={"paths": ["/dst/sub"], "autorename": False, "force_async": False},
+        json={".tag": "complete", "entries": [{".tag": "success"}]}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/list_folder",
+        method="POST",
+        json={"entries": [], "cursor": "c", "has_more": False}
+    )
+    httpx_mock.add_response(
+        url="https://content.dropboxapi.com/2/files/upload_session/start",
+        method="POST",
+        json={"session_id": "sid"}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/upload_session/finish_batch_v2",
+        method="POST",
+        json={"entries": [{".tag": "success"}, {".tag": "success"}]}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/upload_session/finish_batch_v2",
+        method="POST",
+        json={".tag": "async_job_id", "async_job_id": "job"}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/upload_session/finish_batch/check",
+        method="POST",
+        json={".tag": "in_progress"}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/upload_session/finish_batch/check",
+        method="POST",
+        json={".tag": "complete", "entries": [{".tag": "success"}]}
+    )
+    result = await cloud.upload_folder(str(tmp_path), "/dst")
+    commits = httpx_mock.get_requests(url="https://api.dropboxapi.com/2/files/upload_session/finish_batch_v2")
+    committed = [entry["commit"]["path"] for request in commits for entry in json.loads(request.content)["entries"]]
+    assert result["status"] == "ok" and len(commits) == 2
+    assert sorted(committed) == ["/dst/a.txt", "/dst/b.txt", "/dst/sub/c.txt"]
+    assert not httpx_mock.get_requests(url="https://content.dropboxapi.com/2/files/upload")
+
+
+@pytest.mark.asyncio
+async def test_iter_folder_follows_cursor(cloud: Dropbox, httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/get_metadata",
+        method="POST",
+        json={".tag": "folder"}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/list_folder",
+        method="POST",
+        json={"entries": [{".tag": "file", "name": "a"}], "cursor": "c1", "has_more": True}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/list_folder/continue",
+        method="POST",
+        match_json={"cursor": "c1"},
+        json={"entries": [{".tag": "folder", "name": "b"}], "cursor": "c2", "has_more": False}
+    )
+    pages = [[entry["name"] for entry in page] async for page in cloud.iter_folder("/big", page_size=1)]
+    assert pages == [["a"], ["b"]]
+    assert json.loads(httpx_mock.get_requests()[1].content)["limit"] == 1
+
+
+@pytest.mark.asyncio
+async def test_list_changes_uses_cursor(cloud: Dropbox, httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/list_folder/continue",
+        method="POST",
+        match_json={"cursor": "old"},
+        json={"entries": [{".tag": "deleted", "name": "gone.txt", "path_display": "/dst/gone.txt"},
+                          {".tag": "file", "name": "new.txt", "path_display": "/dst/new.txt", "size": 1,
+                           "content_hash": "h", "rev": "r"}],
+              "cursor": "new", "has_more": False}
+    )
+    entries, cursor, complete = await cloud.list_changes("/dst", "old")
+    assert cursor == "new" and not complete
+    assert entries[0] == {"path": "gone.txt", "type": "deleted"}
+    assert entries[1]["path"] == "new.txt" and entries[1]["hash"] == "h" and entries[1]["rev"] == "r"
+
+
+@pytest.mark.asyncio
+async def test_list_changes_relists_only_on_reset_cursor(cloud: Dropbox, httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/list_folder/continue",
+        method="POST",
+        match_json={"cursor": "expired"},
+        status_code=httpx.codes.CONFLICT,
+        json={"error_summary": "reset/..", "error": {".tag": "reset"}}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/list_folder/continue",
+        method="POST",
+        match_json={"cursor": "broken"},
+        status_code=httpx.codes.UNAUTHORIZED,
+        json={"error_summary": "expired_access_token/", "error": {".tag": "expired_access_token"}}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/list_folder",
+        method="POST",
+        json={"entries": [], "cursor": "fresh", "has_more": False}
+    )
+    assert await cloud.list_changes("/dst", "expired") == ([], "fresh", True)
+    with pytest.raises(Exception) as e_info:
+        await cloud.list_changes("/dst", "broken")
+    assert e_info.value.args[0] == "expired_access_token. expired_access_token/"
+
+
+@pytest.mark.asyncio
+async def test_upload_file_skips_unchanged(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path, monkeypatch):
+    monkeypatch.setenv("CLOUDS_STATE_DIR", f"{tmp_path}-state")
+    local_path = tmp_path / "file.txt"
+    local_path.write_bytes(b"Hello, World!")
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/get_metadata",
+        method="POST",
+        json={".tag": "file", "path_display": "/file.txt", "size": 13, "rev": "1",
+              "content_hash": dropbox_content_hash(str(local_path))}
+    )
+    result = await cloud.upload_file(str(local_path), "/file.txt")
+    assert result["status"] == "skipped"
+    assert not httpx_mock.get_requests(url="https://content.dropboxapi.com/2/files/upload")
+
+
+@pytest.mark.asyncio
+async def test_download_file_resumes_part(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path):
+    local_path = tmp_path / "file.txt"
+    (tmp_path / "file.txt.part").write_bytes(b"Hello")
+    (tmp_path / "file.txt.part.json").write_text(json.dumps({"rev": "r1", "etag": None}))
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/get_metadata",
+        method="POST",
+        json={".tag": "file", "path_display": "/file.txt", "size": 13, "rev": "r1"}
+    )
+    httpx_mock.add_response(
+        url="https://content.dropboxapi.com/2/files/download",
+        method="POST",
+        match_headers={"Range": "bytes=5-"},
+        headers={"Dropbox-API-Result": json.dumps({"rev": "r1"})},
+        status_code=httpx.codes.PARTIAL_CONTENT,
+        content=b", World!"
+    )
+    result = await cloud.download_file("/file.txt", str(local_path))
+    assert result["status"] == "ok" and local_path.read_bytes() == b"Hello, World!"
+    assert not path.exists(f"{local_path}.part") and not path.exists(f"{local_path}.part.json")
+
+
+@pytest.mark.asyncio
+async def test_download_file_finishes_complete_part(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path):
+    local_path = tmp_path / "file.txt"
+    (tmp_path / "file.txt.part").write_bytes(b"Hello, World!")
+    (tmp_path / "file.txt.part.json").write_text(json.dumps({"rev": "r1", "etag": None}))
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/get_metadata",
+        method="POST",
+        json={".tag": "file", "path_display": "/file.txt", "size": 13, "rev": "r1"}
+    )
+    result = await cloud.download_file("/file.txt", str(local_path))
+    assert result["status"] == "ok" and local_path.read_bytes() == b"Hello, World!"
+    assert not path.exists(f"{local_path}.part.json")
+
+
+@pytest.mark.asyncio
+async def test_download_file_restarts_on_unsatisfiable_range(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path):
+    local_path = tmp_path / "file.txt"
+    (tmp_path / "file.txt.part").write_bytes(b"Hello")
+    (tmp_path / "file.txt.part.json").write_text(json.dumps({"rev": "r1", "etag": None}))
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/get_metadata",
+        method="POST",
+        json={".tag": "file", "path_display": "/file.txt", "size": 13, "rev": "r1"}
+    )
+    httpx_mock.add_response(
+        url="https://content.dropboxapi.com/2/files/download",
+        method="POST",
+        match_headers={"Range": "bytes=5-"},
+        status_code=httpx.codes.REQUESTED_RANGE_NOT_SATISFIABLE
+    )
+    httpx_mock.add_response(
+        url="https://content.dropboxapi.com/2/files/download",
+        method="POST",
+        headers={"Dropbox-API-Result": json.dumps({"rev": "r1"})},
+        content=b"Hello, World!"
+    )
+    await cloud.download_file("/file.txt", str(local_path))
+    assert local_path.read_bytes() == b"Hello, World!"
+
+
+@pytest.mark.asyncio
+async def test_download_file_restarts_on_new_rev(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path):
+    local_path = tmp_path / "file.txt"
+    (tmp_path / "file.txt.part").write_bytes(b"Stale")
+    (tmp_path / "file.txt.part.json").write_text(json.dumps({"rev": "r1", "etag": None}))
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/get_metadata",
+        method="POST",
+        json={".tag": "file", "path_display": "/file.txt", "size": 13, "rev": "r2"}
+    )
+    httpx_mock.add_response(
+        url="https://content.dropboxapi.com/2/files/download",
+        method="POST",
+        content=b"Hello, World!"
+    )
+    await cloud.download_file("/file.txt", str(local_path))
+    request = httpx_mock.get_requests(url="https://content.dropboxapi.com/2/files/download")[0]
+    assert "Range" not in request.headers and local_path.read_bytes() == b"Hello, World!"
+
+
+@pytest.mark.asyncio
+async def test_clients_share_auth_and_close(cloud: Dropbox, httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="https://api.dropboxapi.com/2/files/get_metadata", method="POST",
+                            match_headers={"Authorization": "Bearer 1234"}, json={".tag": "file"})
+    httpx_mock.add_response(url="https://content.dropboxapi.com/2/files/download", method="POST",
+                            match_headers={"Authorization": "Bearer 1234"}, content=b"data")
+    async with cloud:
+        assert await cloud.download("/file.txt") == b"data"
+    assert cloud.client.is_closed and cloud.content_client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_upload_stream_uses_session_chunks(cloud: Dropbox, httpx_mock: HTTPXMock):
+    cloud.upload_chunk_size = 5
+
+    async def chunks():
+        for chunk in (b"Hel", b"lo, Wor", b"ld!"):
+            yield chunk
+
+    httpx_mock.add_response(url="https://content.dropboxapi.com/2/files/upload_session/start", method="POST",
+                            match_content=b"Hello", json={"session_id": "sid"})
+    httpx_mock.add_response(url="https://content.dropboxapi.com/2/files/upload_session/append_v2", method="POST",
+                            match_content=b", Wor")
+    httpx_mock.add_response(url="https://content.dropboxapi.com/2/files/upload_session/finish", method="POST",
+                            match_content=b"ld!", json={"name": "file.txt"})
+    result = await cloud.upload_stream(chunks(), "/file.txt", 13)
+    assert result["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_stats_group_requests_by_endpoint(cloud: Dropbox, httpx_mock: HTTPXMock, tmp_path):
+    cloud.stats = RequestStats()
+    add_missing_metadata(httpx_mock)
+    httpx_mock.add_response(url=f"{cloud.content_url}files/download", method="POST", content=b"data")
+    assert await cloud.stat("/missing", missing_ok=True) is None
+    async with cloud.download_stream("/file.txt", verify=False) as response:
+        assert await response.aread() == b"data"
+    summary = cloud.stats.summary()
+    assert summary["requests"] == 2 and summary["errors"] == 1 and summary["received"] >= 4
+    assert [(row["endpoint"], row["requests"]) for row in summary["endpoints"]] == [("files/download", 1),
+                                                                                    ("files/get_metadata", 1)]
+    cloud.stats.export(str(tmp_path / "trace.json"))
+    trace = json.loads((tmp_path / "trace.json").read_text(encoding="utf-8"))
+    assert [entry["method"] for entry in trace["requests"]] == ["POST", "POST"]
+    assert len(cloud.stats.lines()) == 3
+
+
+@pytest.mark.asyncio
+async def test_copy_is_server_side(cloud: Dropbox, httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/copy_v2",
+        method="POST",
+        match_json={"from_path": "/src", "to_path": "/dst", "autorename": False},
+        json={"metadata": {".tag": "folder", "name": "dst", "path_display": "/dst"}}
+    )
+    cloud.metadata.put("/dst", {"type": "file"})
+    assert await cloud.copy("/src", "/dst") == {"status": "ok", "entries": 1}
+    assert cloud.metadata.get("/dst") is None
+
+
+@pytest.mark.asyncio
+async def test_move_conflict(cloud: Dropbox, httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/move_v2",
+        method="POST",
+        json={"error_summary": "to/conflict/folder/..", "error": {".tag": "to"}},
+        status_code=httpx.codes.CONFLICT
+    )
+    with pytest.raises(Exception) as e_info:
+        await cloud.move("/src", "/dst")
+    assert e_info.value.args[0] == "RelocationError. Не удалось переместить: /src (to/conflict/folder/..)"
+
+
+@pytest.mark.asyncio
+async def test_move_batch_waits_for_job(cloud: Dropbox, httpx_mock: HTTPXMock):
+    cloud.batch_poll_interval = 0
+    for folder in ("/a", "/a/sub", "/ab"):
+        cloud.known_folders.put(folder, {"type": "dir"})
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/move_batch_v2",
+        method="POST",
+        match_json={"entries": [{"from_path": "/a", "to_path": "/x/a"}, {"from_path": "/b", "to_path": "/x/b"}],
+                    "autorename": False},
+        json={".tag": "async_job_id", "async_job_id": "job"}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/move_batch/check_v2",
+        method="POST",
+        match_json={"async_job_id": "job"},
+        json={".tag": "in_progress"}
+    )
+    httpx_mock.add_response(
+        url="https://api.dropboxapi.com/2/files/move_batch/check_v2",
+        method="POST",
+        json={".tag": "complete", "entries": [{".tag": "success"}, {".tag": "failure", "failure": {}}]}
+    )
+    with pytest.raises(Exception) as e_info:
+        await cloud.relocate([("/a", "/x/a"), ("/b", "/x/b")], move=True)
+    assert e_info.value.args[0] == "RelocationError. Не удалось переместить: /b"
+    assert list(cloud.known_folders.entries) == ["/ab"]
+
+
+def test_only_read_and_overwrite_endpoints_are_idempotent(cloud: Dropbox):
+    def request(url: str) -> httpx.Request:
+        return httpx.Request("POST", url)
+
+    assert cloud.is_idempotent(request("https://api.dropboxapi.com/2/files/list_folder/continue"))
+    assert cloud.is_idempotent(request("https://content.dropboxapi.com/2/files/upload"))
+    assert not cloud.is_idempotent(request("https://content.dropboxapi.com/2/files/upload_session/append_v2"))
+    assert not cloud.is_idempotent(request("https://api.dropboxapi.com/2/files/move_v2"))
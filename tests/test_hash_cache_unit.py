@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from api_clients import hashing
+from api_clients.hash_cache import HashCache
+from api_clients.hashing import HashPool, compute_digest, dropbox_content_hash
+
+
+@pytest.mark.asyncio
+async def test_digest_is_cached_until_file_changes(tmp_path, monkeypatch):
+    calls = []
+    compute = hashing.compute_digest
+    monkeypatch.setattr(hashing, "compute_digest", lambda *args: calls.append(args) or compute(*args))
+    local_path = tmp_path / "file.txt"
+    local_path.write_bytes(b"abc")
+    cache = HashCache(str(tmp_path / "hashes.sqlite"))
+
+    assert await cache.digest(str(local_path), "sha256") == hashlib.sha256(b"abc").hexdigest()
+    assert await cache.digest(str(local_path), "sha256") == hashlib.sha256(b"abc").hexdigest()
+    assert len(calls) == 1
+
+    local_path.write_bytes(b"abcd")
+    os.utime(local_path, ns=(0, 10 ** 9))
+    assert await cache.digest(str(local_path), "sha256") == hashlib.sha256(b"abcd").hexdigest()
+    assert len(calls) == 2
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_digest_survives_reopen(tmp_path, monkeypatch):
+    local_path = tmp_path / "file.txt"
+    local_path.write_bytes(b"abc")
+    cache = HashCache(str(tmp_path / "hashes.sqlite"))
+    await cache.digest(str(local_path), "md5")
+    cache.close()
+
+    monkeypatch.setattr(hashing, "compute_digest", lambda *args: pytest.fail("digest recomputed"))
+    cache = HashCache(str(tmp_path / "hashes.sqlite"))
+    assert await cache.digest(str(local_path), "md5") == hashlib.md5(b"abc").hexdigest()
+    cache.close()
+
+
+def test_digests_match_reference(tmp_path):
+    data = os.urandom(9 * 2 ** 20 + 17)
+    (tmp_path / "big.bin").write_bytes(data)
+    (tmp_path / "empty.bin").write_bytes(b"")
+    blocks = b"".join(hashlib.sha256(data[i:i + 4 * 2 ** 20]).digest() for i in range(0, len(data), 4 * 2 ** 20))
+    assert dropbox_content_hash(str(tmp_path / "big.bin")) == hashlib.sha256(blocks).hexdigest()
+    assert compute_digest(str(tmp_path / "big.bin"), "md5") == hashlib.md5(data).hexdigest()
+    assert dropbox_content_hash(str(tmp_path / "empty.bin")) == hashlib.sha256(b"").hexdigest()
+    assert compute_digest(str(tmp_path / "empty.bin"), "sha256") == hashlib.sha256(b"").hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_large_files_are_hashed_in_worker_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(asyncio, "to_thread", lambda *args: pytest.fail("hashed on a thread"))
+    paths = []
+    for i in range(3):
+        paths.append(tmp_path / f"file{i}.bin")
+        paths[-1].write_bytes(bytes([i]) * 2 ** 20)
+    pool = HashPool(workers=2, process_threshold=2 ** 20)
+    try:
+        digests = await asyncio.gather(*(pool.digest(str(path), "sha256") for path in paths))
+    finally:
+        pool.close()
+    assert digests == [hashlib.sha256(bytes([i]) * 2 ** 20).hexdigest() for i in range(3)]
@@ -0,0 +1,88 @@
+import threading
+from os import path
+
+import pytest
+
+from api_clients.hash_cache import HashCache
+from api_clients.local_fs import LocalFS
+from api_clients.yandex_disk import YandexDisk
+
+
+@pytest.mark.asyncio
+async def test_scan_lists_each_folder_in_pool(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_bytes(b"abc")
+    (tmp_path / "sub" / "b.txt").write_bytes(b"b")
+    fs = LocalFS(2)
+    threads = set()
+    list_folder = fs.list_folder
+
+    def tracked(folder):
+        threads.add(threading.current_thread().name)
+        return list_folder(folder)
+
+    fs.list_folder = tracked
+    listings = {folder: (folders, files)
+                async for folder, folders, files in fs.scan([str(tmp_path), str(tmp_path / "sub")])}
+    fs.close()
+    assert listings[str(tmp_path)][0] == [str(tmp_path / "sub")]
+    assert [(name, size) for name, size, _ in listings[str(tmp_path)][1]] == [(str(tmp_path / "a.txt"), 3)]
+    assert [name for name, _, _ in listings[str(tmp_path / "sub")][1]] == [str(tmp_path / "sub" / "b.txt")]
+    assert all(name.startswith("local-fs") for name in threads)
+
+
+@pytest.mark.asyncio
+async def test_file_helpers(tmp_path):
+    fs = LocalFS(1)
+    await fs.makedirs([str(tmp_path / "a" / "b"), str(tmp_path / "c")])
+    assert await fs.isdir(str(tmp_path / "a" / "b")) and await fs.isdir(str(tmp_path / "c"))
+    marker = str(tmp_path / "marker.json")
+    assert await fs.read_json(marker) == {}
+    await fs.write_json(marker, {"rev": "1"})
+    assert await fs.read_json(marker) == {"rev": "1"}
+    await fs.replace(marker, str(tmp_path / "moved.json"))
+    assert await fs.isfile(str(tmp_path / "moved.json")) and await fs.getsize(str(tmp_path / "moved.json")) > 0
+    await fs.remove(str(tmp_path / "moved.json"), marker)
+    assert not path.exists(tmp_path / "moved.json")
+    fs.close()
+
+
+@pytest.mark.asyncio
+async def test_scan_tree_streams_files_level_by_level(tmp_path):
+    (tmp_path / "sub" / "deep").mkdir(parents=True)
+    (tmp_path / "a.txt").write_bytes(b"a")
+    (tmp_path / "sub" / "b.txt").write_bytes(b"bb")
+    (tmp_path / "sub" / "deep" / "c.txt").write_bytes(b"ccc")
+    cloud = YandexDisk(auth_token="1234")
+    events = []
+
+    async def ensure_folders(paths):
+        if paths:
+            events.append(("folders", paths))
+
+    cloud.ensure_folders = ensure_folders
+    async for size, (file_local, file_remote) in cloud.scan_tree(str(tmp_path), "/dst"):
+        events.append((file_remote, size))
+    await cloud.aclose()
+    assert events == [("/dst/a.txt", 1), ("folders", ["/dst/sub"]), ("/dst/sub/b.txt", 2),
+                      ("folders", ["/dst/sub/deep"]), ("/dst/sub/deep/c.txt", 3)]
+
+
+@pytest.mark.asyncio
+async def test_hash_cache_stats_files_in_pool(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"abc")
+    fs = LocalFS(1)
+    cache = HashCache(str(tmp_path / "hashes.sqlite"), fs=fs)
+    threads = []
+    lookup = cache.lookup
+
+    def tracked(*args):
+        threads.append(threading.current_thread().name)
+        return lookup(*args)
+
+    cache.lookup = tracked
+    first = await cache.digest(str(tmp_path / "a.txt"), "md5")
+    assert await cache.digest(str(tmp_path / "a.txt"), "md5") == first
+    cache.close()
+    assert fs.executor is not None and all(name.startswith("local-fs") for name in threads) and len(threads) == 2
+    fs.close()
@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+from api_clients.metadata_cache import MetadataCache
+
+
+def test_entries_expire_after_ttl():
+    cache = MetadataCache(ttl=10)
+    with patch("api_clients.metadata_cache.time.monotonic", return_value=100):
+        cache.put("/a", {"type": "file"})
+    with patch("api_clients.metadata_cache.time.monotonic", return_value=105):
+        assert cache.get("/a") == {"type": "file"}
+    with patch("api_clients.metadata_cache.time.monotonic", return_value=111):
+        assert cache.get("/a") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MetadataCache(max_size=2)
+    cache.put("/a", {})
+    cache.put("/b", {})
+    cache.get("/a")
+    cache.put("/c", {})
+    assert cache.get("/b") is None and cache.get("/a") == {} and cache.get("/c") == {}
+
+
+def test_recursive_invalidation():
+    cache = MetadataCache()
+    for key in ("/a", "/a/b", "/a/b/c", "/ab"):
+        cache.put(key, {})
+    cache.invalidate("/a", recursive=True)
+    assert list(cache.entries) == ["/ab"]
@@ -0,0 +1,103 @@
+import httpx
+import pytest
+from pytest_httpx import HTTPXMock
+
+from api_clients.remote_index import RemoteIndex
+from api_clients.yandex_disk import LAST_UPLOADED_FIELDS, YandexDisk
+
+
+class ChangesCloud:
+    def __init__(self, *batches):
+        self.batches = list(batches)
+        self.cursors = []
+
+    async def index_changes(self, cursor=None):
+        self.cursors.append(cursor)
+        return self.batches.pop(0)
+
+
+@pytest.fixture
+def index(tmp_path):
+    remote_index = RemoteIndex("dropbox", str(tmp_path / "index.sqlite"))
+    yield remote_index
+    remote_index.close()
+
+
+@pytest.mark.asyncio
+async def test_refresh_applies_incremental_changes(index: RemoteIndex):
+    cloud = ChangesCloud(
+        ([{"path": "docs", "type": "dir"}, {"path": "docs/a.txt", "type": "file", "size": 1},
+          {"path": "docs/old/b.txt", "type": "file", "size": 2}, {"path": "c.jpg", "type": "file", "size": 3}],
+         "c1", True),
+        ([{"path": "docs/old", "type": "deleted"}, {"path": "docs/new.txt", "type": "file", "size": 4}], "c2", False)
+    )
+    assert (await index.refresh(cloud))["entries"] == 4
+    stats = await index.refresh(cloud)
+    assert cloud.cursors == [None, "c1"] and stats == {"changes": 2, "entries": 4, "complete": False}
+    assert index.list_folder("/docs") == [{"name": "a.txt", "type": "file"}, {"name": "new.txt", "type": "file"}]
+    assert [entry["path"] for entry in index.find("*.TXT")] == ["/docs/a.txt", "/docs/new.txt"]
+    assert [entry["path"] for entry in index.find("d*", entry_type="dir")] == ["/docs"]
+
+
+@pytest.mark.asyncio
+async def test_full_refresh_replaces_entries(index: RemoteIndex):
+    cloud = ChangesCloud(([{"path": "a.txt", "type": "file"}], "c1", True),
+                         ([{"path": "b.txt", "type": "file"}], "c2", True))
+    await index.refresh(cloud)
+    await index.refresh(cloud, full=True)
+    assert cloud.cursors == [None, None]
+    assert index.list_folder("/") == [{"name": "b.txt", "type": "file"}]
+
+
+def test_find_escapes_like_wildcards(index: RemoteIndex):
+    index.connect().executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [("dropbox", f"/{name}", "/", name, "file", 1, None, None, None)
+                                 for name in ("100%.txt", "1000.txt")])
+    assert [entry["path"] for entry in index.find("100%*")] == ["/100%.txt"]
+
+
+@pytest.mark.asyncio
+async def test_yandex_index_changes_reads_last_uploaded(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url=httpx.URL("https://cloud-api.yandex.net/v1/disk/resources/last-uploaded",
+                      params={"limit": 1000, "fields": LAST_UPLOADED_FIELDS}),
+        json={"items": [
+            {"name": "new.txt", "path": "disk:/docs/new.txt", "type": "file", "size": 1,
+             "modified": "2024-05-02T00:00:00+00:00"},
+            {"name": "old.txt", "path": "disk:/old.txt", "type": "file", "size": 1,
+             "modified": "2024-04-01T00:00:00+00:00"}]}
+    )
+    entries, cursor, complete = await YandexDisk("1234").index_changes("2024-05-01T00:00:00+00:00")
+    assert [entry["path"] for entry in entries] == ["docs/new.txt"]
+    assert cursor == "2024-05-02T00:00:00+00:00" and not complete
+
+
+@pytest.mark.asyncio
+async def test_incremental_refresh_adds_missing_parent_folders(index: RemoteIndex):
+    cloud = ChangesCloud(([{"path": "docs", "type": "dir", "modified": "m1"}], "c1", True),
+                         ([{"path": "docs/a/b/new.txt", "type": "file", "size": 1}], "c2", False))
+    await index.refresh(cloud)
+    await index.refresh(cloud)
+    assert [entry["path"] for entry in index.find("*", entry_type="dir")] == ["/docs", "/docs/a", "/docs/a/b"]
+    assert index.list_folder("/docs/a") == [{"name": "b", "type": "dir"}]
+    modified = index.connect().execute("SELECT modified FROM entries WHERE path = '/docs'").fetchone()
+    assert modified == ("m1",)
+
+
+@pytest.mark.asyncio
+async def test_yandex_index_changes_crawls_when_page_is_full(httpx_mock: HTTPXMock, monkeypatch):
+    cloud = YandexDisk("1234")
+    cloud.page_size = 2
+    httpx_mock.add_response(
+        url=httpx.URL("https://cloud-api.yandex.net/v1/disk/resources/last-uploaded",
+                      params={"limit": 2, "fields": LAST_UPLOADED_FIELDS}),
+        json={"items": [{"name": name, "path": f"disk:/{name}", "type": "file", "size": 1,
+                         "modified": "2024-05-02T00:00:00+00:00"} for name in ("a.txt", "b.txt")]}
+    )
+    crawled = [{"path": "a.txt", "type": "file", "modified": "2024-05-02T00:00:00+00:00"}]
+
+    async def list_tree(path_remote):
+        return crawled
+
+    monkeypatch.setattr(cloud, "list_tree", list_tree)
+    assert await cloud.index_changes("2024-05-01T00:00:00+00:00") == (crawled, "2024-05-02T00:00:00+00:00", True)
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from api_clients.scheduler import TransferScheduler
+
+
+@pytest.mark.asyncio
+async def test_run_respects_concurrency():
+    in_flight = 0
+    peak = 0
+    done = []
+
+    async def worker(name):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        done.append(name)
+
+    await TransferScheduler(concurrency=3).run(((1, (i,)) for i in range(50)), worker)
+    assert peak == 3 and sorted(done) == list(range(50))
+
+
+@pytest.mark.asyncio
+async def test_small_jobs_use_every_worker_while_producing():
+    in_flight = 0
+    peak = 0
+
+    async def worker(name):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    async def jobs():
+        for i in range(8):
+            yield 1, (i,)
+        await started.wait()
+
+    async def watch():
+        while peak < 8:
+            await asyncio.sleep(0.001)
+        started.set()
+
+    started = asyncio.Event()
+    await asyncio.wait_for(asyncio.gather(TransferScheduler(concurrency=8, large_file_size=100).run(jobs(), worker),
+                                          watch()), 2)
+    assert peak == 8
+
+
+@pytest.mark.asyncio
+async def test_large_files_do_not_block_small_ones():
+    done = []
+    release = asyncio.Event()
+
+    async def worker(name):
+        if name == "huge":
+            await release.wait()
+        done.append(name)
+        if len(done) == 10:
+            release.set()
+
+    jobs = [(100, ("huge",))] + [(1, (i,)) for i in range(10)]
+    await TransferScheduler(concurrency=2, large_file_size=100).run(jobs, worker)
+    assert done[-1] == "huge" and len(done) == 11
+
+
+@pytest.mark.asyncio
+async def test_run_raises_after_finishing_other_jobs():
+    done = []
+
+    async def worker(name):
+        if name == 0:
+            raise Exception("boom")
+        done.append(name)
+
+    async def jobs():
+        for i in range(5):
+            yield 1, (i,)
+
+    with pytest.raises(Exception) as e_info:
+        await TransferScheduler(concurrency=2).run(jobs(), worker)
+    assert e_info.value.args[0] == "boom" and sorted(done) == [1, 2, 3, 4]
@@ -0,0 +1,46 @@
+import hashlib
+
+import pytest
+
+from api_clients.hashing import dropbox_content_hash
+from api_clients.sync import FolderSync
+
+
+@pytest.mark.asyncio
+async def test_upload_sync_transfers_only_changes(tmp_path, memory_cloud):
+    local = tmp_path / "local"
+    (local / "sub").mkdir(parents=True)
+    (local / "a.txt").write_bytes(b"a")
+    (local / "sub" / "b.txt").write_bytes(b"b")
+    cloud = memory_cloud()
+
+    stats = await FolderSync(cloud, "memory", str(local), "/dst").run("upload")
+    assert stats == {"transferred": 2, "skipped": 0}
+
+    cloud.uploads.clear()
+    stats = await FolderSync(cloud, "memory", str(local), "/dst").run("upload")
+    assert stats == {"transferred": 0, "skipped": 2} and cloud.cursors[-1] == "cursor1"
+
+    (local / "a.txt").write_bytes(b"changed")
+    stats = await FolderSync(cloud, "memory", str(local), "/dst").run("upload")
+    assert stats == {"transferred": 1, "skipped": 1} and cloud.uploads == ["/dst/a.txt"]
+
+
+@pytest.mark.asyncio
+async def test_download_sync_skips_identical_files(tmp_path, memory_cloud):
+    local = tmp_path / "local"
+    local.mkdir()
+    (local / "same.txt").write_bytes(b"same")
+    cloud = memory_cloud()
+    cloud.files = {"/dst/same.txt": b"same", "/dst/dir/new.txt": b"new"}
+
+    stats = await FolderSync(cloud, "memory", str(local), "/dst").run("download")
+    assert stats == {"transferred": 1, "skipped": 1}
+    assert (local / "dir" / "new.txt").read_bytes() == b"new"
+
+
+def test_dropbox_content_hash(tmp_path):
+    file = tmp_path / "file.bin"
+    file.write_bytes(b"x" * (4 * 2 ** 20 + 1))
+    blocks = hashlib.sha256(b"x" * 4 * 2 ** 20).digest() + hashlib.sha256(b"x").digest()
+    assert dropbox_content_hash(str(file)) == hashlib.sha256(blocks).hexdigest()
@@ -0,0 +1,203 @@
+import asyncio
+
+import httpx
+import pytest
+from pytest_httpx import HTTPXMock
+
+from api_clients import transport
+from api_clients.local_fs import LocalFS
+from api_clients.transport import AdaptiveLimiter, FileBody, FileChangedError, PoolConfig, RetryTransport
+
+
+def make_client(limiter: AdaptiveLimiter, max_retries: int = 3) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=RetryTransport(httpx.AsyncHTTPTransport(), limiter, max_retries,
+                                                      backoff_base=0))
+
+
+def test_pool_config_limits(monkeypatch):
+    monkeypatch.setattr(transport, "find_spec", lambda name: None)
+    pool = PoolConfig(max_connections=4, keepalive_expiry=5)
+    assert not pool.http2
+    assert pool.limits() == httpx.Limits(max_connections=4, max_keepalive_connections=4, keepalive_expiry=5)
+
+
+def test_limiter_halves_on_throttle_and_grows_back():
+    limiter = AdaptiveLimiter(16, cooldown=0)
+    limiter.on_throttle()
+    assert limiter.limit == 8
+    for _ in range(8):
+        limiter.on_success()
+    assert 8.9 < limiter.limit < 9.1
+
+
+def test_limiter_ignores_throttle_burst():
+    limiter = AdaptiveLimiter(16, cooldown=60)
+    for _ in range(5):
+        limiter.on_throttle()
+    assert limiter.limit == 8
+
+
+def test_retry_after_parsing():
+    assert RetryTransport.retry_after(httpx.Response(429, headers={"Retry-After": "3"})) == 3
+    expired = httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    assert RetryTransport.retry_after(expired) == 0
+    assert RetryTransport.retry_after(httpx.Response(429)) is None
+
+
+@pytest.mark.asyncio
+async def test_retries_throttled_request(httpx_mock: HTTPXMock):
+    limiter = AdaptiveLimiter(4, cooldown=0)
+    httpx_mock.add_response(url="https://example.com/", status_code=429, headers={"Retry-After": "0"})
+    httpx_mock.add_response(url="https://example.com/", json={"ok": True})
+    async with make_client(limiter) as client:
+        r = await client.post("https://example.com/", content=b"body")
+    assert r.json() == {"ok": True} and len(httpx_mock.get_requests()) == 2
+    assert limiter.limit < 4 and limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_honors_full_retry_after(httpx_mock: HTTPXMock, monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(transport.asyncio, "sleep", sleep)
+    httpx_mock.add_response(url="https://example.com/", status_code=429, headers={"Retry-After": "120"})
+    httpx_mock.add_response(url="https://example.com/", status_code=503, headers={"Retry-After": "600"})
+    client = httpx.AsyncClient(transport=RetryTransport(httpx.AsyncHTTPTransport(), AdaptiveLimiter(), 3, 0,
+                                                        backoff_max=30, retry_after_max=300))
+    async with client:
+        r = await client.get("https://example.com/")
+    assert r.status_code == 503 and delays == [120] and len(httpx_mock.get_requests()) == 2
+
+
+@pytest.mark.asyncio
+async def test_records_request_once_body_is_read(httpx_mock: HTTPXMock):
+    records = []
+    httpx_mock.add_response(url="https://example.com/", status_code=503, headers={"Retry-After": "0"})
+    httpx_mock.add_response(url="https://example.com/", content=b"x" * 10)
+    client = httpx.AsyncClient(transport=RetryTransport(httpx.AsyncHTTPTransport(), AdaptiveLimiter(), 3, 0,
+                                                        recorder=lambda request, entry: records.append(entry)))
+    async with client:
+        await client.post("https://example.com/", content=b"body")
+    assert len(records) == 1
+    assert records[0]["status"] == 200 and records[0]["retries"] == 1
+    assert records[0]["sent"] == 4 and records[0]["received"] == 10
+    assert records[0]["latency"] >= 0 and records[0]["queue_wait"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_client_errors(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="https://example.com/", status_code=409)
+    async with make_client(AdaptiveLimiter()) as client:
+        r = await client.get("https://example.com/")
+    assert r.status_code == 409 and len(httpx_mock.get_requests()) == 1
+
+
+@pytest.mark.asyncio
+async def test_retries_non_idempotent_request_only_when_unprocessed(httpx_mock: HTTPXMock):
+    errors = [httpx.ConnectError("boom"), httpx.ReadTimeout("slow")]
+
+    async def receive(request: httpx.Request) -> httpx.Response:
+        raise errors.pop(0)
+
+    httpx_mock.add_callback(receive, url="https://example.com/move")
+    httpx_mock.add_callback(receive, url="https://example.com/move")
+    httpx_mock.add_response(url="https://example.com/commit", status_code=500)
+    async with make_client(AdaptiveLimiter()) as client:
+        with pytest.raises(httpx.ReadTimeout):
+            await client.post("https://example.com/move", json={})
+        r = await client.post("https://example.com/commit", json={})
+    assert r.status_code == 500 and len(httpx_mock.get_requests()) == 3
+
+
+@pytest.mark.asyncio
+async def test_retries_idempotent_request_on_server_error(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="https://example.com/list", status_code=500)
+    httpx_mock.add_response(url="https://example.com/list", json={"ok": True})
+    client = httpx.AsyncClient(transport=RetryTransport(httpx.AsyncHTTPTransport(), AdaptiveLimiter(), 3, 0,
+                                                        idempotent=lambda request: True))
+    async with client:
+        r = await client.post("https://example.com/list", json={})
+    assert r.json() == {"ok": True}
+
+
+@pytest.mark.asyncio
+async def test_replays_file_body_after_connection_error(httpx_mock: HTTPXMock, tmp_path):
+    local_path = tmp_path / "file.txt"
+    local_path.write_bytes(b"Hello, World!")
+    bodies = []
+
+    async def receive(request: httpx.Request) -> httpx.Response:
+        bodies.append(b"".join([bytes(chunk) async for chunk in request.stream]))
+        if len(bodies) == 1:
+            raise httpx.ConnectError("boom")
+        return httpx.Response(200)
+
+    httpx_mock.add_callback(receive, url="https://example.com/")
+    async with make_client(AdaptiveLimiter()) as client:
+        r = await client.put("https://example.com/", content=FileBody(str(local_path), 5))
+    assert r.status_code == 200 and bodies == [b"Hello, World!"] * 2
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries(httpx_mock: HTTPXMock):
+    httpx_mock.add_response(url="https://example.com/", status_code=503)
+    async with make_client(AdaptiveLimiter(), max_retries=2) as client:
+        r = await client.get("https://example.com/")
+    assert r.status_code == 503 and len(httpx_mock.get_requests()) == 3
+
+
+async def read_body(body: FileBody) -> list:
+    return [bytes(chunk) async for chunk in body]
+
+
+@pytest.mark.asyncio
+async def test_file_body_reads_requested_range(tmp_path):
+    local_path = tmp_path / "file.txt"
+    local_path.write_bytes(b"Hello, World!")
+    empty_path = tmp_path / "empty.txt"
+    empty_path.write_bytes(b"")
+    body = FileBody(str(local_path), 3, offset=2, length=8)
+    assert body.headers() == {"Content-Length": "8"}
+    chunks = [(isinstance(chunk, memoryview), bytes(chunk)) async for chunk in body]
+    assert chunks == [(True, b"llo"), (True, b", W"), (True, b"or")]
+    assert await read_body(FileBody(str(local_path), 5, offset=1)) == [b"ello,", b" Worl", b"d!"]
+    assert await read_body(FileBody(str(local_path), 100)) == [b"Hello, World!"]
+    assert await read_body(FileBody(str(empty_path))) == []
+
+
+@pytest.mark.asyncio
+async def test_file_body_detects_file_truncated_during_upload(tmp_path):
+    local_path = tmp_path / "file.txt"
+    local_path.write_bytes(b"Hello, World!")
+    chunks = []
+    with pytest.raises(FileChangedError):
+        async for chunk in FileBody(str(local_path), 4):
+            chunks.append(bytes(chunk))
+            local_path.write_bytes(b"Hello")
+    assert chunks[0] == b"Hell" and b"".join(chunks) in (b"Hello", b"Hello, W")
+
+
+@pytest.mark.asyncio
+async def test_file_body_reads_ahead_into_two_buffers(tmp_path):
+    local_path = tmp_path / "file.txt"
+    local_path.write_bytes(b"Hello, World!")
+    fs = LocalFS(1)
+    reads = []
+    run = fs.run
+
+    async def tracked(function, *args):
+        reads.append(function)
+        return await run(function, *args)
+
+    fs.run = tracked
+    chunks, buffers = [], set()
+    async for chunk in FileBody(str(local_path), 4, fs=fs):
+        await asyncio.sleep(0)
+        chunks.append(bytes(chunk))
+        buffers.add(id(chunk.obj))
+        assert len(reads) == min(len(chunks) + 1, 4)
+    fs.close()
+    assert chunks == [b"Hell", b"o, W", b"orld", b"!"] and len(buffers) == 2
@@ -1,3 +1,4 @@
+import hashlib
 import zipfile
 from os import path
 
@@ -5,29 +6,36 @@ import httpx
 import pytest
 from pytest_httpx import HTTPXMock
 
-from api_clients.yandex_disk import YandexDisk
+from api_clients.yandex_disk import LIST_FIELDS, STAT_FIELDS, YandexDisk
 
 
 @pytest.fixture
-def cloud(httpx_mock: HTTPXMock):
-    httpx_mock.add_response(
-        url=f"https://cloud-api.yandex.net/v1/disk/",
-        method="GET"
-    )
+def cloud():
     return YandexDisk(auth_token="1234")
 
 
-def test_auth_fail(cloud: YandexDisk, httpx_mock: HTTPXMock):
+@pytest.mark.asyncio
+async def test_auth_fail(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_path, monkeypatch):
+    monkeypatch.setenv("CLOUDS_STATE_DIR", str(tmp_path))
     httpx_mock.add_response(
-        url=f"https://cloud-api.yandex.net/v1/disk/",
+        url="https://cloud-api.yandex.net/v1/disk/",
         method="GET",
         status_code=httpx.codes.UNAUTHORIZED
     )
     with pytest.raises(Exception) as e_info:
-        cloud.auth("1234")
+        await cloud.auth()
     assert e_info.value.args[0] == 'AuthError. Ошибка авторизации в Яндекс.Диске. Проверьте/обновите данные'
 
 
+@pytest.mark.asyncio
+async def test_auth_is_cached(httpx_mock: HTTPXMock, tmp_path, monkeypatch):
+    monkeypatch.setenv("CLOUDS_STATE_DIR", str(tmp_path))
+    httpx_mock.add_response(url="https://cloud-api.yandex.net/v1/disk/", method="GET")
+    await YandexDisk(auth_token="1234").auth()
+    await YandexDisk(auth_token="1234").auth()
+    assert len(httpx_mock.get_requests()) == 1
+
+
 @pytest.mark.asyncio
 async def test_get_cloud_info(cloud: YandexDisk, httpx_mock: HTTPXMock):
     httpx_mock.add_response(
@@ -50,7 +58,8 @@ async def test_get_cloud_info(cloud: YandexDisk, httpx_mock: HTTPXMock):
 @pytest.mark.asyncio
 async def test_get_folder_content_ok(cloud: YandexDisk, httpx_mock: HTTPXMock):
     httpx_mock.add_response(
-        url=f"{cloud.url}resources?path=%2F&fields=type%2C_embedded.items.name%2C_embedded.items.type",
+        url=httpx.URL(f"{cloud.url}resources",
+                      params={"path": "/", "limit": 1000, "offset": 0, "fields": LIST_FIELDS}),
         method="GET",
         json={
             "type": "dir",
@@ -58,7 +67,8 @@ async def test_get_folder_content_ok(cloud: YandexDisk, httpx_mock: HTTPXMock):
                 "items": [
                     {"name": "folder1", "type": "dir"},
                     {"name": "file1.txt", "type": "file"}
-                ]
+                ],
+                "total": 2
             }
         }
     )
@@ -69,7 +79,8 @@ async def test_get_folder_content_ok(cloud: YandexDisk, httpx_mock: HTTPXMock):
 @pytest.mark.asyncio
 async def test_get_folder_content_fail_remote(cloud: YandexDisk, httpx_mock: HTTPXMock):
     httpx_mock.add_response(
-        url=f"{cloud.url}resources?path=%2Fabracad&fields=type%2C_embedded.items.name%2C_embedded.items.type",
+        url=httpx.URL(f"{cloud.url}resources",
+                      params={"path": "/abracad", "limit": 1000, "offset": 0, "fields": LIST_FIELDS}),
         method="GET",
         json={"error": "DiskNotFoundError", "message": "Не удалось найти запрошенный ресурс."},
         status_code=httpx.codes.NOT_FOUND
@@ -82,7 +93,8 @@ async def test_get_folder_content_fail_remote(cloud: YandexDisk, httpx_mock: HTT
 @pytest.mark.asyncio
 async def test_get_folder_content_fail_remote_not_folder(cloud: YandexDisk, httpx_mock: HTTPXMock):
     httpx_mock.add_response(
-        url=f"{cloud.url}resources?path=folder%2Ffile.docx&fields=type%2C_embedded.items.name%2C_embedded.items.type",
+        url=httpx.URL(f"{cloud.url}resources",
+                      params={"path": "folder/file.docx", "limit": 1000, "offset": 0, "fields": LIST_FIELDS}),
         method="GET",
         json={
             "type": "file",
@@ -96,14 +108,9 @@ async def test_get_folder_content_fail_remote_not_folder(cloud: YandexDisk, http
 @pytest.mark.asyncio
 async def test_download_file_ok(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_path):
     httpx_mock.add_response(
-        url=f"{cloud.url}resources/download?path=%2Fpath%2Fto%2Ffile.txt&fields=href",
+        url=httpx.URL(f"{cloud.url}resources", params={"path": "/path/to/file.txt", "fields": STAT_FIELDS}),
         method="GET",
-        json={"href": "https://download.example.com/file.txt"}
-    )
-    httpx_mock.add_response(
-        url=f"{cloud.url}resources?path=%2Fpath%2Fto%2Ffile.txt&fields=type%2C_embedded.items.name%2C_embedded.items.type",
-        method="GET",
-        json={"type": "file"}
+        json={"type": "file", "file": "https://download.example.com/file.txt"}
     )
     httpx_mock.add_response(
         url="https://download.example.com/file.txt",
@@ -118,7 +125,7 @@ async def test_download_file_ok(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_pa
 @pytest.mark.asyncio
 async def test_download_file_fail_remote(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_path):
     httpx_mock.add_response(
-        url=f"{cloud.url}resources/download?path=folder%2Ffile123.docx&fields=href",
+        url=httpx.URL(f"{cloud.url}resources", params={"path": "folder/file123.docx", "fields": STAT_FIELDS}),
         method="GET",
         json={"error": "DiskNotFoundError", "message": "Не удалось найти запрошенный ресурс."},
         status_code=httpx.codes.NOT_FOUND)
@@ -131,14 +138,9 @@ async def test_download_file_fail_remote(cloud: YandexDisk, httpx_mock: HTTPXMoc
 @pytest.mark.asyncio
 async def test_download_file_fail_local(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_path):
     httpx_mock.add_response(
-        url=f"{cloud.url}resources/download?path=%2Fpath%2Fto%2Ffile.txt&fields=href",
+        url=httpx.URL(f"{cloud.url}resources", params={"path": "/path/to/file.txt", "fields": STAT_FIELDS}),
         method="GET",
-        json={"href": "https://download.example.com/file.txt"}
-    )
-    httpx_mock.add_response(
-        url=f"{cloud.url}resources?path=%2Fpath%2Fto%2Ffile.txt&fields=type%2C_embedded.items.name%2C_embedded.items.type",
-        method="GET",
-        json={"type": "file"}
+        json={"type": "file", "file": "https://download.example.com/file.txt"}
     )
     httpx_mock.add_response(
         url="https://download.example.com/file.txt",
@@ -155,6 +157,11 @@ async def test_download_file_fail_local(cloud: YandexDisk, httpx_mock: HTTPXMock
 async def test_upload_file_ok(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_path):
     local_path = tmp_path / "file.txt"
     local_path.write_bytes(b"Hello, World!")
+    httpx_mock.add_response(
+        url=httpx.URL(f"{cloud.url}resources", params={"path": "/path/to/file.txt", "fields": STAT_FIELDS}),
+        json={"error": "DiskNotFoundError", "message": "Не удалось найти запрошенный ресурс."},
+        status_code=httpx.codes.NOT_FOUND
+    )
     httpx_mock.add_response(
         url=f"{cloud.url}resources/upload?path=%2Fpath%2Fto%2Ffile.txt&fields=href&overwrite=true",
         json={"href": "https://upload.example.com/file.txt"},
@@ -210,12 +217,18 @@ async def test_download_folder_ok(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_
     with open(zip_file_path, 'rb') as f:
         zip_content = f.read()
 
+    httpx_mock.add_response(
+        url=httpx.URL(f"{cloud.url}resources", params={
+            "path": "/path/to/folder", "limit": 1000, "offset": 0,
+            "fields": LIST_FIELDS}),
+        json={"type": "dir", "_embedded": {"items": [{"name": "test.txt", "type": "file", "size": 3}], "total": 1}}
+    )
     httpx_mock.add_response(
         url=f"{cloud.url}resources/download?path=%2Fpath%2Fto%2Ffolder&fields=href",
         json={"href": "https://download.example.com/folder.zip"}
     )
     httpx_mock.add_response(
-        url=f"{cloud.url}resources?path=%2Fpath%2Fto%2Ffolder&fields=type%2C_embedded.items.name%2C_embedded.items.type",
+        url=httpx.URL(f"{cloud.url}resources", params={"path": "/path/to/folder", "fields": STAT_FIELDS}),
         json={"type": "dir"}
     )
     httpx_mock.add_response(
@@ -233,7 +246,9 @@ async def test_download_folder_ok(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_
 @pytest.mark.asyncio
 async def test_download_folder_fail_remote(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_path):
     httpx_mock.add_response(
-        url=f"{cloud.url}resources/download?path=%2Fpath%2Fto%2Fnonexistent_folder&fields=href",
+        url=httpx.URL(f"{cloud.url}resources", params={
+            "path": "/path/to/nonexistent_folder", "limit": 1000, "offset": 0,
+            "fields": LIST_FIELDS}),
         json={"error": "DiskNotFoundError", "message": "Не удалось найти запрошенный ресурс."},
         status_code=httpx.codes.NOT_FOUND
     )
@@ -248,12 +263,18 @@ async def test_download_folder_fail_remote(cloud: YandexDisk, httpx_mock: HTTPXM
 
 @pytest.mark.asyncio
 async def test_download_folder_fail_remote_finish(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_path):
+    httpx_mock.add_response(
+        url=httpx.URL(f"{cloud.url}resources", params={
+            "path": "/path/to/folder", "limit": 1000, "offset": 0,
+            "fields": LIST_FIELDS}),
+        json={"type": "dir", "_embedded": {"items": [], "total": 0}}
+    )
     httpx_mock.add_response(
         url=f"{cloud.url}resources/download?path=%2Fpath%2Fto%2Ffolder&fields=href",
         json={"href": "https://download.example.com/folder.zip"}
     )
     httpx_mock.add_response(
-        url=f"{cloud.url}resources?path=%2Fpath%2Fto%2Ffolder&fields=type%2C_embedded.items.name%2C_embedded.items.type",
+        url=httpx.URL(f"{cloud.url}resources", params={"path": "/path/to/folder", "fields": STAT_FIELDS}),
         json={"type": "dir"}
     )
     httpx_mock.add_response(
@@ -268,3 +289,122 @@ async def test_download_folder_fail_remote_finish(cloud: YandexDisk, httpx_mock:
         await cloud.download_folder("/path/to/folder", str(local_path))
     assert e_info.value.args[
                0] == "FolderDownloadError. Не возможно скачать папку /path/to/folder"
+
+
+@pytest.mark.asyncio
+async def test_upload_folder_ok(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_path, monkeypatch):
+    monkeypatch.setenv("CLOUDS_STATE_DIR", f"{tmp_path}-state")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.txt").write_bytes(b"a")
+    (tmp_path / "sub" / "b.txt").write_bytes(b"b")
+    (tmp_path / "sub" / "c.txt").write_bytes(b"c")
+    for folder in ("%2Fdst", "%2Fdst%2Fsub"):
+        httpx_mock.add_response(url=f"{cloud.url}resources?path={folder}", method="PUT",
+                                status_code=httpx.codes.CREATED)
+    httpx_mock.add_response(
+        url=httpx.URL(f"{cloud.url}resources",
+                      params={"path": "/dst", "limit": 1000, "offset": 0, "fields": LIST_FIELDS}),
+        json={"type": "dir", "_embedded": {"items": [
+            {"name": "a.txt", "type": "file", "size": 1, "sha256": hashlib.sha256(b"a").hexdigest()},
+            {"name": "sub", "type": "dir"}], "total": 2}}
+    )
+    httpx_mock.add_response(
+        url=httpx.URL(f"{cloud.url}resources",
+                      params={"path": "/dst/sub", "limit": 1000, "offset": 0, "fields": LIST_FIELDS}),
+        json={"type": "dir", "_embedded": {"items": [
+            {"name": "b.txt", "type": "file", "size": 1, "sha256": hashlib.sha256(b"old").hexdigest()}],
+            "total": 1}}
+    )
+    for file in ("%2Fdst%2Fsub%2Fb.txt", "%2Fdst%2Fsub%2Fc.txt"):
+        httpx_mock.add_response(
+            url=f"{cloud.url}resources/upload?path={file}&fields=href&overwrite=true",
+            json={"href": f"https://upload.example.com/{file}"},
+            method="GET"
+        )
+        httpx_mock.add_response(url=f"https://upload.example.com/{file}", method="PUT",
+                                status_code=httpx.codes.CREATED)
+    result = await cloud.upload_folder(str(tmp_path), "/dst")
+    uploaded = [request for request in httpx_mock.get_requests(method="PUT")
+                if request.url.host == "upload.example.com"]
+    stats = [request for request in httpx_mock.get_requests(method="GET")
+             if request.url.path.endswith("/resources") and request.url.params["path"].endswith(".txt")]
+    assert result["status"] == "ok" and len(uploaded) == 2 and stats == []
+
+
+@pytest.mark.asyncio
+async def test_ensure_folders_skips_existing(cloud: YandexDisk, httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url=f"{cloud.url}resources?path=%2Fpath",
+        method="PUT",
+        json={"error": "DiskPathPointsToExistentDirectoryError", "message": "Уже существует"},
+        status_code=httpx.codes.CONFLICT
+    )
+    await cloud.ensure_folders(["/path"])
+    await cloud.ensure_folders(["/path"])
+    assert len(httpx_mock.get_requests(method="PUT")) == 1
+    cloud.known_folders.ttl = -1
+    cloud.known_folders.clear()
+    await cloud.ensure_folders(["/path"])
+    await cloud.ensure_folders(["/path"])
+    assert len(httpx_mock.get_requests(method="PUT")) == 3
+
+
+@pytest.mark.asyncio
+async def test_iter_folder_follows_offsets(cloud: YandexDisk, httpx_mock: HTTPXMock):
+    for offset, names in ((0, ["a", "b"]), (2, ["c"])):
+        httpx_mock.add_response(
+            url=httpx.URL(f"{cloud.url}resources",
+                          params={"path": "/big", "limit": 2, "offset": offset, "fields": LIST_FIELDS}),
+            json={"type": "dir", "_embedded": {"items": [{"name": name, "type": "file"} for name in names],
+                                               "total": 3}}
+        )
+    pages = [[entry["name"] for entry in page] async for page in cloud.iter_folder("/big", page_size=2)]
+    assert pages == [["a", "b"], ["c"]]
+
+
+@pytest.mark.asyncio
+async def test_download_file_resumes_with_if_range(cloud: YandexDisk, httpx_mock: HTTPXMock, tmp_path):
+    local_path = tmp_path / "file.txt"
+    (tmp_path / "file.txt.part").write_bytes(b"Hello")
+    (tmp_path / "file.txt.part.json").write_text('{"rev": "7", "etag": "\\"abc\\""}')
+    httpx_mock.add_response(
+        url=httpx.URL(f"{cloud.url}resources", params={"path": "/file.txt", "fields": STAT_FIELDS}),
+        json={"type": "file", "size": 13, "revision": 7, "file": "https://download.example.com/file.txt"}
+    )
+    httpx_mock.add_response(
+        url="https://download.example.com/file.txt",
+        match_headers={"Range": "bytes=5-", "If-Range": '"abc"'},
+        status_code=httpx.codes.PARTIAL_CONTENT,
+        content=b", World!"
+    )
+    result = await cloud.download_file("/file.txt", str(local_path))
+    assert result["status"] == "ok" and local_path.read_bytes() == b"Hello, World!"
+
+
+@pytest.mark.asyncio
+async def test_copy_completes_synchronously(cloud: YandexDisk, httpx_mock: HTTPXMock):
+    httpx_mock.add_response(
+        url="https://cloud-api.yandex.net/v1/disk/resources/copy?from=%2Fsrc&path=%2Fdst&overwrite=false",
+        method="POST",
+        status_code=httpx.codes.CREATED,
+        json={"href": "https://cloud-api.yandex.net/v1/disk/resources?path=disk%3A%2Fdst", "method": "GET"}
+    )
+    assert await cloud.copy("/src", "/dst") == {"status": "ok", "entries": 1}
+
+
+@pytest.mark.asyncio
+async def test_move_polls_operation(cloud: YandexDisk, httpx_mock: HTTPXMock):
+    cloud.operation_poll_interval = 0
+    operation = "https://cloud-api.yandex.net/v1/disk/operations/42"
+    httpx_mock.add_response(
+        url="https://cloud-api.yandex.net/v1/disk/resources/move?from=%2Fsrc&path=%2Fdst&overwrite=false",
+        method="POST",
+        status_code=httpx.codes.ACCEPTED,
+        json={"href": operation, "method": "GET"}
+    )
+    httpx_mock.add_response(url=operation, method="GET", json={"status": "in-progress"})
+    httpx_mock.add_response(url=operation, method="GET", json={"status": "failed"})
+    with pytest.raises(Exception) as e_info:
+        await cloud.move("/src", "/dst")
+    assert e_info.value.args[0] == "OperationFailedError. Операция копирования/перемещения завершилась с ошибкой"
+    assert len(httpx_mock.get_requests(url=operation)) == 2
@@ -0,0 +1,90 @@
+import io
+import zipfile
+
+import pytest
+
+from api_clients.zip_stream import ZipStreamExtractor, ZipStreamParser
+
+
+class UnseekableStream(io.RawIOBase):
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+def make_zip(files: dict, stream=None) -> bytes:
+    stream = stream or io.BytesIO()
+    with zipfile.ZipFile(stream, "w") as zip_file:
+        for name, (content, compression) in files.items():
+            zip_file.writestr(name, content, compress_type=compression)
+    return bytes(stream.getvalue() if isinstance(stream, io.BytesIO) else stream.data)
+
+
+async def extract(content: bytes, path_local, chunk: int = 7) -> None:
+    async with ZipStreamExtractor(str(path_local)) as extractor:
+        for i in range(0, len(content), chunk):
+            await extractor.feed(content[i:i + chunk])
+
+
+FILES = {
+    "folder/": (b"", zipfile.ZIP_STORED),
+    "folder/a.txt": (b"abc" * 1000, zipfile.ZIP_DEFLATED),
+    "folder/sub/b.bin": (bytes(range(256)), zipfile.ZIP_STORED),
+    "файл.txt": (b"", zipfile.ZIP_DEFLATED),
+}
+
+
+@pytest.mark.asyncio
+async def test_extract_in_small_chunks(tmp_path):
+    await extract(make_zip(FILES), tmp_path)
+    assert (tmp_path / "folder" / "a.txt").read_bytes() == b"abc" * 1000
+    assert (tmp_path / "folder" / "sub" / "b.bin").read_bytes() == bytes(range(256))
+    assert (tmp_path / "файл.txt").read_bytes() == b""
+
+
+@pytest.mark.asyncio
+async def test_extract_with_data_descriptors(tmp_path):
+    files = {name: value for name, value in FILES.items() if value[1] == zipfile.ZIP_DEFLATED}
+    await extract(make_zip(files, UnseekableStream()), tmp_path, chunk=3)
+    assert (tmp_path / "folder" / "a.txt").read_bytes() == b"abc" * 1000
+
+
+@pytest.mark.asyncio
+async def test_extract_stored_entries_with_data_descriptors(tmp_path):
+    fake = b"PK\x07\x08" + bytes(16)
+    files = {**FILES, "stored.bin": (b"head" + fake + b"PK\x07" + fake + b"tail", zipfile.ZIP_STORED)}
+    content = make_zip(files, UnseekableStream())
+    assert all(info.flag_bits & 0x8 for info in zipfile.ZipFile(io.BytesIO(content)).infolist())
+    for chunk in (1, 5, 64):
+        await extract(content, tmp_path / str(chunk), chunk=chunk)
+        assert (tmp_path / str(chunk) / "stored.bin").read_bytes() == files["stored.bin"][0]
+        assert (tmp_path / str(chunk) / "folder" / "sub" / "b.bin").read_bytes() == bytes(range(256))
+        assert (tmp_path / str(chunk) / "файл.txt").read_bytes() == b""
+
+
+@pytest.mark.asyncio
+async def test_extract_keeps_members_inside_target(tmp_path):
+    target = tmp_path / "target"
+    target.mkdir()
+    await extract(make_zip({"../evil.txt": (b"x", zipfile.ZIP_STORED)}), target)
+    assert (target / "evil.txt").exists() and not (tmp_path / "evil.txt").exists()
+
+
+def test_parser_rejects_bad_crc():
+    content = bytearray(make_zip({"a.txt": (b"abc", zipfile.ZIP_STORED)}))
+    content[14] ^= 0xFF
+    with pytest.raises(zipfile.BadZipFile):
+        ZipStreamParser().feed(bytes(content))
+
+
+@pytest.mark.asyncio
+async def test_extract_truncated_archive(tmp_path):
+    content = make_zip({"a.txt": (b"abc" * 100, zipfile.ZIP_DEFLATED)})
+    with pytest.raises(zipfile.BadZipFile):
+        await extract(content[:40], tmp_path)